@@ -0,0 +1,124 @@
+"""自适应画质基准测试
+
+用模拟的链路驱动 AdaptiveController：瓶颈链路按带宽串行发送帧，单向
+传播延迟固定，观看端收到整帧后立即回 screen_ack。带宽分三个阶段变化
+（20 → 3 → 10 Mbit/s），帧内容来自合成桌面的 video 场景，由真实的
+FrameEncoder 按控制器给出的画质和缩放比例编码。
+
+对比固定画质与帧率（static）和自适应控制（adaptive）在每个阶段的帧率、
+平均/95 分位延迟和平均画质。模拟时间与真实时间无关，结果可重复。
+
+运行：python benchmarks/bench_adaptive.py
+"""
+import os
+import sys
+
+import cv2
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.remote_desktop.adaptive import AdaptiveController
+from services.remote_desktop.frame_encoder import FrameEncoder
+from services.remote_desktop.image_processing import ImageProcessing
+from services.remote_desktop.synthetic_source import SyntheticDesktop
+
+WIDTH, HEIGHT = 1280, 720
+PHASES = ((10.0, 20e6), (10.0, 3e6), (10.0, 10e6))  # (时长秒, 带宽 bit/s)
+ONE_WAY_DELAY = 0.02
+TICK = 0.005
+TARGET_LATENCY = 0.15
+
+class LinkModel:
+    """瓶颈链路：帧按到达顺序串行发送，发送完再经过传播延迟到达观看端"""
+
+    def __init__(self, phases, delay):
+        self.phases = phases
+        self.delay = delay
+        self.free_at = 0.0
+        self.departures = []  # 等待或正在发送的帧的发送完成时间
+
+    def bandwidth(self, now):
+        end = 0.0
+        for duration, bits in self.phases:
+            end += duration
+            if now < end:
+                return bits / 8
+        return self.phases[-1][1] / 8
+
+    def send(self, size, now):
+        """返回观看端的确认到达主控端的时间"""
+        start = max(now, self.free_at)
+        self.free_at = start + size / self.bandwidth(start)
+        self.departures.append(self.free_at)
+        return self.free_at + 2 * self.delay
+
+    def queue_depth(self, now):
+        self.departures = [t for t in self.departures if t > now]
+        # 正在发送的一帧不算积压
+        return max(0, len(self.departures) - 1)
+
+def simulate(adaptive):
+    duration = sum(d for d, _ in PHASES)
+    source = SyntheticDesktop(WIDTH, HEIGHT, scenario='video')
+    image_processing = ImageProcessing(quality=80)
+    encoder = FrameEncoder(image_processing, cache_size=0)
+    controller = AdaptiveController(target_latency=TARGET_LATENCY, quality=80, fps=30)
+    link = LinkModel(PHASES, ONE_WAY_DELAY)
+    acks = []  # (确认时间, 帧序号, 发送时间, 画质)
+    samples = []  # (发送时间, 延迟, 画质)
+    now = 0.0
+    while now < duration:
+        for ack in [ack for ack in acks if ack[0] <= now]:
+            acks.remove(ack)
+            controller.on_frame_ack(ack[1], ack[0])
+            samples.append((ack[2], ack[0] - ack[2], ack[3]))
+        controller.on_queue_depth(link.queue_depth(now))
+        if adaptive:
+            controller.update(now)
+            ready = controller.can_send(now)
+        else:
+            ready = controller.last_send is None or now - controller.last_send >= 1 / 30
+        if ready:
+            frame = source.next_frame()
+            if adaptive:
+                controller.apply(image_processing)
+                if controller.scale < 1.0:
+                    size = (int(WIDTH * controller.scale), int(HEIGHT * controller.scale))
+                    frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            frame_id = encoder.frame_id
+            payload = encoder.encode(frame)
+            if payload is not None:
+                controller.on_frame_sent(frame_id, len(payload), now)
+                acks.append((link.send(len(payload), now), frame_id, now, image_processing.quality))
+            else:
+                controller.on_frame_skipped(now)
+        now += TICK
+    return samples, controller
+
+def report(name, samples):
+    start = 0.0
+    for duration, bits in PHASES:
+        phase = [s for s in samples if start <= s[0] < start + duration]
+        start += duration
+        if not phase:
+            print(f"{name:<9} {bits / 1e6:5.0f} Mbit/s  no frames delivered")
+            continue
+        latencies = sorted(latency for _, latency, _ in phase)
+        mean = sum(latencies) / len(latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+        quality = sum(q for _, _, q in phase) / len(phase)
+        print(f"{name:<9} {bits / 1e6:5.0f} Mbit/s {len(phase) / duration:6.1f} fps "
+              f"{mean * 1000:9.0f} ms {p95 * 1000:9.0f} ms {quality:8.0f}")
+
+def main():
+    print(f"target latency {TARGET_LATENCY * 1000:.0f} ms, one-way delay {ONE_WAY_DELAY * 1000:.0f} ms")
+    print(f"{'mode':<9} {'link':>12} {'fps':>10} {'mean':>12} {'p95':>12} {'quality':>8}")
+    for name, adaptive in (('static', False), ('adaptive', True)):
+        samples, controller = simulate(adaptive)
+        report(name, samples)
+        if adaptive:
+            print(f"final settings: {controller.get_settings()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""图像信息基准测试
+
+对比 get_image_info 只解析文件头（JPEG SOF / PNG IHDR / WebP VP8、VP8L、
+VP8X）与完整解码得到尺寸的耗时，图像为 1920x1080 的合成桌面。
+
+运行：python benchmarks/bench_image_info.py
+"""
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.remote_desktop.image_processing import ImageProcessing
+from services.remote_desktop.synthetic_source import SyntheticDesktop
+
+ROUNDS = 200
+
+def timed(func, *args, rounds=ROUNDS):
+    result = func(*args)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(*args)
+    return result, (time.perf_counter() - start) / rounds
+
+def full_decode_info(image_processing, data):
+    img = image_processing.decompress_image(data)
+    return img.shape[1], img.shape[0]
+
+def main():
+    image_processing = ImageProcessing(quality=80)
+    frame = SyntheticDesktop().next_frame()
+    print(f"{'format':<7} {'KB':>8} {'header us':>10} {'decode ms':>10} {'speedup':>8}  info")
+    for compression in ('jpeg', 'png', 'webp'):
+        data = image_processing.compress_image(frame, compression)
+        info, header_time = timed(image_processing.get_image_info, data)
+        size, decode_time = timed(full_decode_info, image_processing, data, rounds=5)
+        assert size == (info['width'], info['height'])
+        print(f"{compression:<7} {len(data) / 1024:8.1f} {header_time * 1e6:10.1f} "
+              f"{decode_time * 1000:10.2f} {decode_time / header_time:7.0f}x  {info}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""并行编码基准测试
+
+在合成桌面上反复编码整帧（每帧前 reset，相当于连续的关键帧），对比
+不同线程数下 FrameEncoder 的每帧耗时，分辨率为 1080p 和 4K。线程数
+超过 CPU 核数后不会再有提升。
+
+运行：python benchmarks/bench_parallel_encode.py
+"""
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.remote_desktop.frame_decoder import FrameDecoder
+from services.remote_desktop.frame_encoder import FrameEncoder
+from services.remote_desktop.synthetic_source import SyntheticDesktop
+
+FRAMES = 20
+RESOLUTIONS = ((1920, 1080), (3840, 2160))
+WORKERS = (1, 2, 4, 8)
+
+def run(frame, workers):
+    encoder = FrameEncoder(cache_size=0, workers=workers)
+    try:
+        payload = encoder.encode(frame)  # 预热：创建线程
+        start = time.perf_counter()
+        for _ in range(FRAMES):
+            encoder.reset()
+            payload = encoder.encode(frame)
+        elapsed = (time.perf_counter() - start) / FRAMES
+    finally:
+        encoder.close()
+    # 观看端按区域还原整帧
+    regions = FrameDecoder().decode(payload)
+    return elapsed * 1000, len(payload), len(regions)
+
+def main():
+    print(f"CPU cores: {os.cpu_count()}")
+    print(f"{'resolution':<11} {'workers':>7} {'ms/frame':>9} {'speedup':>8} {'KB':>8} {'regions':>8}")
+    for width, height in RESOLUTIONS:
+        frame = SyntheticDesktop(width, height).next_frame().copy()
+        baseline = None
+        for workers in WORKERS:
+            ms, size, regions = run(frame, workers)
+            baseline = baseline or ms
+            print(f"{width}x{height:<6} {workers:7} {ms:9.2f} {baseline / ms:7.2f}x "
+                  f"{size / 1024:8.1f} {regions:8}")
+
+if __name__ == "__main__":
+    main()
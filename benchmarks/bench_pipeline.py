@@ -0,0 +1,100 @@
+"""抓取/编码/发送流水线基准测试
+
+合成桌面（video 场景）作为帧来源，发送函数按模拟的带宽休眠（数据量 /
+带宽 + 固定的单帧开销），对比：
+
+    serial：单线程依次抓取、编码、发送，发送阻塞时下一帧的抓取也被推迟
+    pipeline：FramePipeline 三个阶段并行，发送快结束时才抓取并编码下一帧，
+        编码与发送重叠，网络慢时不抓取注定过时的帧
+
+输出实际发送的帧率、从开始抓取到发送完成的平均/最大延迟、丢弃的帧数
+以及各阶段的平均耗时。
+
+运行：python benchmarks/bench_pipeline.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.remote_desktop.frame_encoder import FrameEncoder
+from services.remote_desktop.pipeline import FramePipeline, StageTimer
+from services.remote_desktop.synthetic_source import SyntheticDesktop
+
+WIDTH, HEIGHT = 1280, 720
+FPS = 30
+DURATION = 4.0
+LINKS = ((50e6, 0.002), (8e6, 0.005), (2e6, 0.01))  # (带宽 bit/s, 单帧开销秒)
+
+def link_sender(bandwidth, overhead):
+    def send(payload):
+        time.sleep(overhead + len(payload) * 8 / bandwidth)
+    return send
+
+def run_serial(send):
+    source = SyntheticDesktop(WIDTH, HEIGHT, scenario='video')
+    encoder = FrameEncoder(cache_size=0)
+    timers = {name: StageTimer() for name in ('capture', 'encode', 'send', 'latency')}
+    buffer = None
+    sent = 0
+    end = time.perf_counter() + DURATION
+    next_time = time.perf_counter()
+    while time.perf_counter() < end:
+        now = time.perf_counter()
+        if now < next_time:
+            time.sleep(next_time - now)
+            continue
+        next_time = max(next_time + 1.0 / FPS, now)
+        start = time.perf_counter()
+        frame = source.capture_frame()
+        if buffer is None:
+            buffer = np.empty_like(frame.data)
+        np.copyto(buffer, frame.data)
+        frame.data = buffer
+        captured = time.perf_counter()
+        payload = encoder.encode(frame)
+        encoded = time.perf_counter()
+        timers['capture'].add(captured - start)
+        timers['encode'].add(encoded - captured)
+        if payload is None:
+            continue
+        send(payload)
+        done = time.perf_counter()
+        timers['send'].add(done - encoded)
+        timers['latency'].add(done - start)
+        sent += 1
+    encoder.close()
+    stats = {name: timer.get_stats() for name, timer in timers.items()}
+    stats.update({'sent': sent, 'dropped': 0})
+    return stats
+
+def run_pipeline(send):
+    source = SyntheticDesktop(WIDTH, HEIGHT, scenario='video')
+    encoder = FrameEncoder(cache_size=0)
+    pipeline = FramePipeline(source, encoder, send, fps=FPS)
+    pipeline.start()
+    time.sleep(DURATION)
+    pipeline.stop()
+    encoder.close()
+    return pipeline.get_stats()
+
+def main():
+    print(f"{WIDTH}x{HEIGHT} video scenario, capture at {FPS} fps, {DURATION:.0f} s per run")
+    print(f"{'link':>10} {'mode':<9} {'fps':>6} {'latency':>9} {'max':>8} {'dropped':>8} "
+          f"{'capture':>8} {'encode':>8} {'send':>8}")
+    for bandwidth, overhead in LINKS:
+        send = link_sender(bandwidth, overhead)
+        for name, run in (('serial', run_serial), ('pipeline', run_pipeline)):
+            stats = run(send)
+            latency = stats['latency']
+            print(f"{bandwidth / 1e6:5.0f} Mb/s {name:<9} {stats['sent'] / DURATION:6.1f} "
+                  f"{latency['avg_ms']:6.1f} ms {latency['max_ms']:5.0f} ms {stats['dropped']:8d} "
+                  f"{stats['capture']['avg_ms']:5.1f} ms {stats['encode']['avg_ms']:5.1f} ms "
+                  f"{stats['send']['avg_ms']:5.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""像素格式基准测试
+
+模拟 mss 抓屏得到的 BGRA 缓冲区，对比两条编码路径：
+
+    rgb：抓取器先把 BGRA 转换为 RGB（原来的做法），JPEG 编码前再转回 BGR
+    bgra：FrameEncoder 直接处理原生 BGRA 帧，JPEG 直接从 BGRA 编码，
+          无损编码只在脏区域内转换
+
+观看端分别解码到 RGB 和 BGR 帧缓冲区。输出每帧的编码/解码耗时、编码
+期间临时分配内存的峰值（除关键帧外的平均值，以整帧 RGB 大小为单位；
+rgb 路径的整帧转换写入复用的缓冲区，不计入分配，但计入耗时），并检查
+两条路径解码出的画面一致。
+
+运行：python benchmarks/bench_pixel_format.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.remote_desktop.frame_decoder import FrameDecoder
+from services.remote_desktop.frame_encoder import FrameEncoder
+from services.remote_desktop.pixel_format import PIXEL_BGR, PIXEL_BGRA, PIXEL_RGB, PixelFrame
+from services.remote_desktop.synthetic_source import SyntheticDesktop
+
+WIDTH, HEIGHT = 1920, 1080
+FRAMES = 30
+SCENARIOS = ('video', 'typing', 'scroll')
+
+def capture_frames(scenario):
+    # 预先生成 BGRA 帧，模拟抓屏库的原生输出
+    source = SyntheticDesktop(WIDTH, HEIGHT, scenario=scenario)
+    return [cv2.cvtColor(source.next_frame(), cv2.COLOR_RGB2BGRA) for _ in range(FRAMES)]
+
+def run(frames, mode):
+    encoder = FrameEncoder(cache_size=0)
+    decoder = FrameDecoder(pixel_format=PIXEL_RGB if mode == 'rgb' else PIXEL_BGR)
+    rgb = None
+    encode_time = decode_time = 0.0
+    peaks = []
+    size = 0
+    for bgra in frames:
+        tracemalloc.start()
+        start = time.perf_counter()
+        if mode == 'rgb':
+            if rgb is None:
+                rgb = bgra[:, :, :3].copy()
+            cv2.cvtColor(bgra, cv2.COLOR_BGRA2RGB, dst=rgb)
+            payload = encoder.encode(rgb)
+        else:
+            payload = encoder.encode(PixelFrame(bgra, PIXEL_BGRA))
+        encode_time += time.perf_counter() - start
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        if payload is None:
+            continue
+        size += len(payload)
+        start = time.perf_counter()
+        decoder.decode(payload)
+        decode_time += time.perf_counter() - start
+    encoder.close()
+    # 第一帧是关键帧，需要创建上一帧副本等常驻缓冲区，不计入
+    steady = peaks[1:]
+    return (encode_time / len(frames), decode_time / len(frames), sum(steady) / len(steady),
+            size / len(frames), decoder)
+
+def main():
+    frame_bytes = WIDTH * HEIGHT * 3
+    print(f"{WIDTH}x{HEIGHT}, {FRAMES} frames per scenario")
+    print(f"{'scenario':<9} {'path':<5} {'encode ms':>10} {'decode ms':>10} {'peak frames':>12} {'KB/frame':>9}")
+    for scenario in SCENARIOS:
+        frames = capture_frames(scenario)
+        framebuffers = []
+        for mode in ('rgb', 'bgra'):
+            encode_ms, decode_ms, peak, size, decoder = run(frames, mode)
+            framebuffers.append(decoder.framebuffer)
+            print(f"{scenario:<9} {mode:<5} {encode_ms * 1000:10.2f} {decode_ms * 1000:10.2f} "
+                  f"{peak / frame_bytes:12.2f} {size / 1024:9.1f}")
+        diff = cv2.absdiff(framebuffers[0], cv2.cvtColor(framebuffers[1], cv2.COLOR_BGR2RGB)).max()
+        print(f"{scenario:<9} max pixel difference between paths: {diff}")
+
+if __name__ == "__main__":
+    main()
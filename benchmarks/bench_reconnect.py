@@ -0,0 +1,69 @@
+"""加密重连基准测试
+
+在本机回环上反复断开并重连 TCPClient，对比每次都做完整公钥握手与凭会话
+票据恢复会话的连接耗时和 CPU 时间（客户端与服务器在同一进程内，CPU 时间
+包含两端）。身份密钥分别使用 RSA 和 X25519。
+
+运行：python benchmarks/bench_reconnect.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.network.tcp_server import TCPServer
+from core.network.tcp_client import TCPClient
+from core.network.encryption import EncryptionManager, HAS_X25519, KEY_TYPE_RSA, KEY_TYPE_X25519
+from core.network.session import KnownServers
+
+PORT = 5093
+ROUNDS = 50
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.001)
+
+def run(port, manager, resumption):
+    server = TCPServer(port=port, encryption_manager=manager, session_resumption=resumption)
+    server.start()
+    # 服务器公钥指纹只记录在内存中，不写入用户的配置目录
+    client = TCPClient(encryption=True, encryption_manager=EncryptionManager(key_dir=None),
+                       known_servers=KnownServers(path=None))
+    wall = cpu = 0.0
+    resumed = 0
+    try:
+        for _ in range(ROUNDS):
+            start_wall, start_cpu = time.perf_counter(), time.process_time()
+            client.connect('127.0.0.1', port)
+            client.wait_connected()
+            wall += time.perf_counter() - start_wall
+            cpu += time.process_time() - start_cpu
+            resumed += client.resumed
+            if resumption:
+                # 等待服务器签发的票据，供下一次重连使用
+                wait_for(lambda: client.session_ticket is not None)
+            client.disconnect()
+            wait_for(lambda: not server.get_clients())
+    finally:
+        server.stop()
+    return wall / ROUNDS * 1000, cpu / ROUNDS * 1000, resumed
+
+def main():
+    key_types = [KEY_TYPE_RSA] + ([KEY_TYPE_X25519] if HAS_X25519 else [])
+    port = PORT
+    print(f"{'key':<8} {'mode':<8} {'connect ms':>11} {'cpu ms':>8} {'resumed':>8}")
+    with tempfile.TemporaryDirectory() as key_dir:
+        for key_type in key_types:
+            manager = EncryptionManager(key_dir=key_dir, key_type=key_type)
+            manager.load_identity_key()
+            for name, resumption in (('full', False), ('resumed', True)):
+                connect_ms, cpu_ms, resumed = run(port, manager, resumption)
+                port += 1
+                print(f"{key_type:<8} {name:<8} {connect_ms:11.2f} {cpu_ms:8.2f} {resumed:>5}/{ROUNDS}")
+
+if __name__ == "__main__":
+    main()
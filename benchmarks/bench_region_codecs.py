@@ -0,0 +1,87 @@
+"""按内容选择编码的基准测试
+
+在合成桌面截图语料（文字、深色文字、照片、背景、任务栏、图文混排）上
+对比各编码的字节数、编码耗时和 PSNR，以及 FrameEncoder 按块分类后混合
+编码的结果（auto）。无损编码的 PSNR 为 inf。
+
+运行：python benchmarks/bench_region_codecs.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.remote_desktop.frame_decoder import FrameDecoder
+from services.remote_desktop.frame_encoder import FrameEncoder
+from services.remote_desktop.image_processing import ImageProcessing
+from services.remote_desktop.region_classifier import RegionClassifier
+from services.remote_desktop.synthetic_source import SyntheticDesktop
+
+CODECS = ('jpeg', 'webp', 'png', 'zlib', 'palette')
+ROUNDS = 5
+
+def psnr(original, decoded):
+    mse = np.mean((original.astype(np.float64) - decoded) ** 2)
+    return float('inf') if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+
+def measure(encode, decode, img):
+    data = encode(img)
+    if data is None:
+        return None
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        encode(img)
+    elapsed = (time.perf_counter() - start) / ROUNDS
+    return len(data), elapsed * 1000, psnr(img, decode(data))
+
+def auto_codec(img):
+    # 把语料当作一帧整帧编码，由 FrameEncoder 按块分类
+    def encode(img):
+        encoder = FrameEncoder(cache_size=0)
+        return encoder.encode(img)
+
+    def decode(data):
+        decoder = FrameDecoder()
+        decoder.decode(data)
+        return decoder.framebuffer
+    return encode, decode
+
+def main():
+    image_processing = ImageProcessing(quality=80)
+    classifier = RegionClassifier()
+    corpus = SyntheticDesktop().corpus()
+
+    print(f"{'content':<11} {'photo':>6} " + ' '.join(f"{codec:>19}" for codec in CODECS + ('auto',)))
+    print(f"{'':<11} {'tiles':>6} " + ' '.join(f"{'KB   ms  PSNR':>19}" for _ in CODECS + ('auto',)))
+    for name, img in corpus:
+        photo = classifier.classify(img).mean()
+        cells = []
+        for codec in CODECS:
+            shape = img.shape[:2]
+            result = measure(
+                lambda img: image_processing.compress_image(img, codec),
+                lambda data: image_processing.decompress_image(data, codec, shape),
+                img)
+            cells.append(result)
+        cells.append(measure(*auto_codec(img), img))
+        row = []
+        for result in cells:
+            if result is None:
+                row.append(f"{'n/a':>19}")
+            else:
+                size, ms, quality = result
+                row.append(f"{size / 1024:7.1f} {ms:5.1f} {quality:5.1f}")
+        print(f"{name:<11} {photo:6.0%} " + ' '.join(row))
+
+    frame = SyntheticDesktop().next_frame()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        classifier.classify(frame)
+    print(f"\nclassify 1920x1080: {(time.perf_counter() - start) / ROUNDS * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    main()
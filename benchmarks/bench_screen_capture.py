@@ -0,0 +1,46 @@
+"""屏幕捕获基准测试
+
+对比常驻的 MSSGrabber 与各平台的截图命令（Linux 上每帧启动 scrot/xwd，
+Windows 上每帧创建 mss），输出每帧耗时和可达到的帧率。需要图形会话，
+无显示器的 Linux 环境可在 Xvfb 中运行：
+
+    xvfb-run -s "-screen 0 1920x1080x24" python benchmarks/bench_screen_capture.py
+"""
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.remote_desktop.screen_capture import ScreenCapture
+
+FRAMES = 60
+
+def measure(capture, frames):
+    img = capture()  # 预热：建立显示连接、分配缓冲区
+    if img is None:
+        return None, None
+    start = time.perf_counter()
+    for _ in range(frames):
+        capture()
+    elapsed = (time.perf_counter() - start) / frames
+    return img.shape, elapsed
+
+def main():
+    persistent = ScreenCapture()
+    fallback = ScreenCapture(use_grabber=False)
+    cases = (
+        ('persistent grabber', persistent.capture, FRAMES),
+        ('per-frame command', fallback.capture, max(3, FRAMES // 10)),
+    )
+    for name, capture, frames in cases:
+        shape, elapsed = measure(capture, frames)
+        if shape is None:
+            print(f"{name:<20} capture failed")
+            continue
+        print(f"{name:<20} {shape[1]}x{shape[0]}  {elapsed * 1000:8.2f} ms/frame  {1 / elapsed:7.1f} fps")
+    persistent.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""TCP 接收路径基准测试
+
+对比旧的 `data += packet` 逐块拼接与 FrameReader 的 recv_into 零拷贝接收，
+在本机回环上分别发送 1 MB 和 8 MB 的负载，输出吞吐量（MB/s）以及每帧的
+内存分配次数和峰值内存。
+
+分片路径（按 64KB 分片发送，与 OutboundQueue 相同）对比旧的重组方式
+（每条消息新建 bytearray，分片先收进负载缓冲区再复制过去）与分片直接
+recv_into 到通道的可复用重组缓冲区。
+
+运行：python benchmarks/bench_tcp_receive.py
+"""
+import os
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.network.protocol import (
+    FLAG_MORE_FRAGMENTS, FrameReader, build_message, parse_header, resolve_message_type,
+    send_fragment
+)
+from core.network.send_queue import DEFAULT_FRAGMENT_SIZE
+
+class CountingSocket:
+    """统计接收路径中产生的新缓冲区对象"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.allocations = 0
+
+    def recv(self, size):
+        self.allocations += 1
+        return self.sock.recv(size)
+
+    def recv_into(self, buffer, size=0):
+        return self.sock.recv_into(buffer, size)
+
+def legacy_read(sock, length):
+    """基线：旧版接收循环（每次 recv 新建 bytes，拼接再复制一次）"""
+    data = b''
+    while len(data) < length:
+        packet = sock.recv(min(4096, length - len(data)))
+        if not packet:
+            break
+        data += packet
+        if isinstance(sock, CountingSocket):
+            sock.allocations += 1
+    return data
+
+class CopyingReader(FrameReader):
+    """基线：旧的分片重组（每条消息新建 bytearray，逐个分片复制）"""
+
+    def read_message(self):
+        buffer = bytearray()
+        while True:
+            if not self._recv_into(self._header_view):
+                return None
+            flags, channel, type_id, length = parse_header(self._header_buf)
+            buffer += self._recv_payload(length)
+            if not flags & FLAG_MORE_FRAGMENTS:
+                message_type, data = resolve_message_type(flags, type_id, memoryview(buffer))
+                return message_type, data, channel
+
+def _connected_pair():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    sender = socket.create_connection(listener.getsockname())
+    receiver, _ = listener.accept()
+    listener.close()
+    return sender, receiver
+
+def _send_frames(sock, message, count):
+    for _ in range(count):
+        sock.sendall(message)
+
+def _send_fragmented(sock, payload, count):
+    view = memoryview(payload)
+    for _ in range(count):
+        for offset in range(0, len(view), DEFAULT_FRAGMENT_SIZE):
+            end = offset + DEFAULT_FRAGMENT_SIZE
+            send_fragment(sock, 'screen_frame', view[offset:end], 2, offset == 0, end < len(view))
+
+def run(payload_size, count, use_reader, trace=False, fragmented=False):
+    sender, receiver = _connected_pair()
+    payload = os.urandom(payload_size)
+    message = build_message('screen_frame', payload)
+    header_size = len(message) - payload_size
+    sock = CountingSocket(receiver)
+    if fragmented:
+        reader = (FrameReader if use_reader else CopyingReader)(sock, protocol='binary')
+        thread = threading.Thread(target=_send_fragmented, args=(sender, payload, count))
+    else:
+        reader = FrameReader(sock, protocol='binary')
+        thread = threading.Thread(target=_send_frames, args=(sender, message, count))
+    thread.daemon = True
+
+    peak = growth = 0
+    start = time.perf_counter()
+    thread.start()
+    for index in range(count):
+        if trace:
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        if use_reader or fragmented:
+            message_type, data, _ = reader.read_message()
+        else:
+            legacy_read(receiver, header_size)
+            data = legacy_read(sock, payload_size)
+        assert len(data) == payload_size
+        if trace:
+            frame_peak = tracemalloc.get_traced_memory()[1]
+            peak = max(peak, frame_peak)
+            if index:
+                # 首条消息的缓冲区扩容不计入
+                growth += (frame_peak - current) / (count - 1)
+    elapsed = time.perf_counter() - start
+    thread.join()
+    sender.close()
+    receiver.close()
+
+    mb_per_s = payload_size * count / elapsed / (1024 * 1024)
+    return mb_per_s, sock.allocations / count, peak, growth
+
+def main():
+    for payload_size, count in ((1024 * 1024, 200), (8 * 1024 * 1024, 30)):
+        label = f"{payload_size // (1024 * 1024)} MB"
+        for name, use_reader in (('legacy += 4096', False), ('recv_into', True)):
+            mb_per_s, _, _, _ = run(payload_size, count, use_reader)
+            # 分配统计单独运行，tracemalloc 会拖慢吞吐量
+            tracemalloc.start()
+            _, allocations, peak, _ = run(payload_size, max(3, count // 10), use_reader, trace=True)
+            tracemalloc.stop()
+            print(f"{label:>5} {name:<15} {mb_per_s:9.1f} MB/s  "
+                  f"{allocations:8.1f} allocs/frame  peak {peak / (1024 * 1024):7.2f} MB")
+        for name, use_reader in (('frag copy', False), ('frag recv_into', True)):
+            mb_per_s, _, _, _ = run(payload_size, count, use_reader, fragmented=True)
+            tracemalloc.start()
+            _, _, peak, growth = run(payload_size, max(3, count // 10), use_reader, trace=True,
+                                     fragmented=True)
+            tracemalloc.stop()
+            # 重组缓冲区复用后，稳定状态下每条消息不再新分配内存
+            print(f"{label:>5} {name:<15} {mb_per_s:9.1f} MB/s  "
+                  f"new {growth / (1024 * 1024):7.2f} MB/frame  peak {peak / (1024 * 1024):7.2f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""块缓存基准测试
+
+在合成桌面上反复切换窗口、来回移动窗口，对比不启用块缓存与不同容量、
+淘汰策略下的每帧字节数、编码 CPU 耗时和命中率，并检查观看端还原的画面
+与不启用缓存时一致。
+
+运行：python benchmarks/bench_tile_cache.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.remote_desktop.frame_decoder import FrameDecoder
+from services.remote_desktop.frame_encoder import FrameEncoder
+from services.remote_desktop.synthetic_source import SyntheticDesktop
+
+FRAMES = 60
+SCENARIOS = ('window_switch', 'typing')
+CACHES = ((0, 'lru'), (256, 'lru'), (256, 'fifo'), (2048, 'lru'))
+
+def run(scenario, cache_size, policy):
+    source = SyntheticDesktop(scenario=scenario)
+    encoder = FrameEncoder(cache_size=cache_size, cache_policy=policy)
+    decoder = FrameDecoder()
+    cpu = size = 0
+    error = 0.0
+    for _ in range(FRAMES):
+        frame = source.next_frame()
+        start = time.process_time()
+        payload = encoder.encode(frame)
+        cpu += time.process_time() - start
+        if payload is not None:
+            size += len(payload)
+            if decoder.decode(payload) is None:
+                raise RuntimeError("viewer lost sync")
+        error = max(error, float(np.abs(decoder.framebuffer.astype(np.int16) - frame).mean()))
+    hit_rate = encoder.get_stats()['tile_cache']['hit_rate']
+    return cpu / FRAMES * 1000, size / FRAMES, hit_rate, error
+
+def main():
+    print(f"{'scenario':<14} {'cache':>6} {'policy':>6} {'ms':>7} {'KB':>8} {'hit rate':>9} {'mean err':>9}")
+    for scenario in SCENARIOS:
+        for cache_size, policy in CACHES:
+            ms, size, hit_rate, error = run(scenario, cache_size, policy)
+            print(f"{scenario:<14} {cache_size:6} {policy:>6} {ms:7.2f} {size / 1024:8.1f} "
+                  f"{hit_rate:9.1%} {error:9.2f}")
+
+if __name__ == "__main__":
+    main()
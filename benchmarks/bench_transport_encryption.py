@@ -0,0 +1,80 @@
+"""传输层加密开销基准测试
+
+在本机回环上用 TCPServer/TCPClient 发送消息，对比不加密与 AES-GCM、
+ChaCha20-Poly1305 会话加密，负载大小覆盖输入事件、文件块和屏幕帧。
+输出握手耗时、吞吐量（MB/s）和每条消息的耗时，以及加密相对不加密
+每条消息多出的微秒数。
+
+运行：python benchmarks/bench_transport_encryption.py
+"""
+import os
+import sys
+import threading
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.network.tcp_server import TCPServer
+from core.network.tcp_client import TCPClient
+from core.network.encryption import CIPHER_AES_GCM, CIPHER_CHACHA20_POLY1305
+from core.network.session import KnownServers
+
+PORT = 5091
+# (负载大小, 消息条数)
+CASES = ((64, 20000), (64 * 1024, 2000), (1024 * 1024, 200))
+MODES = (('plain', None), ('aes-gcm', CIPHER_AES_GCM), ('chacha20', CIPHER_CHACHA20_POLY1305))
+
+def run(server, payload_size, count, algorithm):
+    received = [0]
+    done = threading.Event()
+
+    def on_message(data, client_id):
+        received[0] += 1
+        if received[0] == count:
+            done.set()
+
+    server.register_handler('file_data', on_message, zero_copy=True)
+    # 服务器公钥指纹只记录在内存中，不写入用户的配置目录
+    client = TCPClient(queue_size=256, encryption=algorithm is not None,
+                       cipher_algorithm=algorithm or CIPHER_AES_GCM,
+                       known_servers=KnownServers(path=None))
+    start = time.perf_counter()
+    client.connect('127.0.0.1', PORT)
+    connected = client.wait_connected()
+    handshake = time.perf_counter() - start
+    if not connected:
+        raise RuntimeError("Connection failed")
+
+    payload = os.urandom(payload_size)
+    start = time.perf_counter()
+    for _ in range(count):
+        client.send_message('file_data', payload)
+    done.wait(60)
+    elapsed = time.perf_counter() - start
+    client.disconnect()
+    time.sleep(0.1)
+
+    mb_per_s = payload_size * count / elapsed / (1024 * 1024)
+    return handshake * 1000, mb_per_s, elapsed / count * 1e6
+
+def main():
+    server = TCPServer(port=PORT)
+    # 预先生成服务器的RSA密钥，不计入握手耗时
+    server.encryption_manager.load_identity_key()
+    server.start()
+    try:
+        print(f"{'payload':>9} {'mode':<10} {'handshake ms':>12} {'MB/s':>9} {'us/msg':>9} {'overhead us':>12}")
+        for payload_size, count in CASES:
+            baseline = None
+            for name, algorithm in MODES:
+                handshake_ms, mb_per_s, us_per_msg = run(server, payload_size, count, algorithm)
+                if baseline is None:
+                    baseline = us_per_msg
+                print(f"{payload_size:>9} {name:<10} {handshake_ms:12.2f} {mb_per_s:9.1f} "
+                      f"{us_per_msg:9.1f} {us_per_msg - baseline:12.1f}")
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""观看端解码基准测试
+
+在合成桌面上先由主控端编码好一段 1080p 画面，再在观看端反复解码。对比
+旧的解码方式（每个区域 decompress_image 得到新数组再贴到帧缓冲区，块缓存
+插入时复制新数组）与直接解码到帧缓冲区、复用淘汰块数组的 FrameDecoder。
+
+输出每帧解码耗时和每帧临时分配的内存峰值（tracemalloc，另外单独一遍
+统计，不影响计时），并检查两种方式还原的画面一致。
+
+运行：python benchmarks/bench_viewer_decode.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.remote_desktop.frame_decoder import FrameDecoder
+from services.remote_desktop.frame_encoder import FrameEncoder
+from services.remote_desktop.frame_protocol import CODEC_NAMES
+from services.remote_desktop.synthetic_source import SyntheticDesktop
+
+FRAMES = 60
+ROUNDS = 3
+SCENARIOS = ('typing', 'window_switch', 'window_move', 'video')
+
+class AllocatingDecoder(FrameDecoder):
+    """旧的解码方式：解码为新数组后再复制到帧缓冲区"""
+
+    def _apply_pixels(self, region):
+        img = self.image_processing.decompress_image(region.data, CODEC_NAMES.get(region.codec),
+                                                     (region.height, region.width), self.pixel_format)
+        if img is None or img.shape[:2] != (region.height, region.width):
+            return False
+        x, y, w, h = region.rect
+        self.framebuffer[y:y + h, x:x + w] = img[..., :3]
+        tile = self.tile_size
+        if self.cache.capacity and tile:
+            for ty in range(y, y + h - tile + 1, tile):
+                for tx in range(x, x + w - tile + 1, tile):
+                    self.cache.insert(value=self.framebuffer[ty:ty + tile, tx:tx + tile].copy())
+        return True
+
+def record(scenario):
+    source = SyntheticDesktop(scenario=scenario)
+    encoder = FrameEncoder(cache_size=256)
+    payloads = []
+    for _ in range(FRAMES):
+        payload = encoder.encode(source.next_frame())
+        if payload is not None:
+            payloads.append(payload)
+    encoder.close()
+    return payloads
+
+def decode_all(decoder_class, payloads):
+    decoder = decoder_class()
+    for payload in payloads:
+        if decoder.decode(payload) is None:
+            raise RuntimeError("viewer lost sync")
+    return decoder
+
+def timing(decoder_class, payloads):
+    decode_all(decoder_class, payloads)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        decode_all(decoder_class, payloads)
+    return (time.perf_counter() - start) / ROUNDS / len(payloads) * 1000
+
+def allocations(decoder_class, payloads):
+    # 每帧解码期间超出解码前占用的内存峰值
+    decoder = decoder_class()
+    decoder.decode(payloads[0])
+    tracemalloc.start()
+    peak = 0
+    for payload in payloads[1:]:
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        decoder.decode(payload)
+        peak += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return peak / max(1, len(payloads) - 1)
+
+def main():
+    print(f"{FRAMES} frames per scenario, 1920x1080")
+    print(f"{'scenario':<14} {'decoder':<11} {'ms/frame':>9} {'KB alloc':>9} {'same':>5}")
+    for scenario in SCENARIOS:
+        payloads = record(scenario)
+        expected = decode_all(AllocatingDecoder, payloads).framebuffer
+        for name, decoder_class in (('allocating', AllocatingDecoder), ('in-place', FrameDecoder)):
+            same = np.array_equal(decode_all(decoder_class, payloads).framebuffer, expected)
+            print(f"{scenario:<14} {name:<11} {timing(decoder_class, payloads):9.2f} "
+                  f"{allocations(decoder_class, payloads) / 1024:9.1f} {str(same):>5}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""按观看端显示区域缩放的基准测试
+
+4K 合成桌面，观看端为竖屏手机（1080x2400）。对比按原始分辨率发送整个
+屏幕（full）与按显示区域裁剪/缩小后编码：缩放倍数 1 时整屏缩小到手机
+宽度，放大 2 倍、4 倍时只发送对应的一块（4 倍时裁剪区域不大于显示区域，
+按原始分辨率发送）。
+
+输出编码的分辨率、每帧的裁剪/缩小耗时、编码耗时和字节数，以及观看端
+画面中心换算回主控端屏幕的坐标。
+
+运行：python benchmarks/bench_viewport.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.remote_desktop.frame_decoder import FrameDecoder
+from services.remote_desktop.frame_encoder import FrameEncoder
+from services.remote_desktop.synthetic_source import SyntheticDesktop
+from services.remote_desktop.viewport import Viewport, apply_viewport
+
+WIDTH, HEIGHT = 3840, 2160
+FRAMES = 20
+SCENARIOS = ('video', 'typing')
+VIEWPORTS = (
+    ('full', None),
+    ('zoom 1x', Viewport(1080, 2400)),
+    ('zoom 2x', Viewport(1080, 2400, zoom=2.0, center_x=0.3, center_y=0.4)),
+    ('zoom 4x', Viewport(1080, 2400, zoom=4.0, center_x=0.3, center_y=0.4)),
+)
+
+def run(scenario, viewport):
+    source = SyntheticDesktop(WIDTH, HEIGHT, scenario=scenario)
+    encoder = FrameEncoder(cache_size=0, workers=1)
+    decoder = FrameDecoder()
+    scale_time = encode_time = 0.0
+    size = 0
+    buffer = None
+    for _ in range(FRAMES):
+        frame = source.next_frame()
+        start = time.perf_counter()
+        (x, y, w, h), (out_w, out_h) = (viewport or Viewport()).plan(WIDTH, HEIGHT)
+        if buffer is None:
+            buffer = np.empty((out_h, out_w, 3), dtype=np.uint8)
+        img, rect = apply_viewport(frame, viewport, dst=buffer)
+        encoder.set_source_rect(rect)
+        scaled = time.perf_counter()
+        payload = encoder.encode(img)
+        encode_time += time.perf_counter() - scaled
+        scale_time += scaled - start
+        if payload is not None:
+            size += len(payload)
+            decoder.decode(payload)
+    encoder.close()
+    # 观看端画面中心对应的屏幕坐标
+    center = decoder.to_screen(out_w // 2, out_h // 2)
+    return scale_time / FRAMES, encode_time / FRAMES, size / FRAMES, (out_w, out_h), center
+
+def main():
+    print(f"{WIDTH}x{HEIGHT} desktop, {FRAMES} frames")
+    print(f"{'scenario':<9} {'viewport':<9} {'output':>10} {'scale ms':>9} {'encode ms':>10} "
+          f"{'KB/frame':>9} {'center on screen':>17}")
+    for scenario in SCENARIOS:
+        for name, viewport in VIEWPORTS:
+            scale_time, encode_time, size, (out_w, out_h), center = run(scenario, viewport)
+            print(f"{scenario:<9} {name:<9} {f'{out_w}x{out_h}':>10} {scale_time * 1000:9.2f} "
+                  f"{encode_time * 1000:10.2f} {size / 1024:9.1f} {str(center):>17}")
+
+if __name__ == "__main__":
+    main()
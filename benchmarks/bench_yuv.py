@@ -0,0 +1,56 @@
+"""YUV 平面传输基准测试
+
+在合成桌面截图语料和整帧上对比 JPEG（quality 80）与 'yuv' 格式（4:4:4 /
+4:2:2 / 4:2:0 色度抽样 + zlib）：字节数、压缩/解压耗时和 PSNR，以及只解压
+出 Y/U/V 平面（观看端直接上传纹理，不转换为 RGB）的耗时。
+
+运行：python benchmarks/bench_yuv.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.remote_desktop.image_processing import ImageProcessing
+from services.remote_desktop.synthetic_source import SyntheticDesktop
+from services.remote_desktop.yuv import SUBSAMPLING_FACTORS
+
+ROUNDS = 5
+
+def psnr(original, decoded):
+    mse = np.mean((original.astype(np.float64) - decoded) ** 2)
+    return float('inf') if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+
+def timed(func, *args):
+    result = func(*args)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func(*args)
+    return result, (time.perf_counter() - start) / ROUNDS * 1000
+
+def main():
+    image_processing = ImageProcessing(quality=80)
+    desktop = SyntheticDesktop()
+    corpus = desktop.corpus() + [('full_frame', desktop.next_frame().copy())]
+    modes = [('jpeg', None)] + [('yuv', subsampling) for subsampling in SUBSAMPLING_FACTORS]
+
+    print(f"{'content':<11} {'mode':<8} {'KB':>8} {'enc ms':>7} {'dec ms':>7} {'planes ms':>9} {'PSNR':>6}")
+    for name, img in corpus:
+        shape = img.shape[:2]
+        for compression, subsampling in modes:
+            if subsampling:
+                image_processing.set_chroma_subsampling(subsampling)
+            data, encode_ms = timed(image_processing.compress_image, img, compression)
+            decoded, decode_ms = timed(image_processing.decompress_image, data, compression, shape)
+            planes = f"{timed(image_processing.decompress_planes, data, shape)[1]:9.2f}" \
+                if subsampling else f"{'-':>9}"
+            label = f"yuv{subsampling}" if subsampling else compression
+            print(f"{name:<11} {label:<8} {len(data) / 1024:8.1f} {encode_ms:7.2f} {decode_ms:7.2f} "
+                  f"{planes} {psnr(img, decoded):6.1f}")
+
+if __name__ == "__main__":
+    main()
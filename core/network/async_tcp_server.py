@@ -0,0 +1,715 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .protocol import (
+    FLAG_ENCRYPTED, HEADER_SIZE, MAGIC, PROTOCOL_BINARY, PROTOCOL_JSON, FragmentAssembler,
+    ProtocolError, decrypt_payload, encode_message_header, fragment_buffers, get_channel,
+    parse_header, parse_json_header, resolve_message_type
+)
+from .encryption import encryption_manager as default_encryption_manager
+from .session import (
+    HANDSHAKE_MESSAGES, HELLO_TIMEOUT, SessionTicketCache, parse_hello, accept_session_key
+)
+from .send_queue import OutboundQueue, OVERFLOW_BLOCK, DEFAULT_TYPE_POLICIES
+
+# 每个 (客户端, 通道) 最多排队等待处理的消息数，超出时暂停读取该连接
+MAX_PENDING_MESSAGES = 256
+# 一次交给线程池的阻塞处理函数的最大条数
+HANDLER_BATCH_SIZE = 32
+
+# 连接接收缓冲区的大小；帧头和小块数据先读入接收缓冲区再复制出来，
+# 接收缓冲区为空时不小于 DIRECT_READ_SIZE 的读取直接写入调用方的缓冲区
+RECEIVE_BUFFER_SIZE = 256 * 1024
+DIRECT_READ_SIZE = 4096
+
+class BufferedConnection(asyncio.BufferedProtocol):
+    """一个客户端连接的传输层协议
+
+    接收使用 BufferedProtocol，传输层直接 recv_into 到可复用的缓冲区，
+    不像 StreamReader.readexactly 那样为每次读取分配 bytes：帧头和小消息
+    从连接的接收缓冲区复制，消息负载和分片直接写入调用方给出的缓冲区。
+    接收缓冲区写满时暂停读取，对端因此受到 TCP 流控。
+
+    发送接口与 StreamWriter 相同（write/writelines/drain/close）。
+    """
+
+    def __init__(self, on_connect):
+        self.on_connect = on_connect
+        self.task = None
+        self.transport = None
+        self._buffer = bytearray(RECEIVE_BUFFER_SIZE)
+        self._view = memoryview(self._buffer)
+        self._start = 0  # 接收缓冲区中未消费数据的范围
+        self._end = 0
+        self._target = None  # 直接读取的目标视图
+        self._offset = 0
+        self._waiter = None
+        self._paused = False
+        self._eof = False
+        self._write_paused = False
+        self._drain_waiter = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        # 保留处理该连接的任务的引用，避免被垃圾回收
+        self.task = self.on_connect(self)
+
+    def get_buffer(self, sizehint):
+        if self._target is not None:
+            return self._target[self._offset:]
+        if self._start == self._end:
+            self._start = self._end = 0
+        elif self._start and len(self._buffer) - self._end < DIRECT_READ_SIZE:
+            # 尾部空间不足，把未消费的数据移到开头
+            size = self._end - self._start
+            self._buffer[:size] = self._buffer[self._start:self._end]
+            self._start, self._end = 0, size
+        return self._view[self._end:]
+
+    def buffer_updated(self, nbytes):
+        if self._target is not None:
+            self._offset += nbytes
+            if self._offset == len(self._target):
+                self._wake(self._waiter)
+            return
+        self._end += nbytes
+        if self._end - self._start == len(self._buffer):
+            self.transport.pause_reading()
+            self._paused = True
+        self._wake(self._waiter)
+
+    def eof_received(self):
+        self._eof = True
+        self._wake(self._waiter)
+        return False
+
+    def connection_lost(self, exc):
+        self._eof = True
+        self._wake(self._waiter)
+        self._wake(self._drain_waiter)
+
+    def pause_writing(self):
+        self._write_paused = True
+
+    def resume_writing(self):
+        self._write_paused = False
+        self._wake(self._drain_waiter)
+
+    @staticmethod
+    def _wake(waiter):
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    async def _wait(self):
+        """等待传输层收到新数据（或直接读取完成、连接关闭）"""
+        self._waiter = asyncio.get_running_loop().create_future()
+        try:
+            await self._waiter
+        finally:
+            self._waiter = None
+
+    def _consume(self, n):
+        self._start += n
+        if self._paused:
+            self._paused = False
+            self.transport.resume_reading()
+
+    async def peek(self):
+        """查看下一个字节但不消费，连接关闭时返回 None"""
+        while self._start == self._end:
+            if self._eof:
+                return None
+            await self._wait()
+        return self._buffer[self._start]
+
+    async def recv_into(self, view):
+        """读满指定的缓冲区，连接关闭时返回 False"""
+        offset = 0
+        size = len(view)
+        while offset < size:
+            available = self._end - self._start
+            if available:
+                n = min(size - offset, available)
+                view[offset:offset + n] = self._view[self._start:self._start + n]
+                self._consume(n)
+                offset += n
+            elif self._eof:
+                return False
+            elif size - offset >= DIRECT_READ_SIZE:
+                # 接收缓冲区已空，剩余部分直接接收到目标缓冲区
+                self._target = view[offset:]
+                self._offset = 0
+                try:
+                    await self._wait()
+                finally:
+                    offset += self._offset
+                    self._target = None
+            else:
+                await self._wait()
+        return True
+
+    async def read_line(self, limit):
+        """读取以换行结尾的一行（含换行符），连接关闭时返回 None
+
+        Raises:
+            ProtocolError: 行长度超过 limit
+        """
+        while True:
+            index = self._buffer.find(b'\n', self._start, self._end)
+            if index >= 0:
+                line = bytes(self._view[self._start:index + 1])
+                self._consume(index + 1 - self._start)
+                return line
+            if self._end - self._start >= limit:
+                raise ProtocolError("JSON header too long")
+            if self._eof:
+                return None
+            await self._wait()
+
+    def write(self, data):
+        self.transport.write(data)
+
+    def writelines(self, buffers):
+        self.transport.writelines(buffers)
+
+    async def drain(self):
+        """等待传输层的发送缓冲区降到低水位以下
+
+        Raises:
+            ConnectionResetError: 连接已关闭
+        """
+        if self.transport.is_closing():
+            raise ConnectionResetError("Connection lost")
+        if not self._write_paused:
+            return
+        self._drain_waiter = asyncio.get_running_loop().create_future()
+        try:
+            await self._drain_waiter
+        finally:
+            self._drain_waiter = None
+        if self.transport.is_closing():
+            raise ConnectionResetError("Connection lost")
+
+    def get_extra_info(self, name, default=None):
+        return self.transport.get_extra_info(name, default)
+
+    def close(self):
+        self.transport.close()
+        # 传输层要等发送缓冲区写完才会通知连接关闭，读取立即结束
+        self._eof = True
+        self._wake(self._waiter)
+
+class AsyncTCPServer:
+    """基于 asyncio 的 TCP 服务器
+
+    与 TCPServer 提供相同的 register_handler/send_message/broadcast_message
+    接口，所有连接由一个事件循环线程处理。消息直接接收到每个连接可复用的
+    缓冲区中（见 BufferedConnection）。每个 (客户端, 通道) 一个处理协程，
+    同一通道的消息按接收顺序处理，读取协程不等待处理函数；阻塞的处理函数
+    在线程池中执行，协程处理函数直接在事件循环中等待。加密握手与 TCPServer
+    相同。
+
+    发送与 TCPServer 一样经过每个连接的 OutboundQueue：每个连接一个写协程
+    按通道优先级取出 64KB 分片写入，每个分片都等待传输层缓冲区排空
+    （drain），慢客户端只会填满自己的有界发送队列。
+    """
+
+    def __init__(self, port=5001, allow_legacy=True, max_workers=8, encryption=True,
+                 require_encryption=False, encryption_manager=None, session_resumption=True,
+                 ticket_cache=None, queue_size=64, overflow_policy=OVERFLOW_BLOCK,
+                 type_policies=None, block_timeout=None):
+        self.port = port
+        self.allow_legacy = allow_legacy
+        self.encryption = encryption
+        self.require_encryption = require_encryption
+        self.encryption_manager = encryption_manager or default_encryption_manager
+        self.ticket_cache = None
+        if session_resumption:
+            self.ticket_cache = ticket_cache or SessionTicketCache()
+        self.max_workers = max_workers
+        # 每个连接的发送队列配置，见 OutboundQueue
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.type_policies = DEFAULT_TYPE_POLICIES if type_policies is None else type_policies
+        self.block_timeout = block_timeout
+        self.clients = {}
+        self.handlers = {}
+        self.zero_copy_types = set()  # 直接接收 memoryview 的消息类型
+        self.running = False
+        self.loop = None
+        self.server = None
+        self.executor = None
+        self.loop_thread = None
+        self._started = threading.Event()
+        self._start_error = None
+
+    def start(self):
+        self.running = True
+        if self.encryption:
+            # 首次运行时身份密钥在后台生成，不阻塞启动
+            self.encryption_manager.prepare_identity_key()
+        self._started.clear()
+        self._start_error = None
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                           thread_name_prefix='tcp-handler')
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self._run_loop)
+        self.loop_thread.daemon = True
+        self.loop_thread.start()
+        self._started.wait()
+        if self._start_error:
+            self.running = False
+            raise self._start_error
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        if self.loop and self.loop.is_running():
+            future = asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop)
+            try:
+                future.result(2)
+            except Exception as e:
+                print(f"Async TCP server shutdown error: {e}")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.loop_thread:
+            self.loop_thread.join(1)
+        if self.executor:
+            self.executor.shutdown(wait=False)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                self.loop.create_server(self._create_connection, '', self.port)
+            )
+        except Exception as e:
+            self._start_error = e
+            self._started.set()
+            self.loop.close()
+            return
+        self._started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    async def _shutdown(self):
+        if self.server:
+            self.server.close()
+        tasks = []
+        for client_id, client in list(self.clients.items()):
+            self._close_client(client_id)
+            tasks.append(client['writer'].task)
+            if 'write_task' in client:
+                tasks.append(client['write_task'])
+            # 停止时不再处理排队中的消息
+            for lane in client['lanes'].values():
+                lane['task'].cancel()
+                tasks.append(lane['task'])
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.server:
+            await self.server.wait_closed()
+
+    def _create_connection(self):
+        return BufferedConnection(
+            lambda connection: self.loop.create_task(self._handle_client(connection))
+        )
+
+    async def _handle_client(self, connection):
+        client_address = connection.get_extra_info('peername')
+        client_id = f"{client_address[0]}:{client_address[1]}"
+        client = {
+            'writer': connection,
+            'address': client_address,
+            'protocol': None,
+            # 帧头和负载的接收缓冲区在连接的生命周期内复用，分片直接接收到
+            # 所在通道的重组缓冲区
+            'header': bytearray(HEADER_SIZE),
+            'payload': bytearray(),
+            'assembler': FragmentAssembler(),
+            # 通道 -> 待处理消息队列，每个通道一个处理协程，按接收顺序处理
+            'lanes': {},
+            'queue': OutboundQueue(self.queue_size, self.overflow_policy,
+                                   self.type_policies, self.block_timeout),
+            'wakeup': asyncio.Event(),  # 发送队列有新消息时唤醒写协程
+            # 握手完成（或确定不加密）后写协程才开始发送
+            'ready': False,
+            'handshake': None,
+            'cipher': None,
+            'last_active': time.time()
+        }
+        self.clients[client_id] = client
+        if not self.encryption:
+            # 不接受加密会话，无需等待 hello
+            self._set_ready(client_id, client)
+        else:
+            client['hello_timer'] = self.loop.call_later(
+                HELLO_TIMEOUT, self._hello_timeout, client_id, client
+            )
+
+        try:
+            while self.running:
+                message = await self._read_message(connection, client)
+                if message is None:
+                    break
+                message_type, data, channel = message
+
+                if message_type in HANDSHAKE_MESSAGES:
+                    await self._handle_handshake(client_id, client, message_type, data)
+                else:
+                    if not client['ready']:
+                        self._check_unencrypted(client_id, client)
+                    await self._process_message(message_type, data, client_id, client, channel)
+                client['last_active'] = time.time()
+        except ConnectionError:
+            pass
+        except Exception as e:
+            if self.running:
+                print(f"TCP client {client_id} error: {e}")
+        finally:
+            self._close_client(client_id)
+            # 已排队的消息处理完后处理协程退出
+            for lane in client['lanes'].values():
+                await lane['queue'].put(None)
+
+    async def _read_message(self, connection, client):
+        """读取一条完整的消息，首条消息决定该连接使用的协议
+
+        Returns:
+            (消息类型, 负载 memoryview, 通道)，连接关闭时返回 None；
+            负载在读取下一条消息前有效
+        """
+        if client['protocol'] is None:
+            first = await connection.peek()
+            if first is None:
+                return None
+            if first == MAGIC[0]:
+                client['protocol'] = PROTOCOL_BINARY
+            else:
+                if not self.allow_legacy:
+                    raise ProtocolError("Legacy JSON protocol not allowed")
+                client['protocol'] = PROTOCOL_JSON
+
+        if client['protocol'] == PROTOCOL_JSON:
+            line = await connection.read_line(65536)
+            if line is None:
+                return None
+            message_type, data_length = parse_json_header(line[:-1])
+            data = await self._recv_payload(connection, client, data_length)
+            if data is None:
+                return None
+            return message_type, data, get_channel(message_type)
+
+        header = memoryview(client['header'])
+        assembler = client['assembler']
+        while True:
+            if not await connection.recv_into(header):
+                return None
+            flags, channel, type_id, length = parse_header(header)
+            if client['cipher'] is not None and not flags & FLAG_ENCRYPTED:
+                raise ProtocolError("Unencrypted frame in encrypted session")
+            if not assembler.is_fragment(flags, channel):
+                data = await self._recv_payload(connection, client, length)
+                if data is None:
+                    return None
+                if flags & FLAG_ENCRYPTED:
+                    data = decrypt_payload(client['cipher'], header, data)
+                message_type, data = resolve_message_type(flags, type_id, data)
+                return message_type, data, channel
+
+            view = assembler.reserve(flags, channel, type_id, length)
+            if not await connection.recv_into(view):
+                return None
+            if flags & FLAG_ENCRYPTED:
+                view = decrypt_payload(client['cipher'], header, view)
+            message = assembler.commit(flags, channel, view.nbytes)
+            if message is not None:
+                return message[0], message[1], channel
+
+    async def _recv_payload(self, connection, client, length):
+        """把消息负载接收到连接的可复用缓冲区中，见 FrameReader._recv_payload"""
+        if len(client['payload']) < length:
+            client['payload'] = bytearray(1 << max(16, (length - 1).bit_length()))
+        view = memoryview(client['payload'])[:length]
+        if not await connection.recv_into(view):
+            return None
+        return view
+
+    async def _handle_handshake(self, client_id, client, message_type, data):
+        """处理 hello 和加密握手消息，见 TCPServer._handle_handshake"""
+        if message_type == 'hello':
+            _, algorithm, resume = parse_hello(data)
+            # 不加密的 hello 只声明协议，可能在写协程已开始发送之后到达
+            if client['handshake'] or (algorithm is not None and client['ready']):
+                raise ProtocolError("Unexpected hello")
+            if algorithm is None:
+                self._check_unencrypted(client_id, client)
+                return
+            if not self.encryption:
+                raise ProtocolError("Encryption not supported")
+            # 握手开始后 hello 超时不再启动写协程
+            client['handshake'] = algorithm
+            if resume and self.ticket_cache:
+                resumed = self.ticket_cache.resume(resume[0], resume[1], algorithm)
+                if resumed:
+                    cipher, response = resumed
+                    await self._write_frame(client, 'session_resumed', response)
+                    client['handshake'] = None
+                    self._start_session(client_id, client, cipher)
+                    return
+            # 首次生成身份密钥较慢，不在事件循环中执行
+            public_key = await self.loop.run_in_executor(
+                self.executor, self.encryption_manager.get_identity_public_key
+            )
+            await self._write_frame(client, 'session_public_key', public_key)
+        elif message_type == 'session_key':
+            if not client['handshake']:
+                raise ProtocolError("Unexpected session key")
+            cipher = await self.loop.run_in_executor(
+                self.executor, accept_session_key, self.encryption_manager, bytes(data),
+                client['handshake']
+            )
+            client['handshake'] = None
+            self._start_session(client_id, client, cipher)
+        else:
+            raise ProtocolError(f"Unexpected handshake message: {message_type}")
+
+    def _start_session(self, client_id, client, cipher):
+        client['cipher'] = cipher
+        if self.ticket_cache:
+            client['queue'].put('session_ticket', self.ticket_cache.issue(cipher), block=False)
+        self._set_ready(client_id, client)
+
+    def _check_unencrypted(self, client_id, client):
+        if client['handshake']:
+            raise ProtocolError("Message before handshake completed")
+        if self.require_encryption:
+            raise ProtocolError("Encryption required")
+        self._set_ready(client_id, client)
+
+    def _hello_timeout(self, client_id, client):
+        """客户端没有及时发送 hello 且未开始握手时按不加密处理
+
+        旧版 JSON 客户端和只接收的客户端不会发送 hello，不必等到它的第一条消息。
+        """
+        if client_id not in self.clients or client['ready'] or client['handshake']:
+            return
+        if not self.require_encryption:
+            self._set_ready(client_id, client)
+
+    def _set_ready(self, client_id, client):
+        if client['ready']:
+            return
+        client['ready'] = True
+        timer = client.pop('hello_timer', None)
+        if timer is not None:
+            timer.cancel()
+        # 保留任务的引用，避免写协程被垃圾回收
+        client['write_task'] = self.loop.create_task(self._write_client(client_id, client))
+
+    def _close_client(self, client_id):
+        client = self.clients.pop(client_id, None)
+        if client:
+            client['queue'].close()
+            timer = client.pop('hello_timer', None)
+            if timer is not None:
+                timer.cancel()
+            # 写协程可能正等待慢客户端排空缓冲区
+            task = client.get('write_task')
+            if task is not None and task is not asyncio.current_task():
+                task.cancel()
+            try:
+                client['writer'].close()
+            except:
+                pass
+
+    async def _process_message(self, message_type, data, client_id, client, channel):
+        """把消息交给所在通道的处理协程，读取协程不等待处理函数
+
+        普通处理函数得到副本，读取协程继续读取，只在该通道排队的消息达到
+        MAX_PENDING_MESSAGES 时等待。零拷贝的处理函数得到接收缓冲区的视图，
+        读取协程要等它返回后才能读取下一条消息：通道空闲时直接调用，否则
+        排在该通道已有的消息之后。
+        """
+        handler = self.handlers.get(message_type)
+        if handler is None:
+            return
+        lane = client['lanes'].get(channel)
+        zero_copy = message_type in self.zero_copy_types
+        if zero_copy and (lane is None or not lane['pending']):
+            await self._call_handler(message_type, handler, data, client_id)
+            return
+        if lane is None:
+            lane = client['lanes'][channel] = {
+                'queue': asyncio.Queue(MAX_PENDING_MESSAGES),
+                'pending': 0,  # 已排队、尚未处理完的消息数
+            }
+            lane['task'] = self.loop.create_task(self._run_handlers(lane, client_id))
+        done = None
+        if zero_copy:
+            done = self.loop.create_future()
+        else:
+            # 加密和分片消息的负载是接收缓冲区的 memoryview，会被后续消息覆盖
+            data = bytes(data)
+        lane['pending'] += 1
+        await lane['queue'].put((message_type, handler, data, done))
+        if done is not None:
+            await done
+
+    async def _run_handlers(self, lane, client_id):
+        """处理协程：按接收顺序依次执行一个通道的处理函数
+
+        已排队的连续多条阻塞处理函数一次交给线程池执行，减少线程切换。
+        """
+        queue = lane['queue']
+        stop = False
+        while not stop:
+            item = await queue.get()
+            if item is None:
+                break
+            batch = [item]
+            following = None  # 批次之后紧接着的协程处理函数
+            if not asyncio.iscoroutinefunction(item[1]):
+                while not queue.empty() and len(batch) < HANDLER_BATCH_SIZE:
+                    item = queue.get_nowait()
+                    if item is None:
+                        stop = True
+                        break
+                    if asyncio.iscoroutinefunction(item[1]):
+                        following = item
+                        break
+                    batch.append(item)
+            for items in (batch, [following] if following else []):
+                if not items:
+                    continue
+                try:
+                    if len(items) == 1:
+                        message_type, handler, data, _ = items[0]
+                        await self._call_handler(message_type, handler, data, client_id)
+                    else:
+                        await self.loop.run_in_executor(self.executor, self._run_blocking,
+                                                        items, client_id)
+                finally:
+                    lane['pending'] -= len(items)
+                    for _, _, _, done in items:
+                        if done is not None and not done.done():
+                            done.set_result(None)
+
+    async def _call_handler(self, message_type, handler, data, client_id):
+        if asyncio.iscoroutinefunction(handler):
+            try:
+                await handler(data, client_id)
+            except Exception as e:
+                print(f"Handler error for {message_type}: {e}")
+        else:
+            # 阻塞的处理函数交给线程池，避免阻塞事件循环
+            await self.loop.run_in_executor(self.executor, self._run_blocking,
+                                            [(message_type, handler, data, None)], client_id)
+
+    def _run_blocking(self, items, client_id):
+        """在线程池中依次执行一批阻塞的处理函数"""
+        for message_type, handler, data, _ in items:
+            try:
+                handler(data, client_id)
+            except Exception as e:
+                print(f"Handler error for {message_type}: {e}")
+
+    def register_handler(self, message_type, handler, zero_copy=False):
+        """注册消息处理函数
+
+        Args:
+            message_type: 消息类型
+            handler: 处理函数，协程函数直接在事件循环中等待
+            zero_copy: 为 True 时处理函数可能得到接收缓冲区的 memoryview，
+                该视图只在处理函数返回前有效；否则得到 bytes
+        """
+        self.handlers[message_type] = handler
+        if zero_copy:
+            self.zero_copy_types.add(message_type)
+        else:
+            self.zero_copy_types.discard(message_type)
+
+    def unregister_handler(self, message_type):
+        if message_type in self.handlers:
+            del self.handlers[message_type]
+        self.zero_copy_types.discard(message_type)
+
+    async def _write_client(self, client_id, client):
+        """写协程：按通道优先级取出分片写入，每个分片等待传输层缓冲区排空"""
+        queue = client['queue']
+        writer = client['writer']
+        wakeup = client['wakeup']
+        try:
+            while not queue.closed:
+                wakeup.clear()
+                protocol = client['protocol'] or PROTOCOL_BINARY
+                item = queue.get(0, fragment=protocol == PROTOCOL_BINARY)
+                if item is None:
+                    await wakeup.wait()
+                    continue
+                message_type, channel, payload, first, more = item
+                if protocol == PROTOCOL_BINARY:
+                    # 传输层可能缓存未写完的数据，加密分片每次使用新的密文缓冲区
+                    writer.writelines(fragment_buffers(message_type, payload, channel, first,
+                                                       more, client['cipher']))
+                else:
+                    writer.write(encode_message_header(message_type, payload.nbytes, protocol))
+                    writer.write(payload)
+                # 慢客户端在这里等待，发送队列随之写满，调用方按溢出策略阻塞
+                await writer.drain()
+                queue.task_done(payload.nbytes, not more)
+                client['last_active'] = time.time()
+        except Exception as e:
+            if self.running:
+                print(f"Send message error to {client_id}: {e}")
+            self._close_client(client_id)
+
+    async def _write_frame(self, client, message_type, data):
+        """握手期间直接写出一条消息（写协程尚未启动）"""
+        writer = client['writer']
+        writer.writelines(fragment_buffers(message_type, data, None, cipher=client['cipher']))
+        await writer.drain()
+
+    def send_message(self, client_id, message_type, data=b'', channel=None):
+        """把消息放入客户端的发送队列，可在任意线程中调用
+
+        其他线程中队列已满时按溢出策略阻塞等待；事件循环线程中不能阻塞，
+        队列已满时直接返回 False。
+
+        Returns:
+            是否入队成功
+        """
+        client = self.clients.get(client_id)
+        if not self.running or client is None:
+            return False
+        in_loop = self._in_loop_thread()
+        if not client['queue'].put(message_type, data, channel, block=not in_loop):
+            return False
+        try:
+            if in_loop:
+                client['wakeup'].set()
+            else:
+                self.loop.call_soon_threadsafe(client['wakeup'].set)
+        except Exception as e:
+            print(f"Send message error to {client_id}: {e}")
+            return False
+        return True
+
+    def broadcast_message(self, message_type, data=b'', channel=None):
+        for client_id in list(self.clients.keys()):
+            self.send_message(client_id, message_type, data, channel)
+
+    def get_clients(self):
+        return list(self.clients.keys())
+
+    def get_client_metrics(self, client_id):
+        """获取客户端发送队列的统计信息（队列深度、丢弃数等）"""
+        client = self.clients.get(client_id)
+        if client is None:
+            return None
+        return client['queue'].get_metrics()
+
+    def _in_loop_thread(self):
+        return threading.current_thread() is self.loop_thread
@@ -0,0 +1,196 @@
+import collections
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# 处理函数的执行方式
+EXECUTOR_INLINE = 'inline'    # 在接收线程中直接执行
+EXECUTOR_THREAD = 'thread'    # 在线程池中执行
+EXECUTOR_PROCESS = 'process'  # 在进程池中执行，处理函数和参数必须可以 pickle
+EXECUTORS = (EXECUTOR_INLINE, EXECUTOR_THREAD, EXECUTOR_PROCESS)
+
+def _detach(args):
+    """把参数中的 memoryview 复制为 bytes
+
+    离开接收线程的消息不能再引用接收缓冲区，缓冲区随后会被下一条消息覆盖。
+    """
+    return tuple(bytes(arg) if isinstance(arg, memoryview) else arg for arg in args)
+
+class MessageDispatcher:
+    """消息处理函数调度器
+
+    按消息类型把处理函数交给接收线程、线程池或进程池执行，避免慢处理函数
+    （解码剪贴板图片、写文件块）阻塞套接字读取。同一 (客户端, 通道) 的消息
+    按接收顺序依次处理，不同通道、不同客户端之间并行。
+
+    每种消息类型统计排队等待时间和处理耗时。
+    """
+
+    def __init__(self, max_threads=4, max_processes=None, max_pending=256,
+                 default_executor=EXECUTOR_INLINE):
+        """
+        Args:
+            max_threads: 线程池大小
+            max_processes: 进程池大小，None 表示 CPU 核数
+            max_pending: 每个 (客户端, 通道) 最多排队的消息数，超出时阻塞接收线程
+            default_executor: 未单独配置的消息类型使用的执行方式
+        """
+        self.max_threads = max_threads
+        self.max_processes = max_processes
+        self.max_pending = max_pending
+        self.default_executor = default_executor
+        self.type_executors = {}
+        self.thread_pool = None
+        self.process_pool = None
+        # (客户端, 通道) -> 待处理任务队列；lanes 中存在即表示该队列正在被处理
+        self.lanes = {}
+        self.condition = threading.Condition()
+        self.stats = {}
+        self.running = True
+
+    def set_executor(self, message_type, executor):
+        """设置消息类型的执行方式"""
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor: {executor}")
+        self.type_executors[message_type] = executor
+
+    def get_executor(self, message_type):
+        return self.type_executors.get(message_type, self.default_executor)
+
+    def dispatch(self, key, message_type, handler, *args):
+        """调度一条消息
+
+        Args:
+            key: 顺序键，通常为 (客户端ID, 通道)，同一键的消息按顺序处理
+            message_type: 消息类型
+            handler: 处理函数
+            *args: 传给处理函数的参数；消息需要排队（交给线程池）时其中的
+                memoryview 会被复制为 bytes，接收缓冲区随后会被下一条消息覆盖
+        """
+        executor = self.get_executor(message_type)
+        enqueue_time = time.perf_counter()
+        if executor != EXECUTOR_INLINE:
+            args = _detach(args)
+
+        with self.condition:
+            lane = self.lanes.get(key)
+            if lane is None and executor == EXECUTOR_INLINE:
+                # 该键没有排队中的消息，可以直接在当前线程执行
+                run_inline = True
+            else:
+                run_inline = False
+                if lane is None:
+                    lane = self.lanes[key] = collections.deque()
+                    start_lane = True
+                else:
+                    start_lane = False
+                    self.condition.wait_for(lambda: not self.running or len(lane) < self.max_pending)
+                    if not self.running:
+                        return
+                if executor == EXECUTOR_INLINE:
+                    # inline 的处理函数因前面有排队消息而排队，同样离开接收线程
+                    args = _detach(args)
+                lane.append((executor, message_type, handler, args, enqueue_time))
+
+        if run_inline:
+            self._run(EXECUTOR_INLINE, message_type, handler, args, enqueue_time)
+        elif start_lane:
+            self._get_thread_pool().submit(self._run_lane, key)
+
+    def _run_lane(self, key):
+        """依次处理一个 (客户端, 通道) 的排队消息"""
+        while True:
+            with self.condition:
+                lane = self.lanes[key]
+                if not lane or not self.running:
+                    del self.lanes[key]
+                    self.condition.notify_all()
+                    return
+                executor, message_type, handler, args, enqueue_time = lane.popleft()
+                self.condition.notify_all()
+            self._run(executor, message_type, handler, args, enqueue_time)
+
+    def _run(self, executor, message_type, handler, args, enqueue_time):
+        start = time.perf_counter()
+        try:
+            if executor == EXECUTOR_PROCESS:
+                self._get_process_pool().submit(handler, *args).result()
+            else:
+                handler(*args)
+        except Exception as e:
+            print(f"Handler error for {message_type}: {e}")
+        end = time.perf_counter()
+        self._record(message_type, start - enqueue_time, end - start)
+
+    def _record(self, message_type, wait, runtime):
+        with self.condition:
+            stats = self.stats.get(message_type)
+            if stats is None:
+                stats = self.stats[message_type] = {
+                    'count': 0,
+                    'queue_wait': 0.0,
+                    'max_queue_wait': 0.0,
+                    'runtime': 0.0,
+                    'max_runtime': 0.0
+                }
+            stats['count'] += 1
+            stats['queue_wait'] += wait
+            stats['max_queue_wait'] = max(stats['max_queue_wait'], wait)
+            stats['runtime'] += runtime
+            stats['max_runtime'] = max(stats['max_runtime'], runtime)
+
+    def _get_thread_pool(self):
+        with self.condition:
+            if self.thread_pool is None:
+                self.thread_pool = ThreadPoolExecutor(max_workers=self.max_threads,
+                                                      thread_name_prefix='message-handler')
+            return self.thread_pool
+
+    def _get_process_pool(self):
+        with self.condition:
+            if self.process_pool is None:
+                self.process_pool = ProcessPoolExecutor(max_workers=self.max_processes)
+            return self.process_pool
+
+    def get_stats(self):
+        """获取每种消息类型的统计信息
+
+        Returns:
+            {消息类型: {'count', 'avg_queue_wait_ms', 'max_queue_wait_ms',
+                        'avg_runtime_ms', 'max_runtime_ms', 'executor'}}
+        """
+        with self.condition:
+            result = {}
+            for message_type, stats in self.stats.items():
+                count = stats['count']
+                result[message_type] = {
+                    'count': count,
+                    'executor': self.get_executor(message_type),
+                    'avg_queue_wait_ms': stats['queue_wait'] / count * 1000,
+                    'max_queue_wait_ms': stats['max_queue_wait'] * 1000,
+                    'avg_runtime_ms': stats['runtime'] / count * 1000,
+                    'max_runtime_ms': stats['max_runtime'] * 1000
+                }
+            return result
+
+    def pending(self):
+        """当前排队的消息数"""
+        with self.condition:
+            return sum(len(lane) for lane in self.lanes.values())
+
+    def start(self):
+        """（重新）开始调度"""
+        with self.condition:
+            self.running = True
+
+    def shutdown(self):
+        """停止调度，丢弃排队中的消息"""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+            thread_pool, process_pool = self.thread_pool, self.process_pool
+            self.thread_pool = self.process_pool = None
+        if thread_pool:
+            thread_pool.shutdown(wait=False)
+        if process_pool:
+            process_pool.shutdown(wait=False)
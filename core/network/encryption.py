@@ -1,17 +1,309 @@
-from Crypto.Cipher import AES, PKCS1_OAEP
+from Crypto.Cipher import AES, ChaCha20_Poly1305, PKCS1_OAEP
+from Crypto.Hash import SHA256
+from Crypto.Protocol.KDF import HKDF
 from Crypto.PublicKey import RSA
 from Crypto.Random import get_random_bytes
 from Crypto.Util.Padding import pad, unpad
 import base64
 import os
+import struct
+import threading
+
+# X25519 需要 pycryptodome 3.21 及以上
+try:
+    from Crypto.PublicKey import ECC
+    from Crypto.Protocol.DH import key_agreement, import_x25519_public_key
+    HAS_X25519 = True
+except ImportError:
+    HAS_X25519 = False
+
+# cryptography 的 AEAD 对象在创建时设置密钥、每次调用传入 nonce，会话内只需
+# 创建一次；未安装（或版本不支持 encrypt_into）时每条消息新建 pycryptodome cipher
+try:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+    HAS_AEAD = hasattr(AESGCM, 'encrypt_into')
+except ImportError:
+    HAS_AEAD = False
+
+# 会话加密算法
+CIPHER_AES_GCM = 'aes-gcm'
+CIPHER_CHACHA20_POLY1305 = 'chacha20-poly1305'
+CIPHER_ALGORITHMS = (CIPHER_AES_GCM, CIPHER_CHACHA20_POLY1305)
+
+# 设备身份密钥类型：RSA 用 RSA-OAEP 传递会话密钥，X25519 用 ECDH 协商会话密钥，
+# 生成和握手的计算量比 RSA 小几个数量级
+KEY_TYPE_RSA = 'rsa'
+KEY_TYPE_X25519 = 'x25519'
+KEY_TYPES = (KEY_TYPE_RSA, KEY_TYPE_X25519)
+
+# 身份密钥保存在配置目录中，只生成一次
+DEFAULT_KEY_DIR = os.path.expanduser('~/.remote_control')
+IDENTITY_KEY_FILES = {
+    KEY_TYPE_RSA: 'identity_rsa.pem',
+    KEY_TYPE_X25519: 'identity_x25519.pem'
+}
+
+def write_private_file(path, data):
+    """原子地写入只允许当前用户读写的文件（先写临时文件再替换）
+
+    Raises:
+        OSError: 写入失败
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+class SessionCipher:
+    """AEAD 会话加密
+
+    每个方向使用独立的 nonce 前缀和递增计数器，nonce 不随消息传输，接收方
+    按消息顺序推算，重放或乱序的消息无法通过认证。encrypt_into/decrypt_into
+    直接在调用方提供的缓冲区上工作（可以原地加解密），密文后紧跟认证标签，
+    适合在传输层对帧和文件块加密。
+
+    安装了 cryptography 时每个会话只创建一个带密钥的 AEAD 对象，不再为
+    每条消息重新设置密钥。
+    """
+
+    TAG_SIZE = 16
+
+    def __init__(self, key, initiator=True, algorithm=CIPHER_AES_GCM):
+        """
+        Args:
+            key: 32 字节会话密钥
+            initiator: 是否为发起连接的一方，决定两个方向的 nonce 前缀
+            algorithm: 'aes-gcm' 或 'chacha20-poly1305'
+        """
+        if len(key) != 32:
+            raise ValueError("Session key must be 32 bytes")
+        if algorithm not in CIPHER_ALGORITHMS:
+            raise ValueError(f"Unknown cipher algorithm: {algorithm}")
+        self.key = bytes(key)
+        self.algorithm = algorithm
+        # 两个方向的 nonce 前缀不同，同一密钥下 nonce 不会重复
+        self.send_prefix = b'\x00\x00\x00\x01' if initiator else b'\x00\x00\x00\x02'
+        self.recv_prefix = b'\x00\x00\x00\x02' if initiator else b'\x00\x00\x00\x01'
+        self.send_counter = 0
+        self.recv_counter = 0
+        self.lock = threading.Lock()
+        self.aead = None
+        if HAS_AEAD:
+            aead_class = ChaCha20Poly1305 if algorithm == CIPHER_CHACHA20_POLY1305 else AESGCM
+            self.aead = aead_class(self.key)
+
+    def _new_cipher(self, nonce):
+        if self.algorithm == CIPHER_CHACHA20_POLY1305:
+            return ChaCha20_Poly1305.new(key=self.key, nonce=nonce)
+        return AES.new(self.key, AES.MODE_GCM, nonce=nonce, mac_len=self.TAG_SIZE)
+
+    def _next_nonce(self, prefix, counter):
+        if counter >= 1 << 64:
+            raise ValueError("Session nonce exhausted")
+        return prefix + struct.pack('!Q', counter)
+
+    def _send_nonce(self):
+        with self.lock:
+            nonce = self._next_nonce(self.send_prefix, self.send_counter)
+            self.send_counter += 1
+        return nonce
+
+    def _recv_nonce(self):
+        with self.lock:
+            nonce = self._next_nonce(self.recv_prefix, self.recv_counter)
+            self.recv_counter += 1
+        return nonce
+
+    def encrypt_into(self, data, output, aad=b''):
+        """加密到调用方的缓冲区
+
+        Args:
+            data: 明文
+            output: 输出缓冲区（bytearray/memoryview），长度为 len(data) + TAG_SIZE，
+                前 len(data) 字节为密文，之后是认证标签；可以与 data 的内存重叠
+                （原地加密）
+            aad: 附加认证数据（例如帧头），只认证不加密
+        """
+        nonce = self._send_nonce()
+        if self.aead is not None:
+            self.aead.encrypt_into(nonce, data, aad, output)
+            return
+        output = memoryview(output)
+        length = len(output) - self.TAG_SIZE
+        cipher = self._new_cipher(nonce)
+        if aad:
+            cipher.update(aad)
+        cipher.encrypt(data, output=output[:length])
+        output[length:] = cipher.digest()
+
+    def decrypt_into(self, data, output, aad=b''):
+        """解密到调用方的缓冲区并验证
+
+        Args:
+            data: 密文 + 认证标签
+            output: 输出缓冲区，长度为 len(data) - TAG_SIZE，可以与 data 的内存重叠
+            aad: 附加认证数据
+
+        Raises:
+            ValueError: 认证失败
+        """
+        nonce = self._recv_nonce()
+        if self.aead is not None:
+            try:
+                self.aead.decrypt_into(nonce, data, aad, output)
+            except InvalidTag:
+                raise ValueError("MAC check failed")
+            return
+        data = memoryview(data)
+        length = len(data) - self.TAG_SIZE
+        cipher = self._new_cipher(nonce)
+        if aad:
+            cipher.update(aad)
+        cipher.decrypt(data[:length], output=output)
+        cipher.verify(data[length:])
+
+    def encrypt(self, data, aad=b''):
+        """加密数据
+
+        Returns:
+            密文 + 认证标签
+        """
+        if self.aead is not None:
+            return self.aead.encrypt(self._send_nonce(), data, aad)
+        output = bytearray(len(data) + self.TAG_SIZE)
+        self.encrypt_into(data, output, aad)
+        return bytes(output)
+
+    def decrypt(self, encrypted_data, aad=b''):
+        """解密 encrypt 的输出
+
+        Raises:
+            ValueError: 数据过短或认证失败
+        """
+        if len(encrypted_data) < self.TAG_SIZE:
+            raise ValueError("Encrypted data too short")
+        if self.aead is not None:
+            try:
+                return self.aead.decrypt(self._recv_nonce(), encrypted_data, aad)
+            except InvalidTag:
+                raise ValueError("MAC check failed")
+        output = bytearray(len(encrypted_data) - self.TAG_SIZE)
+        self.decrypt_into(encrypted_data, output, aad)
+        return bytes(output)
 
 class EncryptionManager:
-    def __init__(self):
+    def __init__(self, key_dir=DEFAULT_KEY_DIR, key_type=KEY_TYPE_RSA):
+        """
+        Args:
+            key_dir: 身份密钥的保存目录，None 表示不保存（每次启动重新生成）
+            key_type: 握手使用的身份密钥类型，'rsa' 或 'x25519'
+        """
         self.aes_key = None
         self.aes_iv = None
         self.rsa_key = None
+        self.x25519_key = None
         self.remote_public_key = None
-        
+        self.key_dir = key_dir
+        self.key_type = None
+        self.key_lock = threading.Lock()  # 保证身份密钥只加载或生成一次
+        self.set_key_type(key_type)
+
+    def set_key_type(self, key_type):
+        """设置握手使用的身份密钥类型"""
+        if key_type not in KEY_TYPES:
+            raise ValueError(f"Unknown key type: {key_type}")
+        if key_type == KEY_TYPE_X25519 and not HAS_X25519:
+            raise ValueError("X25519 requires pycryptodome 3.21 or later")
+        self.key_type = key_type
+
+    def get_identity_key_path(self, key_type=None):
+        """身份密钥文件路径，不保存时返回 None"""
+        if not self.key_dir:
+            return None
+        return os.path.join(self.key_dir, IDENTITY_KEY_FILES[key_type or self.key_type])
+
+    def load_identity_key(self, key_type=None):
+        """获取设备身份密钥
+
+        已加载时直接返回；否则从密钥目录读取，文件不存在时生成并保存。
+        多个线程同时调用时只会生成一次。
+
+        Args:
+            key_type: 密钥类型，None 表示 set_key_type 设置的类型
+
+        Returns:
+            RSA 或 X25519 私钥
+        """
+        key_type = key_type or self.key_type
+        attr = 'rsa_key' if key_type == KEY_TYPE_RSA else 'x25519_key'
+        key = getattr(self, attr)
+        if key is not None:
+            return key
+        with self.key_lock:
+            key = getattr(self, attr)
+            if key is None:
+                key = self._read_identity_key(key_type)
+                if key is None:
+                    key = self._generate_identity_key(key_type)
+                    self._write_identity_key(key_type, key)
+                setattr(self, attr, key)
+            return key
+
+    def prepare_identity_key(self, key_type=None):
+        """在后台线程中加载或生成身份密钥，程序启动时调用，避免首次握手时卡顿
+
+        Returns:
+            后台线程
+        """
+        def prepare():
+            try:
+                self.load_identity_key(key_type)
+            except Exception as e:
+                print(f"Prepare identity key error: {e}")
+
+        thread = threading.Thread(target=prepare)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def _generate_identity_key(self, key_type):
+        if key_type == KEY_TYPE_X25519:
+            return ECC.generate(curve='X25519')
+        return RSA.generate(2048)
+
+    def _read_identity_key(self, key_type):
+        path = self.get_identity_key_path(key_type)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            if key_type == KEY_TYPE_X25519:
+                return ECC.import_key(data)
+            # 导入时做完整的一致性检查（素性等），损坏或被篡改的私钥不会被使用
+            return RSA.import_key(data)
+        except (OSError, ValueError) as e:
+            # 损坏的密钥文件会被重新生成的密钥覆盖
+            print(f"Load identity key error: {e}")
+            return None
+
+    def _write_identity_key(self, key_type, key):
+        path = self.get_identity_key_path(key_type)
+        if not path:
+            return
+        if key_type == KEY_TYPE_X25519:
+            data = key.export_key(format='PEM').encode('utf-8')
+        else:
+            data = key.export_key()
+        try:
+            # 私钥只允许当前用户读写，不留下不完整的文件
+            write_private_file(path, data)
+        except OSError as e:
+            print(f"Save identity key error: {e}")
+
     def generate_rsa_key(self, key_size=2048):
         """生成RSA密钥对"""
         self.rsa_key = RSA.generate(key_size)
@@ -19,9 +311,14 @@ class EncryptionManager:
         
     def get_public_key(self):
         """获取RSA公钥"""
-        if not self.rsa_key:
-            self.generate_rsa_key()
-        return self.rsa_key.publickey().export_key()
+        return self.load_identity_key(KEY_TYPE_RSA).publickey().export_key()
+
+    def get_identity_public_key(self):
+        """获取握手使用的身份公钥（PEM），类型由 set_key_type 决定"""
+        key = self.load_identity_key()
+        if self.key_type == KEY_TYPE_X25519:
+            return key.public_key().export_key(format='PEM').encode('utf-8')
+        return key.publickey().export_key()
         
     def set_remote_public_key(self, public_key):
         """设置远程设备的RSA公钥"""
@@ -53,8 +350,90 @@ class EncryptionManager:
         self.aes_iv = decrypted_data[32:]
         return self.aes_key, self.aes_iv
         
+    def create_session_cipher(self, initiator=True, algorithm=CIPHER_AES_GCM):
+        """使用当前 AES 密钥创建 AEAD 会话加密
+        
+        Args:
+            initiator: 是否为发起连接的一方
+            algorithm: 'aes-gcm' 或 'chacha20-poly1305'
+            
+        Returns:
+            SessionCipher 实例
+        """
+        if not self.aes_key:
+            raise ValueError("AES key not set")
+        return SessionCipher(self.aes_key, initiator, algorithm)
+
+    def wrap_session_key(self, remote_public_key):
+        """根据对方的身份公钥得到新的会话密钥，不修改当前的密钥状态
+
+        RSA 公钥：随机生成会话密钥并用 RSA-OAEP 加密；X25519 公钥：生成临时
+        X25519 密钥对，与对方公钥做 ECDH 后用 HKDF 派生会话密钥。
+
+        Args:
+            remote_public_key: 对方的身份公钥（PEM）
+
+        Returns:
+            (会话密钥, 发给对方的密钥数据)
+        """
+        remote_key = self._import_public_key(remote_public_key)
+        if isinstance(remote_key, RSA.RsaKey):
+            key = get_random_bytes(32)
+            return key, PKCS1_OAEP.new(remote_key).encrypt(key)
+
+        ephemeral_key = ECC.generate(curve='X25519')
+        ephemeral_public = ephemeral_key.public_key().export_key(format='raw')
+        key = key_agreement(eph_priv=ephemeral_key, static_pub=remote_key,
+                            kdf=self._session_kdf(ephemeral_public, remote_key))
+        return key, ephemeral_public
+
+    def unwrap_session_key(self, encrypted_key):
+        """使用身份私钥得到 wrap_session_key 生成的会话密钥
+
+        Raises:
+            ValueError: 解密失败或密钥数据格式不正确
+        """
+        identity_key = self.load_identity_key()
+        if self.key_type == KEY_TYPE_X25519:
+            ephemeral_public = bytes(encrypted_key)
+            key = key_agreement(static_priv=identity_key,
+                                eph_pub=import_x25519_public_key(ephemeral_public),
+                                kdf=self._session_kdf(ephemeral_public, identity_key.public_key()))
+        else:
+            key = PKCS1_OAEP.new(identity_key).decrypt(bytes(encrypted_key))
+        if len(key) != 32:
+            raise ValueError("Invalid session key")
+        return key
+
+    def public_key_fingerprint(self, public_key):
+        """身份公钥的 SHA-256 指纹（十六进制），按 DER 编码计算，与 PEM 的排版无关
+
+        Raises:
+            ValueError: 公钥格式不正确
+        """
+        der = self._import_public_key(public_key).export_key(format='DER')
+        return SHA256.new(der).hexdigest()
+
+    def _import_public_key(self, public_key):
+        public_key = bytes(public_key)
+        try:
+            return RSA.import_key(public_key)
+        except ValueError:
+            if not HAS_X25519:
+                raise
+        key = ECC.import_key(public_key)
+        if key.curve != 'Curve25519':
+            raise ValueError(f"Unsupported identity key curve: {key.curve}")
+        return key
+
+    def _session_kdf(self, ephemeral_public, identity_public_key):
+        # 两端的公钥参与派生，会话密钥与本次握手绑定
+        context = b'remote-control session' + ephemeral_public + \
+            identity_public_key.export_key(format='raw')
+        return lambda secret: HKDF(secret, 32, b'', SHA256, context=context)
+
     def encrypt(self, data):
-        """使用AES加密数据"""
+        """使用AES加密数据（CBC，兼容旧版本；传输数据应使用 create_session_cipher）"""
         if not self.aes_key or not self.aes_iv:
             raise ValueError("AES key or IV not set")
         
@@ -107,3 +486,18 @@ class EncryptionManager:
 
 # 单例模式
 encryption_manager = EncryptionManager()
+
+def prepare_identity_key(key_type=KEY_TYPE_RSA):
+    """在后台加载设备身份密钥，首次运行时生成，不阻塞界面启动
+
+    Args:
+        key_type: 配置的身份密钥类型（security.identity_key）
+
+    Returns:
+        后台线程
+    """
+    try:
+        encryption_manager.set_key_type(key_type)
+    except ValueError as e:
+        print(f"Identity key config error: {e}")
+    return encryption_manager.prepare_identity_key()
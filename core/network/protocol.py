@@ -0,0 +1,573 @@
+import json
+import socket
+import struct
+import time
+
+# 二进制帧头：魔数(2) + 协议版本(1) + 标志位(1) + 通道(1) + 保留(1) + 消息类型ID(2) + 负载长度(4)
+MAGIC = b'RA'
+PROTOCOL_VERSION = 2
+FRAME_HEADER = struct.Struct('!2sBBBxHI')
+HEADER_SIZE = FRAME_HEADER.size
+
+# 标志位
+FLAG_NAMED_TYPE = 0x01      # 消息类型未注册，类型名附在负载之前
+FLAG_MORE_FRAGMENTS = 0x02  # 消息被切片，同一通道上还有后续分片
+FLAG_ENCRYPTED = 0x04       # 负载（含类型名）已用会话密钥加密，末尾附带认证标签
+
+# 加密帧的认证标签长度
+TAG_SIZE = 16
+
+# 逻辑通道，通道号越小优先级越高。大消息按分片发送，高优先级通道的消息
+# 可以插在低优先级消息的分片之间
+CHANNEL_CONTROL = 0
+CHANNEL_INPUT = 1
+CHANNEL_SCREEN = 2
+CHANNEL_CLIPBOARD = 3
+CHANNEL_FILE = 4
+
+# 传输协议
+PROTOCOL_BINARY = 'binary'
+PROTOCOL_JSON = 'json'  # 旧版 JSON 头部 + 换行分隔，仅用于兼容
+
+# 不支持 sendmsg 时，总长度不超过该值的消息合并成一次 sendall
+SMALL_MESSAGE_SIZE = 64 * 1024
+HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+
+# 单条消息负载的上限，防止损坏的长度字段导致超大内存分配
+MAX_PAYLOAD_SIZE = 64 * 1024 * 1024
+
+# 已知消息类型与类型ID的映射，未注册的类型以类型名传输
+MESSAGE_TYPES = {
+    'hello': 1,
+    'pairing_request': 2,
+    'pairing_response': 3,
+    'file_info': 4,
+    'file_data': 5,
+    'file_complete': 6,
+    'clipboard_content': 7,
+    'screen_frame': 8,
+    'input_event': 9,
+    'session_public_key': 10,
+    'session_key': 11,
+    'session_ticket': 12,
+    'session_resumed': 13,
+    'screen_keyframe_request': 14,
+    'screen_ack': 15,
+    'screen_viewport': 16,
+}
+MESSAGE_NAMES = {type_id: name for name, type_id in MESSAGE_TYPES.items()}
+
+# 消息类型默认使用的通道，未列出的类型走控制通道
+MESSAGE_CHANNELS = {
+    'input_event': CHANNEL_INPUT,
+    'screen_frame': CHANNEL_SCREEN,
+    'clipboard_content': CHANNEL_CLIPBOARD,
+    'file_info': CHANNEL_FILE,
+    'file_data': CHANNEL_FILE,
+    'file_complete': CHANNEL_FILE,
+}
+
+class ProtocolError(Exception):
+    """消息帧格式错误"""
+    pass
+
+def register_message_type(message_type, type_id, channel=None):
+    """注册消息类型ID
+
+    Args:
+        message_type: 消息类型名
+        type_id: 类型ID，1-65535
+        channel: 该类型默认使用的通道，None 表示控制通道
+    """
+    if not 0 < type_id <= 0xFFFF:
+        raise ValueError(f"Invalid message type id: {type_id}")
+    if MESSAGE_NAMES.get(type_id, message_type) != message_type:
+        raise ValueError(f"Message type id {type_id} already used by {MESSAGE_NAMES[type_id]}")
+    MESSAGE_TYPES[message_type] = type_id
+    MESSAGE_NAMES[type_id] = message_type
+    if channel is not None:
+        MESSAGE_CHANNELS[message_type] = channel
+
+def get_channel(message_type):
+    """获取消息类型默认使用的通道"""
+    return MESSAGE_CHANNELS.get(message_type, CHANNEL_CONTROL)
+
+def _type_fields(message_type, continuation=False):
+    """得到帧头中的类型字段
+
+    Returns:
+        (消息类型ID, 类型标志位, 类型名前缀)，未注册类型的首个分片以
+        1 字节长度 + 类型名作为负载前缀
+    """
+    type_id = MESSAGE_TYPES.get(message_type)
+    if type_id is not None or continuation:
+        return type_id or 0, 0, b''
+    name = message_type.encode('utf-8')
+    if len(name) > 255:
+        raise ValueError(f"Message type name too long: {message_type}")
+    return 0, FLAG_NAMED_TYPE, bytes([len(name)]) + name
+
+def encode_header(message_type, length, flags=0, channel=None, continuation=False):
+    """构建二进制帧头
+
+    Args:
+        message_type: 消息类型名
+        length: 负载（或分片）长度
+        flags: 标志位
+        channel: 通道，None 表示使用消息类型的默认通道
+        continuation: 是否为后续分片，后续分片不再附带类型名
+
+    Returns:
+        帧头数据（bytes），未注册的消息类型的首个分片会在帧头后附带类型名
+    """
+    if channel is None:
+        channel = get_channel(message_type)
+    type_id, type_flags, prefix = _type_fields(message_type, continuation)
+    return FRAME_HEADER.pack(MAGIC, PROTOCOL_VERSION, flags | type_flags, channel, type_id,
+                             length + len(prefix)) + prefix
+
+def encode_json_header(message_type, length):
+    """构建旧版 JSON 消息头部（以换行结尾）"""
+    header = {
+        'type': message_type,
+        'length': length,
+        'timestamp': time.time()
+    }
+    return json.dumps(header).encode('utf-8') + b'\n'
+
+def encode_message_header(message_type, length, protocol=PROTOCOL_BINARY, channel=None):
+    """按传输协议构建消息头部，JSON 协议没有通道"""
+    if protocol == PROTOCOL_JSON:
+        return encode_json_header(message_type, length)
+    return encode_header(message_type, length, channel=channel)
+
+def build_message(message_type, data=b'', protocol=PROTOCOL_BINARY):
+    """构建完整的消息（头部 + 负载）
+
+    会复制一次负载，发送大块数据时应使用 send_message_buffers。
+
+    Args:
+        message_type: 消息类型名
+        data: 消息负载
+        protocol: 传输协议，'binary'或'json'
+
+    Returns:
+        待发送的消息数据（bytes）
+    """
+    return encode_message_header(message_type, len(data), protocol) + bytes(data)
+
+def as_byte_view(data):
+    """把 bytes/bytearray/memoryview/numpy 数组等缓冲区转换为一维字节视图，不复制数据"""
+    view = data if isinstance(data, memoryview) else memoryview(data)
+    if view.format != 'B' or view.ndim != 1:
+        view = view.cast('B')
+    return view
+
+def send_buffers(sock, buffers):
+    """分散/聚集发送多个缓冲区
+
+    支持 sendmsg 的平台上一次系统调用写出所有缓冲区，不做拼接；
+    不支持的平台（Windows）上小块数据合并发送，大块数据逐个 sendall。
+    """
+    views = [view for view in map(as_byte_view, buffers) if view.nbytes]
+    if not HAS_SENDMSG:
+        total = sum(view.nbytes for view in views)
+        if total <= SMALL_MESSAGE_SIZE:
+            # 小消息合并，避免头部单独成包
+            sock.sendall(b''.join(views))
+        else:
+            for view in views:
+                sock.sendall(view)
+        return
+
+    while views:
+        sent = sock.sendmsg(views)
+        # 去掉已完整发送的缓冲区，部分发送的缓冲区从断点继续
+        while sent:
+            first = views[0]
+            if sent >= first.nbytes:
+                sent -= first.nbytes
+                views.pop(0)
+            else:
+                views[0] = first[sent:]
+                sent = 0
+
+def send_message_buffers(sock, message_type, data=b'', protocol=PROTOCOL_BINARY, channel=None):
+    """发送一条消息，头部和负载作为独立缓冲区写出，负载不会被复制
+
+    Args:
+        sock: 已连接的套接字
+        message_type: 消息类型名
+        data: 消息负载，可为 bytes、bytearray、memoryview 或 numpy 数组
+        protocol: 传输协议，'binary'或'json'
+        channel: 通道，None 表示使用消息类型的默认通道
+
+    Returns:
+        负载字节数
+    """
+    payload = as_byte_view(data)
+    header = encode_message_header(message_type, payload.nbytes, protocol, channel)
+    send_buffers(sock, (header, payload))
+    return payload.nbytes
+
+def send_fragment(sock, message_type, fragment, channel, first=True, more=False,
+                  cipher=None, scratch=None):
+    """发送一条消息的一个分片（仅二进制协议）
+
+    Args:
+        sock: 已连接的套接字
+        message_type: 消息类型名
+        fragment: 分片数据
+        channel: 通道
+        first: 是否为首个分片
+        more: 是否还有后续分片
+        cipher: 会话加密（SessionCipher），None 表示不加密
+        scratch: 加密输出缓冲区，见 encrypt_fragment
+
+    Returns:
+        分片字节数
+    """
+    payload = as_byte_view(fragment)
+    send_buffers(sock, fragment_buffers(message_type, payload, channel, first, more,
+                                        cipher, scratch))
+    return payload.nbytes
+
+def fragment_buffers(message_type, fragment, channel, first=True, more=False,
+                     cipher=None, scratch=None):
+    """构建一个分片的待发送缓冲区，参数见 send_fragment
+
+    Returns:
+        缓冲区元组：未加密时为 (帧头, 负载)，加密时见 encrypt_fragment
+    """
+    payload = as_byte_view(fragment)
+    if cipher is not None:
+        return encrypt_fragment(cipher, message_type, payload, channel, first, more, scratch)
+    flags = FLAG_MORE_FRAGMENTS if more else 0
+    header = encode_header(message_type, payload.nbytes, flags, channel, continuation=not first)
+    return header, payload
+
+def encrypt_fragment(cipher, message_type, fragment, channel=None, first=True, more=False,
+                     scratch=None):
+    """加密一个分片
+
+    类型名前缀和负载一起加密，帧头（含加密后的长度）作为附加认证数据，
+    篡改帧头或负载都无法通过认证。
+
+    Args:
+        cipher: 会话加密（SessionCipher）
+        message_type: 消息类型名
+        fragment: 分片数据
+        channel: 通道，None 表示使用消息类型的默认通道
+        first: 是否为首个分片
+        more: 是否还有后续分片
+        scratch: 密文输出缓冲区（bytearray），长度不足或为 None 时新分配；
+            返回的密文视图引用该缓冲区，发送完成前不能复用
+
+    Returns:
+        待发送的缓冲区 (帧头, 密文 + 认证标签)
+    """
+    payload = as_byte_view(fragment)
+    if channel is None:
+        channel = get_channel(message_type)
+    type_id, type_flags, prefix = _type_fields(message_type, continuation=not first)
+    flags = FLAG_ENCRYPTED | type_flags | (FLAG_MORE_FRAGMENTS if more else 0)
+    length = len(prefix) + payload.nbytes + TAG_SIZE
+    header = FRAME_HEADER.pack(MAGIC, PROTOCOL_VERSION, flags, channel, type_id, length)
+    if scratch is None or len(scratch) < length:
+        scratch = bytearray(length)
+    output = memoryview(scratch)[:length]
+    source = payload
+    if prefix:
+        # 未注册类型的类型名和负载需要连续存放，先复制到输出缓冲区再原地加密
+        output[:len(prefix)] = prefix
+        output[len(prefix):length - TAG_SIZE] = payload
+        source = output[:length - TAG_SIZE]
+    cipher.encrypt_into(source, output, header)
+    return header, output
+
+def decrypt_payload(cipher, header, data):
+    """解密一帧的负载并验证认证标签
+
+    可写的缓冲区（FrameReader 的接收缓冲区）原地解密，只读的 bytes 解密到
+    新的缓冲区。
+
+    Args:
+        cipher: 会话加密，None 表示会话尚未建立
+        header: 帧头数据，作为附加认证数据
+        data: 密文 + 认证标签
+
+    Returns:
+        明文的 memoryview
+
+    Raises:
+        ProtocolError: 会话未建立或认证失败
+    """
+    if cipher is None:
+        raise ProtocolError("Encrypted frame before session established")
+    view = as_byte_view(data)
+    length = view.nbytes - TAG_SIZE
+    if length < 0:
+        raise ProtocolError("Encrypted frame too short")
+    output = memoryview(bytearray(length)) if view.readonly else view[:length]
+    try:
+        cipher.decrypt_into(view, output, header)
+    except ValueError:
+        raise ProtocolError("Frame authentication failed")
+    return output
+
+def parse_header(header):
+    """解析二进制帧头
+
+    Args:
+        header: 帧头数据，长度为 HEADER_SIZE
+
+    Returns:
+        (标志位, 通道, 消息类型ID, 负载长度)
+
+    Raises:
+        ProtocolError: 帧头无效
+    """
+    magic, version, flags, channel, type_id, length = FRAME_HEADER.unpack_from(header)
+    if magic != MAGIC:
+        raise ProtocolError(f"Bad frame magic: {bytes(magic)!r}")
+    if version != PROTOCOL_VERSION:
+        raise ProtocolError(f"Unsupported protocol version: {version}")
+    if length > MAX_PAYLOAD_SIZE:
+        raise ProtocolError(f"Frame too large: {length} bytes")
+    return flags, channel, type_id, length
+
+def resolve_message_type(flags, type_id, data):
+    """根据帧头得到消息类型名，并去掉负载前附带的类型名
+
+    Returns:
+        (消息类型, 负载数据)
+    """
+    if flags & FLAG_NAMED_TYPE:
+        name_length = data[0] if data else 0
+        if not name_length or name_length + 1 > len(data):
+            raise ProtocolError("Bad message type name")
+        message_type = bytes(data[1:1 + name_length]).decode('utf-8')
+        return message_type, data[1 + name_length:]
+
+    message_type = MESSAGE_NAMES.get(type_id)
+    if message_type is None:
+        raise ProtocolError(f"Unknown message type id: {type_id}")
+    return message_type, data
+
+def parse_json_header(line):
+    """解析旧版 JSON 头部行
+
+    Returns:
+        (消息类型, 负载长度)
+    """
+    header_data = json.loads(bytes(line).decode('utf-8'))
+    data_length = header_data.get('length', 0)
+    if data_length > MAX_PAYLOAD_SIZE:
+        raise ProtocolError(f"Frame too large: {data_length} bytes")
+    return header_data['type'], data_length
+
+class FragmentAssembler:
+    """按通道重组分片消息
+
+    不同通道的分片可以交错到达，同一通道内的分片按顺序到达。每个通道
+    有一块可复用的重组缓冲区，按 2 的幂扩容，稳定状态下不再分配；返回的
+    负载视图在该通道的下一条分片消息到达前有效，需要保留数据时应自行复制。
+    """
+
+    def __init__(self):
+        self.partial = {}  # 通道 -> [首个分片的标志位, 消息类型ID, 已重组长度]
+        self.buffers = {}  # 通道 -> 重组缓冲区
+
+    def is_fragment(self, flags, channel):
+        """帧是否属于一条分片消息（首个、中间或最后一个分片）"""
+        return bool(flags & FLAG_MORE_FRAGMENTS) or channel in self.partial
+
+    def reserve(self, flags, channel, type_id, size):
+        """为分片消息的下一个分片预留空间，供 recv_into 直接写入
+
+        Args:
+            flags: 帧标志位
+            channel: 通道
+            type_id: 消息类型ID
+            size: 帧负载长度
+
+        Returns:
+            重组缓冲区中长度为 size 的可写视图
+
+        Raises:
+            ProtocolError: 重组后的消息超过 MAX_PAYLOAD_SIZE
+        """
+        partial = self.partial.get(channel)
+        if partial is None:
+            # 首个分片决定消息类型
+            partial = self.partial[channel] = [flags, type_id, 0]
+        offset = partial[2]
+        if offset + size > MAX_PAYLOAD_SIZE:
+            raise ProtocolError(f"Fragmented message too large: {offset + size} bytes")
+        buffer = self.buffers.get(channel)
+        if buffer is None or len(buffer) < offset + size:
+            grown = bytearray(1 << max(16, (offset + size - 1).bit_length()))
+            if offset:
+                grown[:offset] = buffer[:offset]
+            buffer = self.buffers[channel] = grown
+        return memoryview(buffer)[offset:offset + size]
+
+    def commit(self, flags, channel, size):
+        """reserve 得到的空间已写入 size 字节（解密后的明文长度）
+
+        Returns:
+            消息完整时返回 (消息类型, 负载数据)，否则返回 None
+        """
+        partial = self.partial[channel]
+        partial[2] += size
+        if flags & FLAG_MORE_FRAGMENTS:
+            return None
+        first_flags, first_type_id, length = self.partial.pop(channel)
+        view = memoryview(self.buffers[channel])[:length]
+        return resolve_message_type(first_flags, first_type_id, view)
+
+    def feed(self, flags, channel, type_id, data):
+        """处理一个已接收的帧，分片数据复制到重组缓冲区
+
+        Returns:
+            消息完整时返回 (消息类型, 负载数据)，否则返回 None
+        """
+        if not self.is_fragment(flags, channel):
+            return resolve_message_type(flags, type_id, data)
+        view = as_byte_view(data)
+        self.reserve(flags, channel, type_id, view.nbytes)[:] = view
+        return self.commit(flags, channel, view.nbytes)
+
+class FrameReader:
+    """从套接字读取消息帧
+
+    帧头读入可复用的缓冲区后用 struct 解析。protocol 为 None 时根据连接上
+    的首个字节自动协商：以魔数开头为二进制帧，否则按旧版 JSON 头部处理。
+
+    负载通过 recv_into 直接写入连接级的可复用缓冲区，分片消息的分片直接
+    写入所在通道的重组缓冲区（见 FragmentAssembler），read_message 返回的
+    memoryview 在下一次调用前有效，需要保留数据时应自行复制。
+
+    设置 cipher 后加密帧原地解密，之后收到未加密的帧视为协议错误。
+    """
+
+    def __init__(self, sock, protocol=None, allow_legacy=True):
+        self.sock = sock
+        self.protocol = protocol
+        self.allow_legacy = allow_legacy
+        self._header_buf = bytearray(HEADER_SIZE)
+        self._header_view = memoryview(self._header_buf)
+        # 读取 JSON 头部行时多收到的数据，后续读取优先消费
+        self._pending = bytearray()
+        self.assembler = FragmentAssembler()
+        # 负载接收缓冲区，在连接的生命周期内复用
+        self._payload_buf = bytearray()
+        self._payload_view = memoryview(self._payload_buf)
+        # 会话加密（SessionCipher），握手完成后设置
+        self.cipher = None
+
+    def _recv_into(self, view):
+        """读满指定的缓冲区，连接关闭时返回 False"""
+        offset = 0
+        size = len(view)
+        if self._pending:
+            n = min(size, len(self._pending))
+            view[:n] = self._pending[:n]
+            del self._pending[:n]
+            offset = n
+        while offset < size:
+            n = self.sock.recv_into(view[offset:], size - offset)
+            if not n:
+                return False
+            offset += n
+        return True
+
+    def _recv_payload(self, length):
+        """把消息负载直接接收到可复用的缓冲区中
+
+        Returns:
+            负载的 memoryview，仅在下一次读取前有效；连接关闭时返回 None
+        """
+        if len(self._payload_buf) < length:
+            # 按 2 的幂扩容，稳定状态下不再分配
+            size = 1 << max(16, (length - 1).bit_length())
+            self._payload_buf = bytearray(size)
+            self._payload_view = memoryview(self._payload_buf)
+        view = self._payload_view[:length]
+        if not self._recv_into(view):
+            return None
+        return view
+
+    def read_message(self):
+        """读取一条完整的消息，分片消息会被重组
+
+        Returns:
+            (消息类型, 负载 memoryview, 通道)，连接关闭时返回 None
+
+        Raises:
+            ProtocolError: 帧格式错误
+        """
+        header_offset = 0
+        if self.protocol is None:
+            # 协商协议：查看首个字节
+            if not self._recv_into(self._header_view[:1]):
+                return None
+            if self._header_buf[0] == MAGIC[0]:
+                self.protocol = PROTOCOL_BINARY
+                header_offset = 1
+            else:
+                if not self.allow_legacy:
+                    raise ProtocolError("Legacy JSON protocol not allowed")
+                self.protocol = PROTOCOL_JSON
+                self._pending[:0] = self._header_buf[:1]
+
+        if self.protocol == PROTOCOL_JSON:
+            return self._read_json_message()
+
+        while True:
+            if not self._recv_into(self._header_view[header_offset:]):
+                return None
+            header_offset = 0
+            flags, channel, type_id, length = parse_header(self._header_buf)
+            if self.cipher is not None and not flags & FLAG_ENCRYPTED:
+                raise ProtocolError("Unencrypted frame in encrypted session")
+            if not self.assembler.is_fragment(flags, channel):
+                data = self._recv_payload(length)
+                if data is None:
+                    return None
+                if flags & FLAG_ENCRYPTED:
+                    data = decrypt_payload(self.cipher, self._header_buf, data)
+                message_type, data = resolve_message_type(flags, type_id, data)
+                return message_type, data, channel
+
+            # 分片直接接收到重组缓冲区，加密分片在原处解密，认证标签随后被
+            # 下一个分片覆盖
+            view = self.assembler.reserve(flags, channel, type_id, length)
+            if not self._recv_into(view):
+                return None
+            if flags & FLAG_ENCRYPTED:
+                view = decrypt_payload(self.cipher, self._header_buf, view)
+            message = self.assembler.commit(flags, channel, view.nbytes)
+            if message is not None:
+                return message[0], message[1], channel
+
+    def _read_json_message(self):
+        # 读取以换行结尾的 JSON 头部
+        while True:
+            index = self._pending.find(b'\n')
+            if index >= 0:
+                break
+            if len(self._pending) > 65536:
+                raise ProtocolError("JSON header too long")
+            packet = self.sock.recv(4096)
+            if not packet:
+                return None
+            self._pending += packet
+
+        message_type, data_length = parse_json_header(self._pending[:index])
+        del self._pending[:index + 1]
+
+        data = self._recv_payload(data_length)
+        if data is None:
+            return None
+        return message_type, data, get_channel(message_type)
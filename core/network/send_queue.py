@@ -0,0 +1,235 @@
+import collections
+import threading
+import time
+from .protocol import (
+    PROTOCOL_BINARY, TAG_SIZE, as_byte_view, get_channel, send_fragment, send_message_buffers
+)
+
+# 队列已满时的处理策略
+OVERFLOW_BLOCK = 'block'              # 阻塞调用方直到队列有空位
+OVERFLOW_DROP_OLDEST = 'drop_oldest'  # 丢弃队列中最旧的同类型消息
+OVERFLOW_DROP = 'drop'                # 丢弃新消息
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP)
+
+# 默认按类型的溢出策略。屏幕帧是相对上一帧的增量，入队后丢弃会让观看端
+# 画面出错，因此按默认策略阻塞
+DEFAULT_TYPE_POLICIES = {}
+
+# 大消息的切片大小，决定高优先级消息最多需要等待多少字节
+DEFAULT_FRAGMENT_SIZE = 64 * 1024
+
+class OutboundQueue:
+    """单个连接的有界发送队列和通道调度器
+
+    send_message 只把消息放入队列，由连接专属的写线程取出发送，慢客户端
+    不会阻塞调用方。每个逻辑通道有独立的队列，写线程总是先发送优先级最高
+    （通道号最小）的通道；大消息按分片取出，控制和输入消息可以插在屏幕帧
+    或文件数据的分片之间发送。
+
+    队列满时按消息类型选择处理策略，例如只关心最新内容的消息丢弃最旧的
+    一条，文件数据和屏幕帧阻塞等待。入队后的数据在发送完成前不能被修改。
+    """
+
+    def __init__(self, max_size=64, overflow_policy=OVERFLOW_BLOCK, type_policies=None,
+                 block_timeout=None, fragment_size=DEFAULT_FRAGMENT_SIZE):
+        """
+        Args:
+            max_size: 每个通道的队列容量（消息条数）
+            overflow_policy: 默认的溢出策略
+            type_policies: 按消息类型覆盖的溢出策略，例如 {'clipboard_content': 'drop_oldest'}
+            block_timeout: block 策略的最长等待时间（秒），None 表示一直等待
+            fragment_size: 分片大小（字节）
+        """
+        for policy in [overflow_policy] + list((type_policies or {}).values()):
+            if policy not in OVERFLOW_POLICIES:
+                raise ValueError(f"Unknown overflow policy: {policy}")
+        self.max_size = max_size
+        self.overflow_policy = overflow_policy
+        self.type_policies = dict(type_policies or {})
+        self.block_timeout = block_timeout
+        self.fragment_size = fragment_size
+        # 通道 -> 待发送消息 [消息类型, 数据视图, 已发送偏移]
+        self.channels = {}
+        self.condition = threading.Condition()
+        self.closed = False
+        # 加密分片的密文缓冲区，只由写线程使用，每个分片复用
+        self.scratch = None
+        # 统计信息
+        self.max_depth = 0
+        self.enqueued = 0
+        self.sent = 0
+        self.bytes_sent = 0
+        self.dropped = 0
+        self.blocked_time = 0.0
+
+    def put(self, message_type, data, channel=None, block=True):
+        """放入一条消息
+
+        Args:
+            message_type: 消息类型
+            data: 消息数据
+            channel: 通道，None 表示使用消息类型的默认通道
+            block: 为 False 时 block 策略下队列已满不等待，直接返回 False
+                （事件循环线程中不能阻塞）
+
+        Returns:
+            是否入队成功，被丢弃或队列已关闭时返回 False
+        """
+        if channel is None:
+            channel = get_channel(message_type)
+        policy = self.type_policies.get(message_type, self.overflow_policy)
+        view = as_byte_view(data)
+        with self.condition:
+            if self.closed:
+                return False
+            queue = self.channels.setdefault(channel, collections.deque())
+
+            if len(queue) >= self.max_size:
+                if policy == OVERFLOW_DROP:
+                    self.dropped += 1
+                    return False
+                if policy == OVERFLOW_DROP_OLDEST:
+                    if not self._drop_oldest(queue, message_type):
+                        # 队列中没有可丢弃的同类型消息，丢弃新消息
+                        self.dropped += 1
+                        return False
+                elif not block:
+                    self.dropped += 1
+                    return False
+                else:
+                    start = time.time()
+                    ready = self.condition.wait_for(
+                        lambda: self.closed or len(queue) < self.max_size,
+                        self.block_timeout
+                    )
+                    self.blocked_time += time.time() - start
+                    if self.closed:
+                        return False
+                    if not ready:
+                        self.dropped += 1
+                        return False
+
+            queue.append([message_type, view, 0])
+            self.enqueued += 1
+            self.max_depth = max(self.max_depth, self._depth())
+            self.condition.notify_all()
+            return True
+
+    def _drop_oldest(self, queue, message_type):
+        for index, (queued_type, _, offset) in enumerate(queue):
+            # 已开始发送分片的消息不能丢弃
+            if queued_type == message_type and offset == 0:
+                del queue[index]
+                self.dropped += 1
+                return True
+        return False
+
+    def _depth(self):
+        return sum(len(queue) for queue in self.channels.values())
+
+    def get(self, timeout=None, fragment=True):
+        """取出下一个待发送的分片
+
+        Args:
+            timeout: 等待时间（秒），None 表示一直等待
+            fragment: 是否切片，为 False 时一次取出整条消息（旧版协议不支持分片）
+
+        Returns:
+            (消息类型, 通道, 分片数据, 是否首个分片, 是否还有后续分片)，
+            队列关闭或超时返回 None
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.closed or self._depth(), timeout):
+                return None
+            if self.closed:
+                return None
+
+            channel = min(channel for channel, queue in self.channels.items() if queue)
+            queue = self.channels[channel]
+            entry = queue[0]
+            message_type, view, offset = entry
+            end = view.nbytes
+            if fragment and self.fragment_size:
+                end = min(end, offset + self.fragment_size)
+            more = end < view.nbytes
+            if more:
+                entry[2] = end
+            else:
+                queue.popleft()
+                self.condition.notify_all()
+            return message_type, channel, view[offset:end], offset == 0, more
+
+    def send_next(self, sock, get_protocol=None, cipher=None):
+        """等待并取出下一个分片写入套接字，供连接的写线程循环调用
+
+        Args:
+            sock: 已连接的套接字
+            get_protocol: 返回当前传输协议的函数，取到消息后才调用，
+                因此等待期间完成的协议协商也会生效；None 表示二进制协议
+            cipher: 会话加密（SessionCipher），仅用于二进制协议，None 表示不加密
+
+        Returns:
+            队列已关闭时返回 False
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.closed or self._depth()):
+                return False
+        protocol = get_protocol() if get_protocol else PROTOCOL_BINARY
+        item = self.get(fragment=protocol == PROTOCOL_BINARY)
+        if item is None:
+            return False
+        message_type, channel, payload, first, more = item
+        if protocol == PROTOCOL_BINARY:
+            if cipher is not None and self.scratch is None:
+                # 类型名前缀最长 256 字节，密文后附带认证标签
+                self.scratch = bytearray(self.fragment_size + 256 + TAG_SIZE)
+            size = send_fragment(sock, message_type, payload, channel, first, more,
+                                 cipher, self.scratch)
+        else:
+            size = send_message_buffers(sock, message_type, payload, protocol)
+        self.task_done(size, not more)
+        return True
+
+    def task_done(self, size, finished=True):
+        """记录一个分片已发送
+
+        Args:
+            size: 分片字节数
+            finished: 是否为消息的最后一个分片
+        """
+        with self.condition:
+            self.bytes_sent += size
+            if finished:
+                self.sent += 1
+
+    def close(self):
+        """关闭队列，唤醒所有等待的线程，未发送的消息被丢弃"""
+        with self.condition:
+            self.closed = True
+            self.channels.clear()
+            self.condition.notify_all()
+
+    def depth(self, channel=None):
+        """队列中的消息数
+
+        Args:
+            channel: 只统计该通道，None 表示所有通道
+        """
+        with self.condition:
+            if channel is not None:
+                return len(self.channels.get(channel, ()))
+            return self._depth()
+
+    def get_metrics(self):
+        """获取队列统计信息"""
+        with self.condition:
+            return {
+                'queue_depth': self._depth(),
+                'channel_depths': {channel: len(queue) for channel, queue in self.channels.items()},
+                'max_depth': self.max_depth,
+                'enqueued': self.enqueued,
+                'sent': self.sent,
+                'bytes_sent': self.bytes_sent,
+                'dropped': self.dropped,
+                'blocked_time': self.blocked_time
+            }
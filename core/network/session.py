@@ -0,0 +1,333 @@
+import collections
+import json
+import os
+import threading
+import time
+from Crypto.Hash import SHA256
+from Crypto.Protocol.KDF import HKDF
+from Crypto.Random import get_random_bytes
+from .encryption import (
+    SessionCipher, CIPHER_AES_GCM, CIPHER_ALGORITHMS, DEFAULT_KEY_DIR, write_private_file
+)
+from .protocol import PROTOCOL_VERSION, ProtocolError, send_message_buffers
+
+# 加密握手的超时时间（秒）
+HANDSHAKE_TIMEOUT = 10
+
+# 服务器等待客户端 hello 的时间（秒），超时未开始握手的客户端（旧版 JSON、
+# 只接收不发送的客户端）按不加密处理，写线程开始发送
+HELLO_TIMEOUT = 1.0
+
+# 由传输层处理、不交给处理函数的握手消息
+HANDSHAKE_MESSAGES = ('hello', 'session_public_key', 'session_key', 'session_resumed')
+
+# 会话票据的默认有效期（秒）和服务器缓存的票据数
+DEFAULT_TICKET_LIFETIME = 3600
+DEFAULT_MAX_TICKETS = 1024
+
+TICKET_ID_SIZE = 16
+NONCE_SIZE = 16
+
+# 客户端记录的服务器身份公钥指纹
+KNOWN_SERVERS_FILE = os.path.join(DEFAULT_KEY_DIR, 'known_servers.json')
+
+# 每个连接一次握手，之后所有二进制帧用 AEAD 会话密钥加密：
+#   客户端 -> hello {'version': 2, 'encryption': 算法}
+#   服务器 -> session_public_key 服务器的身份公钥
+#   客户端 -> session_key 用该公钥加密（或 X25519 协商）的会话密钥
+# hello 不带 encryption 字段时连接不加密。
+#
+# 客户端首次连接某个服务器时记录其身份公钥的指纹（首次使用即信任，见
+# KnownServers），之后该服务器的公钥变化时握手失败，中间人无法替换公钥。
+# 首次连接本身无法验证，需要时应在配对界面上核对指纹。
+#
+# 会话建立后服务器通过加密通道发送 session_ticket（票据ID），双方由会话密钥
+# 和票据ID派生出恢复密钥。重连时客户端在 hello 中带上票据ID和随机数：
+#   客户端 -> hello {..., 'ticket': 票据ID, 'nonce': 客户端随机数}
+#   服务器 -> session_resumed {'nonce': 服务器随机数}
+# 双方用恢复密钥和两个随机数派生新的会话密钥，一个往返且不需要公钥运算。
+# 票据只能使用一次，恢复后服务器签发新票据；票据未知或过期时服务器按完整
+# 握手回复 session_public_key。
+
+class ServerIdentityError(ProtocolError):
+    """服务器的身份公钥与记录的指纹不一致"""
+    pass
+
+def build_hello(algorithm=None, ticket_id=None, client_nonce=None):
+    """构建 hello 消息负载
+
+    Args:
+        algorithm: 请求的会话加密算法，None 表示不加密
+        ticket_id: 用于恢复会话的票据ID
+        client_nonce: 恢复会话时客户端的随机数
+    """
+    hello = {'version': PROTOCOL_VERSION}
+    if algorithm:
+        hello['encryption'] = algorithm
+        if ticket_id:
+            hello['ticket'] = ticket_id.hex()
+            hello['nonce'] = client_nonce.hex()
+    return json.dumps(hello).encode('utf-8')
+
+def parse_hello(data):
+    """解析 hello 消息负载
+
+    Returns:
+        (协议版本, 请求的加密算法或 None, 恢复会话的 (票据ID, 客户端随机数) 或 None)
+
+    Raises:
+        ProtocolError: 负载格式错误或加密算法不支持
+    """
+    try:
+        hello = json.loads(bytes(data).decode('utf-8'))
+        algorithm = hello.get('encryption')
+        resume = None
+        if algorithm and 'ticket' in hello:
+            resume = bytes.fromhex(hello['ticket']), bytes.fromhex(hello['nonce'])
+    except (ValueError, KeyError, TypeError):
+        raise ProtocolError("Bad hello message")
+    if algorithm is not None and algorithm not in CIPHER_ALGORITHMS:
+        raise ProtocolError(f"Unsupported cipher algorithm: {algorithm}")
+    if resume and len(resume[1]) != NONCE_SIZE:
+        raise ProtocolError("Bad resumption nonce")
+    return hello.get('version'), algorithm, resume
+
+def client_handshake(sock, reader, manager, algorithm=CIPHER_AES_GCM, timeout=HANDSHAKE_TIMEOUT,
+                     ticket=None, known_servers=None, server_id=None):
+    """在连接建立后同步完成加密握手，须在接收线程和写线程启动前调用
+
+    Args:
+        sock: 已连接的套接字
+        reader: 该连接的 FrameReader，握手完成后设置其 cipher
+        manager: EncryptionManager，用于加密会话密钥
+        algorithm: 会话加密算法
+        timeout: 等待服务器响应的超时时间（秒）
+        ticket: 上次会话得到的 SessionTicket，服务器接受时跳过公钥运算
+        known_servers: KnownServers，校验并记录服务器身份公钥的指纹，None 表示不校验
+        server_id: 服务器标识（地址:端口），指纹按此记录
+
+    Returns:
+        (SessionCipher 实例, 是否为恢复的会话)
+
+    Raises:
+        ProtocolError: 服务器响应错误
+        ServerIdentityError: 服务器身份公钥与记录的指纹不一致
+        ConnectionError: 握手期间连接关闭
+    """
+    client_nonce = get_random_bytes(NONCE_SIZE) if ticket else None
+    sock.settimeout(timeout)
+    try:
+        send_message_buffers(sock, 'hello', build_hello(
+            algorithm, ticket.ticket_id if ticket else None, client_nonce
+        ))
+        message = reader.read_message()
+        if message is None:
+            raise ConnectionError("Connection closed during handshake")
+        message_type, data, _ = message
+        if message_type == 'session_resumed' and ticket:
+            key = derive_resumed_key(ticket.secret, client_nonce, _parse_nonce(data))
+            resumed = True
+        elif message_type == 'session_public_key':
+            public_key = bytes(data)
+            if known_servers is not None:
+                # 恢复的会话由票据认证，票据来自已校验过公钥的会话
+                known_servers.verify(server_id, manager.public_key_fingerprint(public_key))
+            key, encrypted_key = manager.wrap_session_key(public_key)
+            send_message_buffers(sock, 'session_key', encrypted_key)
+            resumed = False
+        else:
+            raise ProtocolError(f"Unexpected handshake message: {message_type}")
+    finally:
+        sock.settimeout(None)
+    cipher = SessionCipher(key, initiator=True, algorithm=algorithm)
+    reader.cipher = cipher
+    return cipher, resumed
+
+def accept_session_key(manager, data, algorithm):
+    """服务器端：解密客户端发送的会话密钥
+
+    Returns:
+        SessionCipher 实例
+
+    Raises:
+        ProtocolError: 会话密钥无法解密
+    """
+    try:
+        key = manager.unwrap_session_key(data)
+    except ValueError as e:
+        raise ProtocolError(f"Bad session key: {e}")
+    return SessionCipher(key, initiator=False, algorithm=algorithm)
+
+def derive_resumption_secret(key, ticket_id):
+    """由会话密钥和票据ID派生恢复密钥"""
+    return HKDF(key, 32, b'', SHA256, context=b'remote-control resumption' + ticket_id)
+
+def derive_resumed_key(secret, client_nonce, server_nonce):
+    """由恢复密钥和双方的随机数派生新的会话密钥"""
+    return HKDF(secret, 32, client_nonce + server_nonce, SHA256,
+                context=b'remote-control resumed session')
+
+def _parse_nonce(data):
+    try:
+        nonce = bytes.fromhex(json.loads(bytes(data).decode('utf-8'))['nonce'])
+    except (ValueError, KeyError, TypeError):
+        raise ProtocolError("Bad session_resumed message")
+    if len(nonce) != NONCE_SIZE:
+        raise ProtocolError("Bad session_resumed message")
+    return nonce
+
+class SessionTicket:
+    """客户端保存的会话票据"""
+
+    def __init__(self, ticket_id, secret, expires):
+        self.ticket_id = ticket_id
+        self.secret = secret
+        self.expires = expires
+
+    @classmethod
+    def from_message(cls, data, cipher):
+        """由服务器的 session_ticket 消息和当前会话创建票据
+
+        Raises:
+            ProtocolError: 消息格式错误
+        """
+        try:
+            message = json.loads(bytes(data).decode('utf-8'))
+            ticket_id = bytes.fromhex(message['ticket'])
+            lifetime = float(message['lifetime'])
+        except (ValueError, KeyError, TypeError):
+            raise ProtocolError("Bad session_ticket message")
+        return cls(ticket_id, derive_resumption_secret(cipher.key, ticket_id),
+                   time.time() + lifetime)
+
+    def is_valid(self):
+        return time.time() < self.expires
+
+class KnownServers:
+    """客户端记录的服务器身份公钥指纹（首次使用即信任）
+
+    服务器标识 -> 公钥指纹，保存在身份密钥所在的配置目录中。首次连接时
+    记录，之后公钥不一致时拒绝握手；服务器确实更换了密钥时调用 forget
+    重新配对。可在多个连接线程中共享。
+    """
+
+    def __init__(self, path=KNOWN_SERVERS_FILE):
+        """
+        Args:
+            path: 保存指纹的文件，None 表示只保存在内存中
+        """
+        self.path = path
+        self.fingerprints = None  # 首次使用时从文件加载
+        self.lock = threading.Lock()
+
+    def _load(self):
+        if self.fingerprints is not None:
+            return
+        self.fingerprints = {}
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                self.fingerprints = dict(json.loads(f.read().decode('utf-8')))
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Load known servers error: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            write_private_file(self.path, json.dumps(self.fingerprints, indent=2).encode('utf-8'))
+        except OSError as e:
+            print(f"Save known servers error: {e}")
+
+    def get(self, server_id):
+        """记录的公钥指纹，未记录时返回 None"""
+        with self.lock:
+            self._load()
+            return self.fingerprints.get(server_id)
+
+    def verify(self, server_id, fingerprint):
+        """校验服务器的公钥指纹，首次连接时记录
+
+        Raises:
+            ServerIdentityError: 指纹与记录不一致
+        """
+        with self.lock:
+            self._load()
+            known = self.fingerprints.get(server_id)
+            if known is None:
+                self.fingerprints[server_id] = fingerprint
+                self._save()
+            elif known != fingerprint:
+                raise ServerIdentityError(f"Server identity key changed for {server_id}: "
+                                          f"expected {known}, got {fingerprint}")
+
+    def forget(self, server_id):
+        """删除记录的指纹，下次连接时重新记录"""
+        with self.lock:
+            self._load()
+            if self.fingerprints.pop(server_id, None) is not None:
+                self._save()
+
+class SessionTicketCache:
+    """服务器端的会话票据缓存
+
+    票据ID -> (恢复密钥, 过期时间)，超过容量时淘汰最旧的票据。票据只能
+    使用一次，防止重放的 hello 恢复出同一会话。可在多个连接线程中共享。
+    """
+
+    def __init__(self, lifetime=DEFAULT_TICKET_LIFETIME, max_tickets=DEFAULT_MAX_TICKETS):
+        """
+        Args:
+            lifetime: 票据有效期（秒）
+            max_tickets: 最多缓存的票据数
+        """
+        self.lifetime = lifetime
+        self.max_tickets = max_tickets
+        self.tickets = collections.OrderedDict()
+        self.lock = threading.Lock()
+        # 统计信息
+        self.issued = 0
+        self.resumed = 0
+        self.rejected = 0
+
+    def issue(self, cipher):
+        """为刚建立的会话签发票据
+
+        Returns:
+            session_ticket 消息负载
+        """
+        ticket_id = get_random_bytes(TICKET_ID_SIZE)
+        secret = derive_resumption_secret(cipher.key, ticket_id)
+        with self.lock:
+            self.tickets[ticket_id] = (secret, time.time() + self.lifetime)
+            while len(self.tickets) > self.max_tickets:
+                self.tickets.popitem(last=False)
+            self.issued += 1
+        return json.dumps({'ticket': ticket_id.hex(), 'lifetime': self.lifetime}).encode('utf-8')
+
+    def resume(self, ticket_id, client_nonce, algorithm):
+        """用票据恢复会话，票据随即失效
+
+        Returns:
+            (SessionCipher 实例, session_resumed 消息负载)；票据未知或过期时返回 None
+        """
+        with self.lock:
+            entry = self.tickets.pop(ticket_id, None)
+            if entry is None or entry[1] < time.time():
+                self.rejected += 1
+                return None
+            self.resumed += 1
+        server_nonce = get_random_bytes(NONCE_SIZE)
+        key = derive_resumed_key(entry[0], client_nonce, server_nonce)
+        cipher = SessionCipher(key, initiator=False, algorithm=algorithm)
+        return cipher, json.dumps({'nonce': server_nonce.hex()}).encode('utf-8')
+
+    def get_metrics(self):
+        with self.lock:
+            return {
+                'tickets': len(self.tickets),
+                'issued': self.issued,
+                'resumed': self.resumed,
+                'rejected': self.rejected
+            }
@@ -1,30 +1,117 @@
 import socket
 import threading
-import json
-import time
+from .protocol import FrameReader, PROTOCOL_BINARY, send_message_buffers
+from .encryption import encryption_manager as default_encryption_manager, CIPHER_AES_GCM
+from .session import KnownServers, ServerIdentityError, SessionTicket, build_hello, client_handshake
+from .send_queue import OutboundQueue, OVERFLOW_BLOCK, DEFAULT_TYPE_POLICIES
+from .dispatcher import MessageDispatcher, EXECUTOR_INLINE
 
 class TCPClient:
-    def __init__(self):
+    def __init__(self, protocol=PROTOCOL_BINARY, queue_size=64, overflow_policy=OVERFLOW_BLOCK,
+                 type_policies=None, dispatcher=None, encryption=False,
+                 cipher_algorithm=CIPHER_AES_GCM, encryption_manager=None, session_resumption=True,
+                 pin_server_key=True, known_servers=None):
+        self.protocol = protocol  # 'binary' 或旧版 'json'
+        # 会话加密：每次连接做一次公钥握手（或凭票据恢复），之后帧负载用 AEAD 加密，仅支持二进制协议
+        if encryption and protocol != PROTOCOL_BINARY:
+            raise ValueError("Encryption requires the binary protocol")
+        self.encryption = encryption
+        self.cipher_algorithm = cipher_algorithm
+        self.encryption_manager = encryption_manager or default_encryption_manager
+        self.cipher = None
+        # 服务器签发的会话票据，重连时用于恢复会话，跳过公钥运算
+        self.session_resumption = session_resumption
+        self.session_ticket = None
+        self.resumed = False  # 当前连接是否为恢复的会话
+        # 服务器身份公钥的指纹记录，首次连接时记录，之后公钥变化时拒绝连接
+        self.known_servers = None
+        if pin_server_key:
+            self.known_servers = known_servers or KnownServers()
+        # 发送队列配置，见 OutboundQueue
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.type_policies = DEFAULT_TYPE_POLICIES if type_policies is None else type_policies
+        self.reader = None
+        self.queue = None
+        self.write_thread = None
         self.socket = None
         self.server_address = None
         self.running = False
+        self.connect_thread = None
         self.receive_thread = None
         self.handlers = {}
+        self.zero_copy_types = set()  # 直接接收 memoryview 的消息类型
+        # 处理函数调度器，决定处理函数在接收线程、线程池还是进程池中执行
+        self.dispatcher = dispatcher or MessageDispatcher()
         self.connected = False
         self.reconnect_timer = None
         self.reconnect_interval = 5  # 重连间隔（秒）
         
     def connect(self, server_ip, server_port):
+        """在后台线程中连接服务器并完成加密握手，不阻塞调用线程（如 UI 线程）
+
+        连接结果用 wait_connected 等待或 is_connected 查询，失败时按
+        reconnect_interval 自动重连。
+        """
+        if self.connect_thread and self.connect_thread.is_alive():
+            return
+        if self.server_address != (server_ip, server_port):
+            # 票据只对签发它的服务器有效
+            self.session_ticket = None
         self.server_address = (server_ip, server_port)
         self.running = True
-        self._connect()
+        self.dispatcher.start()
+        self.connect_thread = threading.Thread(target=self._connect)
+        self.connect_thread.daemon = True
+        self.connect_thread.start()
+
+    def wait_connected(self, timeout=None):
+        """等待 connect 发起的连接尝试结束
+
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            是否已连接
+        """
+        if self.connect_thread:
+            self.connect_thread.join(timeout)
+        return self.connected
         
     def _connect(self):
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.settimeout(5)
             self.socket.connect(self.server_address)
+            self.socket.settimeout(None)
+            self.reader = FrameReader(self.socket, protocol=self.protocol)
+            self.cipher = None
+            self.resumed = False
+            if self.protocol == PROTOCOL_BINARY:
+                # 首条消息向服务器声明使用二进制帧协议，需要加密时同步完成握手
+                if self.encryption:
+                    # 票据只能使用一次，新会话建立后服务器会签发新票据
+                    ticket, self.session_ticket = self.session_ticket, None
+                    if ticket and not ticket.is_valid():
+                        ticket = None
+                    self.cipher, self.resumed = client_handshake(
+                        self.socket, self.reader, self.encryption_manager,
+                        self.cipher_algorithm, ticket=ticket, known_servers=self.known_servers,
+                        server_id=f"{self.server_address[0]}:{self.server_address[1]}"
+                    )
+                else:
+                    send_message_buffers(self.socket, 'hello', build_hello())
+            if not self.running:
+                # 握手期间已调用 disconnect
+                self.socket.close()
+                return
+            self.queue = OutboundQueue(self.queue_size, self.overflow_policy, self.type_policies)
             self.connected = True
+            # 写线程按通道优先级发送，大块文件数据不会阻塞输入事件
+            self.write_thread = threading.Thread(target=self._write,
+                                                 args=(self.socket, self.queue, self.cipher))
+            self.write_thread.daemon = True
+            self.write_thread.start()
             self.receive_thread = threading.Thread(target=self._receive)
             self.receive_thread.daemon = True
             self.receive_thread.start()
@@ -32,6 +119,13 @@ class TCPClient:
         except Exception as e:
             print(f"Failed to connect to {self.server_address[0]}:{self.server_address[1]}: {e}")
             self.connected = False
+            try:
+                self.socket.close()
+            except:
+                pass
+            if isinstance(e, ServerIdentityError):
+                # 公钥不一致重试也不会成功，需要用户确认后 forget 重新配对
+                return
             self._schedule_reconnect()
         
     def _schedule_reconnect(self):
@@ -45,6 +139,16 @@ class TCPClient:
         self.connected = False
         if self.reconnect_timer:
             self.reconnect_timer.cancel()
+        if self.queue:
+            self.queue.close()
+        if self.socket:
+            # 唤醒阻塞在 recv 中的接收线程
+            try:
+                self.socket.shutdown(socket.SHUT_RDWR)
+            except:
+                pass
+        if self.connect_thread:
+            self.connect_thread.join(1)
         if self.receive_thread:
             self.receive_thread.join(1)
         if self.socket:
@@ -53,78 +157,119 @@ class TCPClient:
             except:
                 pass
             self.socket = None
+        self.dispatcher.shutdown()
             
     def _receive(self):
         while self.running and self.connected:
             try:
-                # 接收消息头部
-                header = self.socket.recv(1024).decode('utf-8')
-                if not header:
-                    break
-                    
-                # 解析消息头部
-                header_data = json.loads(header)
-                message_type = header_data['type']
-                data_length = header_data.get('length', 0)
-                
-                # 接收消息数据
-                data = b''
-                while len(data) < data_length:
-                    packet = self.socket.recv(min(4096, data_length - len(data)))
-                    if not packet:
-                        break
-                    data += packet
-                
-                if len(data) < data_length:
+                # 接收并解析消息帧
+                message = self.reader.read_message()
+                if message is None:
                     break
+                message_type, data, channel = message
                     
                 # 处理消息
-                self._process_message(message_type, data)
+                if message_type == 'session_ticket':
+                    self._store_ticket(data)
+                else:
+                    self._process_message(message_type, data, channel)
                 
             except Exception as e:
                 print(f"TCP client receive error: {e}")
                 break
         
         self.connected = False
+        self.queue.close()
         if self.running:
             self._schedule_reconnect()
             
-    def _process_message(self, message_type, data):
-        if message_type in self.handlers:
+    def _store_ticket(self, data):
+        """保存服务器签发的会话票据"""
+        if not self.session_resumption or self.cipher is None:
+            return
+        try:
+            self.session_ticket = SessionTicket.from_message(data, self.cipher)
+        except Exception as e:
+            print(f"Session ticket error: {e}")
+
+    def _write(self, client_socket, queue, cipher=None):
+        """写线程：按通道优先级取出分片并发送"""
+        while True:
             try:
-                self.handlers[message_type](data)
+                if not queue.send_next(client_socket, lambda: self.protocol, cipher):
+                    break
             except Exception as e:
-                print(f"Handler error for {message_type}: {e}")
+                if self.connected:
+                    print(f"Send message error: {e}")
+                # 关闭连接，由接收线程负责重连
+                try:
+                    client_socket.shutdown(socket.SHUT_RDWR)
+                except:
+                    pass
+                break
+            
+    def _process_message(self, message_type, data, channel=None):
+        handler = self.handlers.get(message_type)
+        if handler is None:
+            return
+        inline = self.dispatcher.get_executor(message_type) == EXECUTOR_INLINE
+        if not inline or message_type not in self.zero_copy_types:
+            # 接收缓冲区会被下一条消息复用，普通处理函数和异步执行的处理函数得到一份副本
+            data = bytes(data)
+        # 同一通道的消息按顺序处理
+        self.dispatcher.dispatch(channel, message_type, handler, data)
+        
+    def register_handler(self, message_type, handler, zero_copy=False, executor=None):
+        """注册消息处理函数
         
-    def register_handler(self, message_type, handler):
+        Args:
+            message_type: 消息类型
+            handler: 处理函数
+            zero_copy: 为 True 时处理函数直接得到接收缓冲区的 memoryview，
+                该视图只在处理函数返回前有效，仅对 inline 执行方式生效
+            executor: 执行方式，'inline'、'thread'或'process'，None 表示调度器默认值
+        """
         self.handlers[message_type] = handler
+        if executor:
+            self.dispatcher.set_executor(message_type, executor)
+        if zero_copy:
+            self.zero_copy_types.add(message_type)
+        else:
+            self.zero_copy_types.discard(message_type)
         
     def unregister_handler(self, message_type):
         if message_type in self.handlers:
             del self.handlers[message_type]
+        self.zero_copy_types.discard(message_type)
             
-    def send_message(self, message_type, data=b''):
-        if not self.connected or not self.socket:
-            return False
-            
-        try:
-            # 构建消息头部
-            header = {
-                'type': message_type,
-                'length': len(data),
-                'timestamp': time.time()
-            }
-            header_bytes = json.dumps(header).encode('utf-8')
-            
-            # 发送消息头部和数据
-            self.socket.sendall(header_bytes + b'\n' + data)
-            return True
-        except Exception as e:
-            print(f"Send message error: {e}")
-            self.connected = False
-            if self.running:
-                self._schedule_reconnect()
+    def send_message(self, message_type, data=b'', channel=None):
+        """把消息放入发送队列
+        
+        Args:
+            message_type: 消息类型
+            data: 消息数据
+            channel: 逻辑通道，None 表示使用消息类型的默认通道
+        
+        Returns:
+            是否入队成功
+        """
+        if not self.connected or not self.queue:
             return False
+        return self.queue.put(message_type, data, channel)
+        
+    def get_metrics(self):
+        """获取发送队列的统计信息"""
+        if not self.queue:
+            return None
+        return self.queue.get_metrics()
+        
+    def get_handler_stats(self):
+        """获取每种消息类型的处理统计（排队等待时间、处理耗时）"""
+        return self.dispatcher.get_stats()
             
+    def is_encrypted(self):
+        """当前连接是否已建立加密会话"""
+        return self.connected and self.cipher is not None
+
     def is_connected(self):
         return self.connected
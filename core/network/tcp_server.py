@@ -1,19 +1,51 @@
 import socket
 import threading
-import json
 import time
+from .protocol import FrameReader, ProtocolError, PROTOCOL_BINARY, send_message_buffers
+from .encryption import encryption_manager as default_encryption_manager
+from .session import (
+    HANDSHAKE_MESSAGES, HELLO_TIMEOUT, SessionTicketCache, parse_hello, accept_session_key
+)
+from .send_queue import OutboundQueue, OVERFLOW_BLOCK, DEFAULT_TYPE_POLICIES
+from .dispatcher import MessageDispatcher, EXECUTOR_INLINE
 
 class TCPServer:
-    def __init__(self, port=5001):
+    def __init__(self, port=5001, allow_legacy=True, queue_size=64,
+                 overflow_policy=OVERFLOW_BLOCK, type_policies=None, block_timeout=None,
+                 dispatcher=None, encryption=True, require_encryption=False,
+                 encryption_manager=None, session_resumption=True, ticket_cache=None):
         self.port = port
+        self.allow_legacy = allow_legacy  # 是否接受旧版 JSON 头部协议的客户端
+        # 会话加密：encryption 为是否接受客户端请求的加密会话，
+        # require_encryption 为是否拒绝不加密的客户端（包括旧版 JSON 客户端）
+        self.encryption = encryption
+        self.require_encryption = require_encryption
+        self.encryption_manager = encryption_manager or default_encryption_manager
+        # 会话票据缓存，客户端重连时凭票据恢复会话，不再做公钥运算
+        self.ticket_cache = None
+        if session_resumption:
+            self.ticket_cache = ticket_cache or SessionTicketCache()
+        # 每个连接的发送队列配置，见 OutboundQueue
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.type_policies = DEFAULT_TYPE_POLICIES if type_policies is None else type_policies
+        self.block_timeout = block_timeout
         self.server_socket = None
         self.clients = {}
+        self.clients_lock = threading.Lock()  # 保护 clients，客户端线程会并发修改
         self.running = False
         self.listen_thread = None
         self.handlers = {}
+        self.zero_copy_types = set()  # 直接接收 memoryview 的消息类型
+        # 处理函数调度器，决定处理函数在接收线程、线程池还是进程池中执行
+        self.dispatcher = dispatcher or MessageDispatcher()
         
     def start(self):
         self.running = True
+        self.dispatcher.start()
+        if self.encryption:
+            # 首次运行时身份密钥在后台生成，不阻塞启动
+            self.encryption_manager.prepare_identity_key()
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.server_socket.bind(('', self.port))
@@ -26,10 +58,11 @@ class TCPServer:
         self.running = False
         if self.listen_thread:
             self.listen_thread.join(1)
-        for client_id, client in list(self.clients.items()):
+        for client_id in self.get_clients():
             self._close_client(client_id)
         if self.server_socket:
             self.server_socket.close()
+        self.dispatcher.shutdown()
         
     def _listen(self):
         while self.running:
@@ -48,38 +81,47 @@ class TCPServer:
         
     def _handle_client(self, client_socket, client_address):
         client_id = f"{client_address[0]}:{client_address[1]}"
-        self.clients[client_id] = {
+        reader = FrameReader(client_socket, allow_legacy=self.allow_legacy)
+        client = {
             'socket': client_socket,
             'address': client_address,
+            'reader': reader,
+            'queue': OutboundQueue(self.queue_size, self.overflow_policy,
+                                   self.type_policies, self.block_timeout),
+            # 握手完成（或确定不加密）后写线程才开始发送
+            'ready': threading.Event(),
+            'handshake': None,  # 握手进行中时为请求的加密算法
+            'lock': threading.Lock(),  # 保护 ready/handshake 的判断和修改
+            'cipher': None,
             'last_active': time.time()
         }
+        if not self.encryption:
+            # 不接受加密会话，无需等待 hello
+            client['ready'].set()
+        with self.clients_lock:
+            self.clients[client_id] = client
+        
+        # 每个连接一个写线程，慢客户端只会填满自己的发送队列
+        writer_thread = threading.Thread(target=self._write_client, args=(client_id, client))
+        writer_thread.daemon = True
+        writer_thread.start()
         
         try:
             while self.running:
-                # 接收消息头部
-                header = client_socket.recv(1024).decode('utf-8')
-                if not header:
-                    break
-                    
-                # 解析消息头部
-                header_data = json.loads(header)
-                message_type = header_data['type']
-                data_length = header_data.get('length', 0)
-                
-                # 接收消息数据
-                data = b''
-                while len(data) < data_length:
-                    packet = client_socket.recv(min(4096, data_length - len(data)))
-                    if not packet:
-                        break
-                    data += packet
-                
-                if len(data) < data_length:
+                # 接收并解析消息帧，首条消息决定该连接使用的协议
+                message = reader.read_message()
+                if message is None:
                     break
+                message_type, data, channel = message
                     
-                # 处理消息
-                self._process_message(message_type, data, client_id)
-                self.clients[client_id]['last_active'] = time.time()
+                # 处理消息，握手消息由传输层处理
+                if message_type in HANDSHAKE_MESSAGES:
+                    self._handle_handshake(client, message_type, data)
+                else:
+                    if not client['ready'].is_set():
+                        self._check_unencrypted(client)
+                    self._process_message(message_type, data, client_id, channel)
+                client['last_active'] = time.time()
                 
         except Exception as e:
             if self.running:
@@ -87,54 +129,188 @@ class TCPServer:
         finally:
             self._close_client(client_id)
             
+    def _handle_handshake(self, client, message_type, data):
+        """处理 hello 和加密握手消息
+
+        Raises:
+            ProtocolError: 握手顺序错误、加密请求被拒绝或会话密钥无法解密
+        """
+        if message_type == 'hello':
+            with client['lock']:
+                _, algorithm, resume = parse_hello(data)
+                # 不加密的 hello 只声明协议，可能在写线程已开始发送之后到达
+                if client['handshake'] or (algorithm is not None and client['ready'].is_set()):
+                    raise ProtocolError("Unexpected hello")
+                if algorithm is None:
+                    self._check_unencrypted(client)
+                    return
+                if not self.encryption:
+                    raise ProtocolError("Encryption not supported")
+                # 握手开始后写线程不会因 hello 超时而开始发送，可以直接写套接字
+                client['handshake'] = algorithm
+            if resume and self.ticket_cache:
+                resumed = self.ticket_cache.resume(resume[0], resume[1], algorithm)
+                if resumed:
+                    cipher, response = resumed
+                    send_message_buffers(client['socket'], 'session_resumed', response)
+                    client['handshake'] = None
+                    self._start_session(client, cipher)
+                    return
+            send_message_buffers(client['socket'], 'session_public_key',
+                                 self.encryption_manager.get_identity_public_key())
+        elif message_type == 'session_key':
+            if not client['handshake']:
+                raise ProtocolError("Unexpected session key")
+            cipher = accept_session_key(self.encryption_manager, data, client['handshake'])
+            client['handshake'] = None
+            self._start_session(client, cipher)
+        else:
+            raise ProtocolError(f"Unexpected handshake message: {message_type}")
+
+    def _start_session(self, client, cipher):
+        """加密会话建立，签发下次重连使用的票据后开始发送"""
+        client['cipher'] = cipher
+        client['reader'].cipher = cipher
+        if self.ticket_cache:
+            client['queue'].put('session_ticket', self.ticket_cache.issue(cipher))
+        client['ready'].set()
+
+    def _check_unencrypted(self, client):
+        """客户端不加密（不带加密请求的 hello、旧版 JSON 协议）时开始发送
+
+        Raises:
+            ProtocolError: 服务器要求加密或握手尚未完成
+        """
+        if client['handshake']:
+            raise ProtocolError("Message before handshake completed")
+        if self.require_encryption:
+            raise ProtocolError("Encryption required")
+        client['ready'].set()
+
+    def _hello_timeout(self, client):
+        """客户端没有及时发送 hello 且未开始握手时按不加密处理"""
+        with client['lock']:
+            if not client['handshake'] and not self.require_encryption:
+                client['ready'].set()
+
+    def _write_client(self, client_id, client):
+        """写线程：按通道优先级取出分片并发送"""
+        queue = client['queue']
+        client_socket = client['socket']
+        if not client['ready'].wait(HELLO_TIMEOUT):
+            # 旧版 JSON 客户端和只接收的客户端不会发送 hello，不必等到它的第一条消息
+            self._hello_timeout(client)
+            client['ready'].wait()
+        cipher = client['cipher']
+        while True:
+            try:
+                # 按协商结果发送，协商完成前默认使用二进制帧
+                get_protocol = lambda: client['reader'].protocol or PROTOCOL_BINARY
+                if not queue.send_next(client_socket, get_protocol, cipher):
+                    break
+                client['last_active'] = time.time()
+            except Exception as e:
+                if self.running:
+                    print(f"Send message error to {client_id}: {e}")
+                self._close_client(client_id)
+                break
+            
     def _close_client(self, client_id):
-        if client_id in self.clients:
+        with self.clients_lock:
+            client = self.clients.pop(client_id, None)
+        if client:
+            client['queue'].close()
+            # 唤醒等待握手的写线程，队列已关闭，写线程随即退出
+            client['ready'].set()
             try:
-                self.clients[client_id]['socket'].close()
+                client['socket'].shutdown(socket.SHUT_RDWR)
             except:
                 pass
-            del self.clients[client_id]
-            
-    def _process_message(self, message_type, data, client_id):
-        if message_type in self.handlers:
             try:
-                self.handlers[message_type](data, client_id)
-            except Exception as e:
-                print(f"Handler error for {message_type}: {e}")
+                client['socket'].close()
+            except:
+                pass
+            
+    def _process_message(self, message_type, data, client_id, channel=None):
+        handler = self.handlers.get(message_type)
+        if handler is None:
+            return
+        inline = self.dispatcher.get_executor(message_type) == EXECUTOR_INLINE
+        if not inline or message_type not in self.zero_copy_types:
+            # 接收缓冲区会被下一条消息复用，普通处理函数和异步执行的处理函数得到一份副本
+            data = bytes(data)
+        # 同一客户端同一通道的消息按顺序处理
+        self.dispatcher.dispatch((client_id, channel), message_type, handler, data, client_id)
         
-    def register_handler(self, message_type, handler):
+    def register_handler(self, message_type, handler, zero_copy=False, executor=None):
+        """注册消息处理函数
+        
+        Args:
+            message_type: 消息类型
+            handler: 处理函数
+            zero_copy: 为 True 时处理函数直接得到接收缓冲区的 memoryview，
+                该视图只在处理函数返回前有效，仅对 inline 执行方式生效
+            executor: 执行方式，'inline'、'thread'或'process'，None 表示调度器默认值
+        """
         self.handlers[message_type] = handler
+        if executor:
+            self.dispatcher.set_executor(message_type, executor)
+        if zero_copy:
+            self.zero_copy_types.add(message_type)
+        else:
+            self.zero_copy_types.discard(message_type)
         
     def unregister_handler(self, message_type):
         if message_type in self.handlers:
             del self.handlers[message_type]
+        self.zero_copy_types.discard(message_type)
             
-    def send_message(self, client_id, message_type, data=b''):
-        if client_id not in self.clients:
-            return False
-            
-        try:
-            client_socket = self.clients[client_id]['socket']
-            # 构建消息头部
-            header = {
-                'type': message_type,
-                'length': len(data),
-                'timestamp': time.time()
-            }
-            header_bytes = json.dumps(header).encode('utf-8')
-            
-            # 发送消息头部和数据
-            client_socket.sendall(header_bytes + b'\n' + data)
-            self.clients[client_id]['last_active'] = time.time()
-            return True
-        except Exception as e:
-            print(f"Send message error to {client_id}: {e}")
-            self._close_client(client_id)
+    def send_message(self, client_id, message_type, data=b'', channel=None):
+        """把消息放入客户端的发送队列
+        
+        Args:
+            client_id: 客户端ID
+            message_type: 消息类型
+            data: 消息数据
+            channel: 逻辑通道，None 表示使用消息类型的默认通道
+        
+        Returns:
+            是否入队成功，客户端不存在或消息按溢出策略被丢弃时返回 False
+        """
+        with self.clients_lock:
+            client = self.clients.get(client_id)
+        if client is None:
             return False
+        return client['queue'].put(message_type, data, channel)
             
-    def broadcast_message(self, message_type, data=b''):
-        for client_id in list(self.clients.keys()):
-            self.send_message(client_id, message_type, data)
+    def broadcast_message(self, message_type, data=b'', channel=None):
+        for client_id in self.get_clients():
+            self.send_message(client_id, message_type, data, channel)
             
+    def is_encrypted(self, client_id):
+        """客户端连接是否已建立加密会话"""
+        with self.clients_lock:
+            client = self.clients.get(client_id)
+        return client is not None and client['cipher'] is not None
+
     def get_clients(self):
-        return list(self.clients.keys())
+        with self.clients_lock:
+            return list(self.clients.keys())
+
+    def get_client_metrics(self, client_id):
+        """获取客户端发送队列的统计信息（队列深度、丢弃数等）"""
+        with self.clients_lock:
+            client = self.clients.get(client_id)
+        if client is None:
+            return None
+        return client['queue'].get_metrics()
+        
+    def get_metrics(self):
+        """获取所有客户端发送队列的统计信息"""
+        with self.clients_lock:
+            clients = list(self.clients.items())
+        return {client_id: client['queue'].get_metrics() for client_id, client in clients}
+        
+    def get_handler_stats(self):
+        """获取每种消息类型的处理统计（排队等待时间、处理耗时）"""
+        return self.dispatcher.get_stats()
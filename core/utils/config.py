@@ -15,7 +15,16 @@ class ConfigManager:
             'remote_desktop': {
                 'fps': 30,
                 'quality': 80,
-                'compression': 'jpeg'
+                'compression': 'jpeg',
+                'chroma_subsampling': '420',  # compression 为 'yuv' 时的色度抽样：'444'、'422' 或 '420'
+                'tile_cache_size': 2048,  # 块缓存容量（块数），0 表示禁用
+                'tile_cache_policy': 'lru',  # 块缓存淘汰策略：'lru' 或 'fifo'
+                'encode_workers': 1,  # 并行压缩的线程数，0 表示按 CPU 核数
+                'content_aware': True,  # 文字/界面区域无损编码，照片区域按 compression 有损编码
+                'detect_motion': True,  # 检测滚动和窗口移动，让观看端复制已有的画面
+                'adaptive': True,  # 根据带宽和往返时间自动调整画质、分辨率和帧率
+                'target_latency': 0.15,  # 自适应控制的目标往返延迟（秒）
+                'video_codec': None  # 视频流模式：'h264' 或 'vp8'（需要 PyAV），None 表示逐块编码
             },
             'file_transfer': {
                 'chunk_size': 4096,
@@ -23,6 +32,7 @@ class ConfigManager:
             },
             'security': {
                 'encryption': True,
+                'identity_key': 'rsa',  # 设备身份密钥类型：'rsa' 或 'x25519'
                 'require_pairing': True
             }
         }
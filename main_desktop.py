@@ -5,9 +5,12 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from ui.desktop.main_window import MainWindow
+from core.network.encryption import prepare_identity_key
+from core.utils.config import config_manager
 from PyQt5.QtWidgets import QApplication
 
 if __name__ == "__main__":
+    prepare_identity_key(config_manager.get('security.identity_key', 'rsa'))
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
@@ -5,6 +5,9 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from ui.mobile.main_screen import RemoteControlApp
+from core.network.encryption import prepare_identity_key
+from core.utils.config import config_manager
 
 if __name__ == "__main__":
+    prepare_identity_key(config_manager.get('security.identity_key', 'rsa'))
     RemoteControlApp().run()
@@ -0,0 +1,306 @@
+import threading
+import time
+from collections import deque
+
+# 默认的目标延迟（秒）：帧从发送到观看端确认的往返时间
+DEFAULT_TARGET_LATENCY = 0.15
+# 默认的在途字节数上限，还没有吞吐量测量值时也生效
+DEFAULT_MAX_IN_FLIGHT = 2 * 1024 * 1024
+
+class AdaptiveController:
+    """根据带宽和往返时间调整画质、缩放比例和帧率
+
+    主控端每发送一帧调用 on_frame_sent，收到观看端的 screen_ack 时调用
+    on_frame_ack，发送队列深度通过 on_queue_depth 传入。控制器由此估计：
+
+        吞吐量：最近一个窗口内被确认的字节数 / 窗口时长
+        往返时间：平滑 RTT（EWMA）及观察到的最小 RTT
+        排队延迟：平滑 RTT - 最小 RTT
+
+    每隔 adjust_interval 调整一次（乘性减、加性增）：延迟超过目标或发送
+    队列积压时依次降低画质、缩放比例、帧率；延迟明显低于目标时按相反
+    的顺序逐步恢复。can_send 还按吞吐量和固定上限 max_in_flight 限制在途
+    的字节数，链路变慢时直接少发帧，不让数据堆积在缓冲区里。确认中断时
+    沿用最后一次测得的吞吐量；最早的未确认帧超过 2 倍目标延迟时，
+    can_send / on_frame_sent 也会降低设置，不必等到下一个确认。
+
+    发送线程、接收线程和编码线程会同时调用，测量值和设置由 lock 保护。
+    所有方法都接受 now 参数（秒），便于用模拟的链路驱动。
+    """
+
+    def __init__(self, target_latency=DEFAULT_TARGET_LATENCY, quality=80, fps=30,
+                 min_quality=30, max_quality=90, min_scale=0.5, min_fps=5, max_fps=30,
+                 adjust_interval=0.5, max_queue_depth=2, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                 clock=time.monotonic):
+        """
+        Args:
+            target_latency: 目标往返延迟（秒）
+            quality: 初始压缩质量
+            fps: 初始帧率
+            min_quality: 最低压缩质量
+            max_quality: 最高压缩质量
+            min_scale: 最小缩放比例
+            min_fps: 最低帧率
+            max_fps: 最高帧率
+            adjust_interval: 两次调整之间的最短间隔（秒）
+            max_queue_depth: 发送队列中允许积压的消息数
+            max_in_flight: 在途字节数上限，在途只有一帧时不受限制
+            clock: 未传入 now 时使用的时钟
+        """
+        self.target_latency = target_latency
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.min_scale = min_scale
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        self.adjust_interval = adjust_interval
+        self.max_queue_depth = max_queue_depth
+        self.max_in_flight = max_in_flight
+        self.clock = clock
+        self.lock = threading.Lock()
+
+        # 当前设置
+        self.quality = max(min_quality, min(max_quality, quality))
+        self.scale = 1.0
+        self.fps = max(min_fps, min(max_fps, fps))
+
+        # 测量值
+        self.pending = {}  # 帧序号 -> (发送时间, 字节数)，按发送顺序
+        self.in_flight = 0
+        self.acked = deque()  # (确认时间, 字节数)
+        self.rate = None  # 最后一次测得的吞吐量
+        self.srtt = None
+        self.min_rtt = None
+        self.queue_depth = 0
+        self.last_adjust = None
+        self.last_send = None
+        # 统计信息
+        self.frames_sent = 0
+        self.frames_acked = 0
+        self.frames_lost = 0
+        self.decreases = 0
+        self.increases = 0
+
+    def _now(self, now):
+        return self.clock() if now is None else now
+
+    def on_frame_sent(self, frame_id, size, now=None):
+        """记录发送的一帧"""
+        now = self._now(now)
+        with self.lock:
+            self.pending[frame_id] = (now, size)
+            self.in_flight += size
+            self.last_send = now
+            self.frames_sent += 1
+            self._expire(now)
+            self._check_stalled(now)
+
+    def on_frame_skipped(self, now=None):
+        """画面没有变化、本次没有发送，下一帧仍按帧间隔等待"""
+        now = self._now(now)
+        with self.lock:
+            self.last_send = now
+
+    def on_frame_ack(self, frame_id, now=None):
+        """处理观看端对一帧的确认，更新 RTT 和吞吐量
+
+        确认是累积的：连接按顺序送达，观看端只确认最新解码的一帧，在它
+        之前发送、还未确认的帧也都已送达（例如被观看端跳过的帧），一并
+        从在途字节数中移除。
+        """
+        now = self._now(now)
+        with self.lock:
+            if frame_id not in self.pending:
+                # 重复的确认，或者已被更晚的确认覆盖、已超时的帧
+                return
+            # pending 按发送顺序排列，依次移除到被确认的帧为止
+            acked_size = 0
+            for pending_id in list(self.pending):
+                sent_time, size = self.pending.pop(pending_id)
+                acked_size += size
+                self.frames_acked += 1
+                if pending_id == frame_id:
+                    break
+            self.in_flight -= acked_size
+            rtt = now - sent_time
+            self.srtt = rtt if self.srtt is None else self.srtt * 0.875 + rtt * 0.125
+            self.min_rtt = rtt if self.min_rtt is None else min(self.min_rtt, rtt)
+            self.acked.append((now, acked_size))
+            self._update(now)
+
+    def on_queue_depth(self, depth):
+        """记录发送队列中积压的消息数"""
+        self.queue_depth = depth
+
+    def _expire(self, now):
+        # 长时间没有确认的帧视为丢失，不再计入在途字节数
+        timeout = max(1.0, self.target_latency * 10)
+        for frame_id, (sent_time, size) in list(self.pending.items()):
+            if now - sent_time <= timeout:
+                break
+            del self.pending[frame_id]
+            self.in_flight -= size
+            self.frames_lost += 1
+
+    def _oldest_wait(self, now):
+        # pending 按发送顺序排列，第一项即最早的未确认帧
+        if not self.pending:
+            return 0.0
+        sent_time, _ = next(iter(self.pending.values()))
+        return now - sent_time
+
+    def _check_stalled(self, now):
+        # 确认中断时不会进入 update，在发送路径上按最早的未确认帧降低设置
+        if self._oldest_wait(now) > self.target_latency * 2:
+            self._adjust(now, self._decrease)
+
+    def _throughput(self, now):
+        window = max(1.0, self.srtt or 0) * 2
+        while self.acked and now - self.acked[0][0] > window:
+            self.acked.popleft()
+        if len(self.acked) >= 2:
+            span = max(now - self.acked[0][0], self.srtt or 0, 1e-3)
+            self.rate = sum(size for _, size in self.acked) / span
+        return self.rate
+
+    def throughput(self, now=None):
+        """估计的吞吐量（字节/秒），最近没有确认时沿用最后一次的测量值，
+        从未测得时返回 None"""
+        now = self._now(now)
+        with self.lock:
+            return self._throughput(now)
+
+    def _queue_delay(self):
+        if self.srtt is None:
+            return 0.0
+        return max(0.0, self.srtt - self.min_rtt)
+
+    def queue_delay(self):
+        """估计的排队延迟（秒）"""
+        with self.lock:
+            return self._queue_delay()
+
+    def can_send(self, now=None):
+        """是否可以发送下一帧：满足帧间隔，且在途字节数不超过固定上限和
+        目标延迟内可送达的量"""
+        now = self._now(now)
+        with self.lock:
+            self._expire(now)
+            self._check_stalled(now)
+            if self.last_send is not None and now - self.last_send < 1.0 / self.fps:
+                return False
+            if self.queue_depth > self.max_queue_depth:
+                return False
+            if not self.pending:
+                return True
+            if self.in_flight >= self.max_in_flight:
+                return False
+            rate = self._throughput(now)
+            return rate is None or self.in_flight <= rate * self.target_latency
+
+    def _congested(self, now):
+        if self.queue_depth > self.max_queue_depth:
+            return True
+        if self._oldest_wait(now) > self.target_latency * 2:
+            return True
+        if self.srtt is None:
+            return False
+        return self.srtt > self.target_latency or self._queue_delay() > self.target_latency / 2
+
+    def congested(self, now=None):
+        """延迟超过目标、最早的未确认帧等待过久或发送队列积压"""
+        now = self._now(now)
+        with self.lock:
+            return self._congested(now)
+
+    def _adjust(self, now, change):
+        # 两次调整之间至少间隔 adjust_interval
+        if self.last_adjust is not None and now - self.last_adjust < self.adjust_interval:
+            return False
+        changed = change()
+        if changed:
+            self.last_adjust = now
+            if change == self._decrease:
+                self.decreases += 1
+            else:
+                self.increases += 1
+        return changed
+
+    def _update(self, now):
+        if self._congested(now):
+            return self._adjust(now, self._decrease)
+        if self.srtt is not None and self.srtt < self.target_latency / 2 and self.queue_depth == 0:
+            return self._adjust(now, self._increase)
+        return False
+
+    def update(self, now=None):
+        """按当前测量值调整设置
+
+        Returns:
+            设置有变化时返回 True
+        """
+        now = self._now(now)
+        with self.lock:
+            return self._update(now)
+
+    def _decrease(self):
+        # 先降画质，再缩小分辨率，最后降帧率
+        if self.quality > self.min_quality:
+            self.quality = max(self.min_quality, int(self.quality * 0.8))
+        elif self.scale > self.min_scale:
+            self.scale = max(self.min_scale, round(self.scale * 0.75, 2))
+        elif self.fps > self.min_fps:
+            self.fps = max(self.min_fps, int(self.fps * 0.75))
+        else:
+            return False
+        return True
+
+    def _increase(self):
+        # 按相反的顺序恢复：先帧率，再分辨率，最后画质
+        if self.fps < self.max_fps:
+            self.fps = min(self.max_fps, self.fps + 2)
+        elif self.scale < 1.0:
+            self.scale = min(1.0, round(self.scale + 0.125, 3))
+        elif self.quality < self.max_quality:
+            self.quality = min(self.max_quality, self.quality + 5)
+        else:
+            return False
+        return True
+
+    def apply(self, image_processing):
+        """把当前画质设置到 ImageProcessing"""
+        with self.lock:
+            quality = self.quality
+        image_processing.set_quality(quality)
+
+    def _settings(self):
+        return {
+            'quality': self.quality,
+            'scale': self.scale,
+            'fps': self.fps
+        }
+
+    def get_settings(self):
+        """获取当前设置"""
+        with self.lock:
+            return self._settings()
+
+    def get_stats(self, now=None):
+        """获取统计信息"""
+        now = self._now(now)
+        with self.lock:
+            stats = self._settings()
+            stats.update({
+                'throughput': self._throughput(now),
+                'srtt': self.srtt,
+                'min_rtt': self.min_rtt,
+                'queue_delay': self._queue_delay(),
+                'in_flight': self.in_flight,
+                'queue_depth': self.queue_depth,
+                'frames_sent': self.frames_sent,
+                'frames_acked': self.frames_acked,
+                'frames_lost': self.frames_lost,
+                'decreases': self.decreases,
+                'increases': self.increases
+            })
+            return stats
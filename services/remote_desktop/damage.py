@@ -0,0 +1,169 @@
+import cv2
+import numpy as np
+
+# 比较帧时使用的块大小（像素）
+DEFAULT_TILE_SIZE = 64
+
+class DamageTracker:
+    """脏矩形检测
+
+    把当前帧与上一帧按固定大小的块比较，只返回内容变化的矩形区域，
+    光标闪烁之类的小变化不必重新压缩整帧。比较完全向量化：每行像素按
+    8/4/2 字节的整数视图逐元素比较，再用 reduceat 按块归并，得到块级
+    的变化掩码；相邻的变化块合并成矩形。
+
+    tracker 保存上一帧的副本，只复制变化的区域。
+    """
+
+    def __init__(self, tile_size=DEFAULT_TILE_SIZE):
+        """
+        Args:
+            tile_size: 块大小（像素）
+        """
+        self.tile_size = tile_size
+        self.previous = None
+        self.mask = None  # 最近一帧的块级变化掩码
+        self.moves = []  # 最近一帧检测到的复制操作
+        self._diff = None  # 复用的比较结果缓冲区
+        # 统计信息
+        self.frames = 0
+        self.tiles = 0
+        self.dirty_tiles = 0
+
+    def reset(self):
+        """丢弃上一帧，下一帧按整帧返回（例如新的观看端加入）"""
+        self.previous = None
+
+    def update(self, frame, motion=None):
+        """比较当前帧与上一帧并记录当前帧
+
+        Args:
+            frame: numpy数组，形状为 (高, 宽) 或 (高, 宽, 通道)
+            motion: MotionDetector，传入时先在变化的矩形中检测滚动/移动，
+                检测到的复制操作记录在 self.moves 中，返回的是复制之后
+                仍然变化的矩形
+
+        Returns:
+            变化的矩形列表 [(x, y, 宽, 高)]，首帧或分辨率变化时为整帧，
+            没有变化时为空列表
+        """
+        height, width = frame.shape[:2]
+        self.frames += 1
+        self.moves = []
+        if self.previous is None or self.previous.shape != frame.shape \
+                or self.previous.dtype != frame.dtype:
+            self.previous = np.array(frame, copy=True, order='C')
+            self._diff = None
+            self.mask = np.ones(self.grid_size(width, height), dtype=bool)
+            self.tiles += self.mask.size
+            self.dirty_tiles += self.mask.size
+            return [(0, 0, width, height)]
+
+        mask = self.mask = self.tile_mask(frame)
+        self.tiles += mask.size
+        rects = self.mask_to_rects(mask, width, height)
+        if motion is not None and rects:
+            # 滚动区域中各行的文字长短不一，变化的块拼成的矩形很零碎，
+            # 按连通区域的外接矩形检测
+            self.moves = motion.detect(self.previous, frame, self.bounding_boxes(mask, width, height))
+            if self.moves:
+                # 在上一帧上执行与观看端相同的复制，再比较一次
+                for src_x, src_y, dst_x, dst_y, w, h in self.moves:
+                    self.previous[dst_y:dst_y + h, dst_x:dst_x + w] = \
+                        self.previous[src_y:src_y + h, src_x:src_x + w]
+                mask = self.mask = self.tile_mask(frame)
+                rects = self.mask_to_rects(mask, width, height)
+        self.dirty_tiles += int(np.count_nonzero(mask))
+        for x, y, w, h in rects:
+            self.previous[y:y + h, x:x + w] = frame[y:y + h, x:x + w]
+        return rects
+
+    def grid_size(self, width, height):
+        """块网格的 (行数, 列数)"""
+        tile = self.tile_size
+        return (height + tile - 1) // tile, (width + tile - 1) // tile
+
+    def tile_mask(self, frame):
+        """计算块级变化掩码
+
+        Returns:
+            bool 数组，形状为 (块行数, 块列数)
+        """
+        height, width = frame.shape[:2]
+        current = np.ascontiguousarray(frame).reshape(height, -1).view(np.uint8)
+        previous = self.previous.reshape(height, -1).view(np.uint8)
+        row_bytes = current.shape[1]
+        pixel_bytes = row_bytes // width
+        tile_bytes = self.tile_size * pixel_bytes
+
+        # 用尽量宽的整数比较，元素数减少到 1/8
+        for word in (8, 4, 2, 1):
+            if row_bytes % word == 0 and tile_bytes % word == 0:
+                break
+        dtype = np.dtype(f'u{word}')
+        current = current.view(dtype)
+        previous = previous.view(dtype)
+
+        if self._diff is None or self._diff.shape != current.shape:
+            self._diff = np.empty(current.shape, dtype=bool)
+        diff = np.not_equal(current, previous, out=self._diff)
+
+        row_starts = np.arange(0, height, self.tile_size)
+        col_starts = np.arange(0, width, self.tile_size) * pixel_bytes // word
+        bands = np.logical_or.reduceat(diff, row_starts, axis=0)
+        return np.logical_or.reduceat(bands, col_starts, axis=1)
+
+    def mask_to_rects(self, mask, width, height):
+        """把块级掩码合并成矩形
+
+        每行中连续的变化块合并成一段，与上一行横向范围相同的段继续向下延伸。
+
+        Returns:
+            矩形列表 [(x, y, 宽, 高)]，已裁剪到帧的范围内
+        """
+        tile = self.tile_size
+        rects = []
+        open_rects = {}  # (起始列, 结束列) -> [x, y, 宽, 高]
+        padded = np.zeros(mask.shape[1] + 2, dtype=np.int8)
+        for row in range(mask.shape[0]):
+            padded[1:-1] = mask[row]
+            edges = np.flatnonzero(np.diff(padded))
+            runs = list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+            next_rects = {}
+            for start, end in runs:
+                rect = open_rects.pop((start, end), None)
+                if rect is None:
+                    rect = [start * tile, row * tile, (end - start) * tile, 0]
+                rect[3] += tile
+                next_rects[(start, end)] = rect
+            rects.extend(open_rects.values())
+            open_rects = next_rects
+        rects.extend(open_rects.values())
+
+        return [
+            (x, y, min(w, width - x), min(h, height - y))
+            for x, y, w, h in sorted(rects, key=lambda rect: (rect[1], rect[0]))
+        ]
+
+    def bounding_boxes(self, mask, width, height):
+        """变化块的连通区域（8 邻接）的外接矩形
+
+        Returns:
+            矩形列表 [(x, y, 宽, 高)]，已裁剪到帧的范围内
+        """
+        tile = self.tile_size
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask.astype(np.uint8), connectivity=8)
+        boxes = []
+        for col, row, cols, rows, _ in stats[1:count].tolist():
+            x, y = col * tile, row * tile
+            boxes.append((x, y, min(cols * tile, width - x), min(rows * tile, height - y)))
+        return boxes
+
+    def get_stats(self):
+        """获取统计信息：处理的帧数和变化块的比例"""
+        return {
+            'frames': self.frames,
+            'tiles': self.tiles,
+            'dirty_tiles': self.dirty_tiles,
+            'dirty_ratio': self.dirty_tiles / self.tiles if self.tiles else 0.0
+        }
@@ -0,0 +1,271 @@
+import time
+import numpy as np
+from .frame_protocol import (
+    CACHED_TILE, CODEC_NAMES, COPY_RECT, FLAG_KEYFRAME, OP_CACHED_TILE, OP_COPY_RECT, OP_PIXELS,
+    OP_SOURCE_RECT, OP_TILE_CACHE, SOURCE_RECT, TILE_CACHE_PARAMS, FrameFormatError, parse_frame
+)
+from .image_header import read_image_header
+from .image_processing import ImageProcessing
+from .pixel_format import PIXEL_BGR, PIXEL_RGB
+from .tile_cache import EVICTION_IDS, TileCache
+from .video_codec import VIDEO_CODECS, VideoDecoder
+
+# 可以只读文件头得到尺寸的编码
+HEADER_CODECS = ('jpeg', 'png', 'webp')
+# 按分辨率保留的帧缓冲区数量
+MAX_FRAMEBUFFERS = 2
+# 两次请求关键帧之间的最短间隔（秒），请求发出后在途的增量帧不再重复请求
+KEYFRAME_REQUEST_INTERVAL = 1.0
+
+class FrameDecoder:
+    """屏幕帧解码器（观看端）
+
+    维护一块常驻的帧缓冲区（RGB 或 BGR），把 screen_frame 消息中的区域解码后
+    贴到对应位置。增量帧必须紧接上一帧（帧序号连续），缺少关键帧、帧序号
+    不连续（中途有帧丢失）或区域解码失败时画面已不完整，need_keyframe 置位，
+    之后的增量帧都被丢弃；调用方在 should_request_keyframe 返回 True 时向
+    主控端发送 screen_keyframe_request。
+
+    块缓存的参数由主控端的 OP_TILE_CACHE 区域下发，按与主控端相同的规则
+    插入和淘汰，OP_CACHED_TILE 区域直接从缓存中取出块像素。
+
+    视频流模式（h264/vp8）的区域交给常驻的 VideoDecoder 解码，需要 PyAV。
+
+    稳定帧率下解码端不分配整帧大小的数组：区域直接解码到帧缓冲区中的对应
+    位置（ImageProcessing.decompress_into、VideoDecoder.decode_into），帧
+    缓冲区按分辨率保留，关键帧切换分辨率后再切回时复用；块缓存淘汰的块
+    数组放回空闲列表，插入新块时复用。zlib 解压和 cv2.imdecode 不能写入
+    已有的缓冲区，每个区域仍分配一次解压结果（区域大小）。
+
+    主控端按显示区域裁剪/缩放时，OP_SOURCE_RECT 给出画面对应的屏幕区域，
+    to_screen 据此把画面上的坐标换算为主控端屏幕坐标（输入事件）。
+    """
+
+    def __init__(self, image_processing=None, pixel_format=PIXEL_RGB):
+        """
+        Args:
+            image_processing: 解码区域使用的 ImageProcessing，None 表示默认配置
+            pixel_format: 帧缓冲区的像素格式，'rgb' 或 'bgr'；显示端原生支持
+                BGR（例如 QImage.Format_BGR888、Kivy 的 'bgr' 纹理）时使用
+                'bgr'，JPEG/PNG 解码后不再转换
+        """
+        if pixel_format not in (PIXEL_RGB, PIXEL_BGR):
+            raise ValueError(f"Unsupported framebuffer pixel format: {pixel_format}")
+        self.image_processing = image_processing or ImageProcessing()
+        self.pixel_format = pixel_format
+        self.framebuffer = None
+        self.framebuffers = {}  # (高, 宽) -> 帧缓冲区，按分辨率复用
+        self.frame_id = None
+        self.need_keyframe = True
+        self.last_keyframe_request = None
+        self.cache = TileCache(0)
+        self.free_tiles = []  # 淘汰后可复用的块数组
+        self.tile_size = 0
+        self.video = None
+        self.source_rect = None  # 画面对应的主控端屏幕区域，None 表示整个屏幕
+
+    def reset(self):
+        """丢弃当前画面，等待下一个关键帧"""
+        self.framebuffer = None
+        self.frame_id = None
+        self.need_keyframe = True
+
+    def decode(self, data):
+        """解码一帧并更新帧缓冲区
+
+        Args:
+            data: screen_frame 消息负载
+
+        Returns:
+            更新的矩形列表 [(x, y, 宽, 高)]；画面无法更新（缺少关键帧或
+            区域解码失败）时返回 None
+        """
+        try:
+            flags, width, height, frame_id, regions = parse_frame(data)
+        except FrameFormatError as e:
+            print(f"Frame decode error: {e}")
+            self.need_keyframe = True
+            return None
+
+        if flags & FLAG_KEYFRAME:
+            if self.framebuffer is None or self.framebuffer.shape[:2] != (height, width):
+                self.framebuffer = self._get_framebuffer(height, width)
+            self.need_keyframe = False
+            self.last_keyframe_request = None
+        elif self.need_keyframe or self.framebuffer.shape[:2] != (height, width) \
+                or frame_id != (self.frame_id + 1) & 0xFFFFFFFF:
+            # 增量帧只能叠加在紧接的上一帧上
+            self.need_keyframe = True
+            return None
+
+        rects = []
+        for region in regions:
+            if not self._apply_region(region):
+                self.need_keyframe = True
+                return None
+            if region.width and region.height:
+                rects.append(region.rect)
+        self.frame_id = frame_id
+        return rects
+
+    def should_request_keyframe(self, now=None):
+        """是否应向主控端发送 screen_keyframe_request
+
+        画面需要关键帧且距上次请求超过 KEYFRAME_REQUEST_INTERVAL 时返回
+        True 并记录请求时间，请求之后仍在途的增量帧不会触发重复请求。
+
+        Args:
+            now: 当前时间（秒），None 表示 time.monotonic()
+        """
+        if not self.need_keyframe:
+            return False
+        now = time.monotonic() if now is None else now
+        if self.last_keyframe_request is not None \
+                and now - self.last_keyframe_request < KEYFRAME_REQUEST_INTERVAL:
+            return False
+        self.last_keyframe_request = now
+        return True
+
+    def _get_framebuffer(self, height, width):
+        framebuffer = self.framebuffers.get((height, width))
+        if framebuffer is None:
+            # 只保留最近使用的几种分辨率（例如观看端缩放切换）
+            while len(self.framebuffers) >= MAX_FRAMEBUFFERS:
+                del self.framebuffers[next(iter(self.framebuffers))]
+            framebuffer = np.zeros((height, width, 3), dtype=np.uint8)
+        else:
+            del self.framebuffers[(height, width)]
+        self.framebuffers[(height, width)] = framebuffer
+        return framebuffer
+
+    def _apply_region(self, region):
+        if region.op == OP_PIXELS:
+            return self._apply_pixels(region)
+        if region.op == OP_CACHED_TILE:
+            return self._apply_cached_tile(region)
+        if region.op == OP_COPY_RECT:
+            return self._apply_copy(region)
+        if region.op == OP_TILE_CACHE:
+            return self._reset_cache(region)
+        if region.op == OP_SOURCE_RECT:
+            return self._set_source_rect(region)
+        print(f"Unknown frame region op: {region.op}")
+        return False
+
+    def _apply_pixels(self, region):
+        codec = CODEC_NAMES.get(region.codec)
+        if codec in HEADER_CODECS:
+            # 先按文件头检查尺寸，不匹配的区域不必解码
+            header = read_image_header(region.data)
+            if header is not None and header[1:3] != (region.width, region.height):
+                print(f"Frame region size mismatch: {region.rect}, image {header[1:3]}")
+                return False
+        x, y, w, h = region.rect
+        target = self.framebuffer[y:y + h, x:x + w]
+        if codec in VIDEO_CODECS:
+            if target.shape[:2] != (h, w) or not self._decode_video(codec, region.data, target):
+                print(f"Frame region decode error: {region.rect}")
+                return False
+        elif target.shape[:2] != (h, w) or not self.image_processing.decompress_into(
+                region.data, target, codec, self.pixel_format):
+            print(f"Frame region decode error: {region.rect}")
+            return False
+
+        # 与主控端相同的插入规则：区域内完整覆盖的块按行优先顺序插入
+        tile = self.tile_size
+        if self.cache.capacity and tile:
+            for ty in range(y, y + h - tile + 1, tile):
+                for tx in range(x, x + w - tile + 1, tile):
+                    self.cache.insert(value=self._copy_tile(self.framebuffer[ty:ty + tile, tx:tx + tile]))
+        return True
+
+    def _copy_tile(self, view):
+        if self.free_tiles:
+            tile = self.free_tiles.pop()
+            np.copyto(tile, view)
+            return tile
+        return view.copy()
+
+    def _decode_video(self, codec, data, target):
+        try:
+            if self.video is None or self.video.codec != codec:
+                self.video = VideoDecoder(codec)
+            return self.video.decode_into(data, target, self.pixel_format)
+        except Exception as e:
+            print(f"Video frame decode error: {e}")
+            self.video = None
+            return False
+
+    def _set_source_rect(self, region):
+        try:
+            self.source_rect = SOURCE_RECT.unpack(region.data)
+        except Exception as e:
+            print(f"Source rect error: {e}")
+            return False
+        return True
+
+    def to_screen(self, x, y):
+        """把画面上的坐标换算为主控端屏幕坐标
+
+        Args:
+            x: 画面上的 x
+            y: 画面上的 y
+
+        Returns:
+            (屏幕 x, 屏幕 y)
+        """
+        if self.source_rect is None or self.framebuffer is None:
+            return x, y
+        left, top, width, height = self.source_rect
+        frame_height, frame_width = self.framebuffer.shape[:2]
+        return (left + int(x * width / frame_width), top + int(y * height / frame_height))
+
+    def _apply_cached_tile(self, region):
+        try:
+            entry_id, = CACHED_TILE.unpack(region.data)
+        except Exception as e:
+            print(f"Cached tile error: {e}")
+            return False
+        tile = self.cache.get(entry_id)
+        if tile is None or tile.shape[:2] != (region.height, region.width):
+            print(f"Cached tile missing: {entry_id}")
+            return False
+        self.framebuffer[region.y:region.y + region.height,
+                         region.x:region.x + region.width] = tile
+        return True
+
+    def _apply_copy(self, region):
+        try:
+            src_x, src_y = COPY_RECT.unpack(region.data)
+        except Exception as e:
+            print(f"Copy rect error: {e}")
+            return False
+        x, y, w, h = region.rect
+        height, width = self.framebuffer.shape[:2]
+        if src_x + w > width or src_y + h > height:
+            print(f"Copy rect source out of bounds: {(src_x, src_y, w, h)}")
+            return False
+        # 源与目标重叠时 numpy 会先复制源数据
+        self.framebuffer[y:y + h, x:x + w] = self.framebuffer[src_y:src_y + h, src_x:src_x + w]
+        return True
+
+    def _reset_cache(self, region):
+        try:
+            capacity, policy_id, tile_size = TILE_CACHE_PARAMS.unpack(region.data)
+            policy = next(name for name, value in EVICTION_IDS.items() if value == policy_id)
+        except Exception as e:
+            print(f"Tile cache parameters error: {e}")
+            return False
+        self.cache = TileCache(capacity, policy, on_evict=self._recycle_tile)
+        if tile_size != self.tile_size:
+            self.free_tiles = []
+        self.tile_size = tile_size
+        return True
+
+    def _recycle_tile(self, tile):
+        if tile.shape[:2] == (self.tile_size, self.tile_size):
+            self.free_tiles.append(tile)
+
+    def get_stats(self):
+        """获取块缓存统计信息"""
+        return self.cache.get_stats()
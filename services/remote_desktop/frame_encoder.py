@@ -0,0 +1,285 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .damage import DamageTracker, DEFAULT_TILE_SIZE
+from .frame_protocol import (
+    CACHED_TILE, CODEC_IDS, COPY_RECT, FLAG_KEYFRAME, OP_CACHED_TILE, OP_COPY_RECT, OP_PIXELS,
+    OP_SOURCE_RECT, OP_TILE_CACHE, SOURCE_RECT, TILE_CACHE_PARAMS, Region, build_frame
+)
+from .image_processing import LOSSLESS_FORMATS, ImageProcessing
+from .motion import MotionDetector
+from .pixel_format import PIXEL_RGB, PixelFrame
+from .region_classifier import RegionClassifier
+from .tile_cache import DEFAULT_TILE_CACHE_SIZE, EVICTION_IDS, EVICTION_LRU, TileCache, tile_hash
+
+# 每个并行压缩的横条至少包含的像素数，变化的总面积不足两个横条时串行压缩
+MIN_STRIP_AREA = 256 * 256
+
+class FrameEncoder:
+    """屏幕帧编码器（主控端）
+
+    位于 ScreenCapture.capture 与压缩之间：DamageTracker 找出变化的矩形，
+    只压缩这些区域，打包成 screen_frame 消息负载。画面没有变化时不产生
+    消息。
+
+    启用块缓存时，变化的完整块先按内容哈希查找缓存，命中的块（例如切换
+    回之前的窗口）只发送条目编号。
+
+    workers 大于 1 时，较大的矩形按块边界切成横条，在线程池中并行压缩
+    （cv2.imencode 压缩期间释放 GIL），每个横条是一个独立的区域，观看端
+    按区域贴回即可还原。横条数不超过 workers，且每条至少 MIN_STRIP_AREA
+    像素；光标、输入之类的小变化仍在当前线程中串行压缩。
+
+    content_aware 为 True 时，RegionClassifier 按块区分照片类和文字/界面类
+    内容：照片类用 image_processing 设置的有损格式（png 时改用 jpeg），
+    文字/界面类用无损的调色板编码，颜色过多时用 zlib。
+
+    detect_motion 为 True 时，MotionDetector 在较大的脏矩形中检测滚动和
+    移动，发送 OP_COPY_RECT 让观看端直接复制已有的画面，只编码新露出的
+    部分。
+    """
+
+    def __init__(self, image_processing=None, tile_size=DEFAULT_TILE_SIZE,
+                 cache_size=DEFAULT_TILE_CACHE_SIZE, cache_policy=EVICTION_LRU, workers=1,
+                 content_aware=True, detect_motion=True):
+        """
+        Args:
+            image_processing: 压缩区域使用的 ImageProcessing，None 表示默认配置
+            tile_size: 脏矩形检测和块缓存的块大小（像素）
+            cache_size: 块缓存容量（块数），0 表示禁用
+            cache_policy: 块缓存的淘汰策略，'lru' 或 'fifo'
+            workers: 并行压缩的线程数，0 表示按 CPU 核数
+            content_aware: 是否按内容为每个区域选择编码
+            detect_motion: 是否检测滚动和移动
+        """
+        self.image_processing = image_processing or ImageProcessing()
+        self.damage = DamageTracker(tile_size)
+        self.cache = TileCache(cache_size, cache_policy)
+        self._cache_announced = False
+        self.classifier = RegionClassifier(tile_size) if content_aware else None
+        self.motion = MotionDetector() if detect_motion else None
+        self.pixel_format = PIXEL_RGB
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix='frame-encoder') \
+            if self.workers > 1 else None
+        self.frame_id = 0
+        # 帧对应的主控端屏幕区域（按观看端的显示区域裁剪/缩放时），变化时随下一帧发送
+        self.source_rect = None
+        self._source_rect_sent = None
+        # 统计信息
+        self.frames = 0
+        self.bytes = 0
+        self.encode_time = 0.0
+
+    def reset(self):
+        """下一帧编码为关键帧并重置两端的块缓存（新的观看端加入或观看端请求刷新）"""
+        self.damage.reset()
+        self.cache.clear()
+        self._cache_announced = False
+        self._source_rect_sent = None
+
+    def set_source_rect(self, rect):
+        """设置之后的帧对应的主控端屏幕区域 (x, y, 宽, 高)，观看端据此换算输入坐标
+
+        Args:
+            rect: 屏幕上的区域，None 表示整个屏幕且未缩放
+        """
+        self.source_rect = tuple(rect) if rect is not None else None
+
+    def encode(self, frame, pixel_format=PIXEL_RGB):
+        """编码一帧
+
+        抓屏得到的 BGRA/BGR 帧可以直接传入：脏矩形检测、块缓存和滚动检测
+        与通道顺序无关，JPEG 直接从 BGR/BGRA 编码，只有无损编码需要时才
+        在区域内转换。
+
+        Args:
+            frame: numpy数组或 PixelFrame
+            pixel_format: frame 为 numpy 数组时的像素格式
+
+        Returns:
+            screen_frame 消息负载（bytes），画面没有变化时返回 None
+        """
+        start = time.perf_counter()
+        if isinstance(frame, PixelFrame):
+            frame, pixel_format = frame.data, frame.pixel_format
+        if pixel_format != self.pixel_format:
+            # 通道顺序变化时上一帧不能直接比较
+            self.reset()
+            self.pixel_format = pixel_format
+        height, width = frame.shape[:2]
+        rects = self.damage.update(frame, self.motion)
+        moves = self.damage.moves
+        # 显示区域平移到内容相同的位置时画面不变，仍要告知观看端新的区域
+        announce = self.source_rect is not None and self.source_rect != self._source_rect_sent
+        if not rects and not moves and not announce:
+            return None
+
+        flags = FLAG_KEYFRAME if not moves and rects == [(0, 0, width, height)] else 0
+        if flags & FLAG_KEYFRAME:
+            # 关键帧不能引用观看端之前的状态：中途加入的观看端没有块缓存，
+            # 清空缓存并重新下发参数，两端从这一帧开始重建
+            self.cache.clear()
+            self._cache_announced = False
+        regions = []
+        new_tiles = {}
+        mask = self.damage.mask.copy()
+        if self.cache.capacity:
+            if not self._cache_announced:
+                params = TILE_CACHE_PARAMS.pack(self.cache.capacity, EVICTION_IDS[self.cache.policy],
+                                                self.damage.tile_size)
+                regions.append(Region(OP_TILE_CACHE, 0, 0, 0, 0, 0, params))
+                self._cache_announced = True
+        if announce:
+            regions.append(Region(OP_SOURCE_RECT, 0, 0, 0, 0, 0, SOURCE_RECT.pack(*self.source_rect)))
+            self._source_rect_sent = self.source_rect
+        # 复制在其他区域之前执行，观看端按区域顺序处理
+        for src_x, src_y, dst_x, dst_y, w, h in moves:
+            regions.append(Region(OP_COPY_RECT, 0, dst_x, dst_y, w, h, COPY_RECT.pack(src_x, src_y)))
+        if self.cache.capacity:
+            self._lookup_tiles(frame, mask, regions, new_tiles)
+
+        jobs = self._plan_regions(frame, mask)
+        strips = self._strip_count(jobs)
+        if strips > 1:
+            jobs = self._split_strips(jobs, strips)
+            # 区域多于横条数时按组提交，同时运行的线程不超过 strips 个
+            groups = [jobs[index::strips] for index in range(strips)]
+            results = list(self.executor.map(
+                lambda group: [self._encode_pixels(frame, *job) for job in group], groups))
+            encoded = [results[index % strips][index // strips] for index in range(len(jobs))]
+        else:
+            encoded = [self._encode_pixels(frame, *job) for job in jobs]
+
+        for ((x, y, w, h), _), region in zip(jobs, encoded):
+            if region is None:
+                # 区域压缩失败，观看端的画面已不完整，下一帧重新发送整帧
+                self.reset()
+                return None
+            regions.append(region)
+            for key in self._covered_tiles(new_tiles, x, y, w, h):
+                self.cache.insert(key)
+
+        payload = build_frame(width, height, self.frame_id, regions, flags)
+        self.frame_id = (self.frame_id + 1) & 0xFFFFFFFF
+        self.frames += 1
+        self.bytes += len(payload)
+        self.encode_time += time.perf_counter() - start
+        return payload
+
+    def _lookup_tiles(self, frame, mask, regions, new_tiles):
+        """在缓存中查找变化的完整块，命中的块加入 OP_CACHED_TILE 区域并从 mask 中去掉
+
+        Args:
+            mask: 块级变化掩码，原地修改
+            new_tiles: 输出，未命中的块 (行, 列) -> 内容哈希
+        """
+        tile = self.damage.tile_size
+        height, width = frame.shape[:2]
+        rows, cols = np.nonzero(mask[:height // tile, :width // tile])
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            x, y = col * tile, row * tile
+            key = tile_hash(frame[y:y + tile, x:x + tile])
+            entry_id = self.cache.lookup(key)
+            if entry_id is None:
+                new_tiles[(row, col)] = key
+            else:
+                regions.append(Region(OP_CACHED_TILE, 0, x, y, tile, tile, CACHED_TILE.pack(entry_id)))
+                mask[row, col] = False
+
+    def _plan_regions(self, frame, mask):
+        """把需要发送像素的块合并成矩形并选择编码
+
+        Returns:
+            [((x, y, 宽, 高), 压缩格式)]，压缩格式为 None 表示无损自动选择
+        """
+        height, width = frame.shape[:2]
+        rects = self.damage.mask_to_rects(mask, width, height)
+        if self.classifier is None:
+            return [(rect, self.image_processing.compression) for rect in rects]
+
+        tile = self.damage.tile_size
+        photo = np.zeros_like(mask)
+        for x, y, w, h in rects:
+            grid = self.classifier.classify(frame[y:y + h, x:x + w], self.pixel_format)
+            photo[y // tile:y // tile + grid.shape[0], x // tile:x // tile + grid.shape[1]] = grid
+        lossy = self.image_processing.compression
+        if lossy in LOSSLESS_FORMATS:
+            lossy = 'jpeg'
+        return [(rect, lossy) for rect in self.damage.mask_to_rects(mask & photo, width, height)] + \
+            [(rect, None) for rect in self.damage.mask_to_rects(mask & ~photo, width, height)]
+
+    def _strip_count(self, jobs):
+        """并行压缩的横条数，不超过线程数，面积不足时返回 1 表示串行"""
+        if self.executor is None:
+            return 1
+        total = sum(w * h for (_, _, w, h), _ in jobs)
+        return max(1, min(self.workers, total // MIN_STRIP_AREA))
+
+    def _split_strips(self, jobs, strips):
+        """把较大的矩形按块边界切成横条，使各线程的工作量大致相同
+
+        切分点都在块的整数倍上，完整的块仍然完整，块缓存的插入规则不变。
+        """
+        tile = self.damage.tile_size
+        target = sum(w * h for (_, _, w, h), _ in jobs) // strips
+        result = []
+        for (x, y, w, h), compression in jobs:
+            rows = (h + tile - 1) // tile
+            count = min(rows, (w * h) // target)
+            if count <= 1:
+                result.append(((x, y, w, h), compression))
+                continue
+            step = (rows + count - 1) // count * tile
+            for top in range(y, y + h, step):
+                result.append(((x, top, w, min(step, y + h - top)), compression))
+        return result
+
+    def _covered_tiles(self, new_tiles, x, y, w, h):
+        """矩形内完整覆盖的块，按行优先顺序（与观看端的插入顺序一致）"""
+        tile = self.damage.tile_size
+        for row in range(y // tile, (y + h) // tile):
+            for col in range(x // tile, (x + w) // tile):
+                key = new_tiles.get((row, col))
+                if key is not None:
+                    yield key
+
+    def _encode_pixels(self, frame, rect, compression):
+        x, y, w, h = rect
+        img = frame[y:y + h, x:x + w]
+        if compression is None:
+            # 无损：优先调色板，颜色过多时退回 zlib
+            compression = 'palette'
+            data = self.image_processing.compress_palette(img, self.pixel_format)
+            if data is None:
+                compression = 'zlib'
+                data = self.image_processing.compress_image(img, compression, self.pixel_format)
+        else:
+            data = self.image_processing.compress_image(img, compression, self.pixel_format)
+        if data is None:
+            return None
+        return Region(OP_PIXELS, CODEC_IDS.get(compression, CODEC_IDS['jpeg']), x, y, w, h, data)
+
+    def close(self):
+        """关闭压缩线程池"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+            self.workers = 1
+
+    def get_stats(self):
+        """获取编码统计信息"""
+        stats = self.damage.get_stats()
+        stats['tile_cache'] = self.cache.get_stats()
+        if self.classifier is not None:
+            stats.update(self.classifier.get_stats())
+        if self.motion is not None:
+            stats.update(self.motion.get_stats())
+        stats.update({
+            'encoded_frames': self.frames,
+            'bytes': self.bytes,
+            'avg_bytes': self.bytes / self.frames if self.frames else 0,
+            'avg_encode_ms': self.encode_time / self.frames * 1000 if self.frames else 0.0
+        })
+        return stats
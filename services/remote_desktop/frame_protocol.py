@@ -0,0 +1,166 @@
+import struct
+
+# screen_frame 消息负载：帧头 + 若干区域记录，每个区域记录为区域头 + 数据
+# 帧头：格式版本(1) + 标志位(1) + 宽(2) + 高(2) + 帧序号(4) + 区域数(2)
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct('!BBHHIH')
+# 区域头：操作(1) + 编码(1) + x(2) + y(2) + 宽(2) + 高(2) + 数据长度(4)
+REGION_HEADER = struct.Struct('!BBHHHHI')
+
+# screen_ack 消息负载：观看端已显示的帧序号(4)
+FRAME_ACK = struct.Struct('!I')
+
+# screen_keyframe_request 消息没有负载：观看端缺少关键帧或收到的帧不连续，
+# 请求主控端重置编码器（FrameEncoder.reset），下一帧发送整帧
+
+# screen_viewport 消息负载：观看端显示区域的宽(2) + 高(2) + 缩放倍数(4) +
+# 显示中心在主控端屏幕上的相对位置 x(4)、y(4)（0-1）
+VIEWPORT = struct.Struct('!HHfff')
+
+# 帧标志位
+FLAG_KEYFRAME = 0x01  # 区域覆盖整帧，观看端可以从这一帧开始解码
+
+# 区域操作
+OP_PIXELS = 1       # 数据为压缩后的区域像素
+OP_CACHED_TILE = 2  # 复用块缓存中的条目，数据为条目编号
+OP_TILE_CACHE = 3   # 重置观看端的块缓存，数据为缓存参数，矩形为空
+OP_COPY_RECT = 4    # 把画面中的一块复制到区域所在位置（滚动/移动），数据为源坐标
+OP_SOURCE_RECT = 5  # 画面对应的主控端屏幕区域（裁剪/缩放后），数据为该区域，矩形为空
+
+# OP_CACHED_TILE 数据：条目编号(4)
+CACHED_TILE = struct.Struct('!I')
+# OP_COPY_RECT 数据：源 x(2) + 源 y(2)
+COPY_RECT = struct.Struct('!HH')
+# OP_TILE_CACHE 数据：容量(4) + 淘汰策略(1) + 块大小(2)
+TILE_CACHE_PARAMS = struct.Struct('!IBH')
+# OP_SOURCE_RECT 数据：主控端屏幕上的 x(2) + y(2) + 宽(2) + 高(2)
+SOURCE_RECT = struct.Struct('!HHHH')
+
+# 区域编码
+CODEC_JPEG = 1
+CODEC_PNG = 2
+CODEC_WEBP = 3
+CODEC_ZLIB = 4     # zlib 压缩的原始 RGB 像素
+CODEC_PALETTE = 5  # 调色板 + zlib 压缩的 8 位索引
+CODEC_H264 = 6     # H.264 视频流中的一帧（Annex B），依赖之前的帧
+CODEC_VP8 = 7      # VP8 视频流中的一帧，依赖之前的帧
+CODEC_YUV = 8      # 色度抽样方式 + zlib 压缩的 Y、U、V 平面
+CODEC_IDS = {
+    'jpeg': CODEC_JPEG,
+    'png': CODEC_PNG,
+    'webp': CODEC_WEBP,
+    'zlib': CODEC_ZLIB,
+    'palette': CODEC_PALETTE,
+    'h264': CODEC_H264,
+    'vp8': CODEC_VP8,
+    'yuv': CODEC_YUV,
+}
+CODEC_NAMES = {codec: name for name, codec in CODEC_IDS.items()}
+
+class FrameFormatError(Exception):
+    """屏幕帧格式错误"""
+    pass
+
+class Region:
+    """帧中的一个区域记录"""
+
+    def __init__(self, op, codec, x, y, width, height, data=b''):
+        self.op = op
+        self.codec = codec
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.data = data
+
+    @property
+    def rect(self):
+        return self.x, self.y, self.width, self.height
+
+def build_frame(width, height, frame_id, regions, flags=0):
+    """构建 screen_frame 消息负载
+
+    Args:
+        width: 帧宽度
+        height: 帧高度
+        frame_id: 帧序号
+        regions: Region 列表
+        flags: 帧标志位
+
+    Returns:
+        消息负载（bytes）
+    """
+    if len(regions) > 0xFFFF:
+        raise FrameFormatError(f"Too many regions: {len(regions)}")
+    parts = [FRAME_HEADER.pack(FRAME_VERSION, flags, width, height,
+                               frame_id & 0xFFFFFFFF, len(regions))]
+    for region in regions:
+        parts.append(REGION_HEADER.pack(region.op, region.codec, region.x, region.y,
+                                        region.width, region.height, len(region.data)))
+        parts.append(region.data)
+    return b''.join(parts)
+
+def parse_frame(data):
+    """解析 screen_frame 消息负载，区域数据是 data 的 memoryview 切片，不复制
+
+    Returns:
+        (标志位, 宽, 高, 帧序号, Region 列表)
+
+    Raises:
+        FrameFormatError: 负载格式错误
+    """
+    view = memoryview(data)
+    if len(view) < FRAME_HEADER.size:
+        raise FrameFormatError("Frame too short")
+    version, flags, width, height, frame_id, count = FRAME_HEADER.unpack_from(view)
+    if version != FRAME_VERSION:
+        raise FrameFormatError(f"Unsupported frame version: {version}")
+
+    regions = []
+    offset = FRAME_HEADER.size
+    for _ in range(count):
+        if offset + REGION_HEADER.size > len(view):
+            raise FrameFormatError("Truncated region header")
+        op, codec, x, y, w, h, length = REGION_HEADER.unpack_from(view, offset)
+        offset += REGION_HEADER.size
+        if offset + length > len(view):
+            raise FrameFormatError("Truncated region data")
+        if x + w > width or y + h > height:
+            raise FrameFormatError(f"Region out of bounds: {(x, y, w, h)}")
+        regions.append(Region(op, codec, x, y, w, h, view[offset:offset + length]))
+        offset += length
+    return flags, width, height, frame_id, regions
+
+def build_ack(frame_id):
+    """构建 screen_ack 消息负载"""
+    return FRAME_ACK.pack(frame_id & 0xFFFFFFFF)
+
+def parse_ack(data):
+    """解析 screen_ack 消息负载
+
+    Returns:
+        帧序号
+
+    Raises:
+        FrameFormatError: 负载格式错误
+    """
+    if len(data) != FRAME_ACK.size:
+        raise FrameFormatError("Invalid frame ack")
+    return FRAME_ACK.unpack(data)[0]
+
+def build_viewport(width, height, zoom=1.0, center_x=0.5, center_y=0.5):
+    """构建 screen_viewport 消息负载"""
+    return VIEWPORT.pack(width, height, zoom, center_x, center_y)
+
+def parse_viewport(data):
+    """解析 screen_viewport 消息负载
+
+    Returns:
+        (宽, 高, 缩放倍数, 中心 x, 中心 y)
+
+    Raises:
+        FrameFormatError: 负载格式错误
+    """
+    if len(data) != VIEWPORT.size:
+        raise FrameFormatError("Invalid viewport")
+    return VIEWPORT.unpack(data)
@@ -0,0 +1,99 @@
+import struct
+
+# 各格式的文件头标志
+_JPEG_SIGNATURE = b'\xff\xd8'
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+_VP8_START_CODE = b'\x9d\x01\x2a'
+
+# 带图像尺寸的 JPEG SOF 标记：C0-CF 中除去 DHT(C4)、JPG(C8)、DAC(CC)
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# 没有长度字段的 JPEG 标记：TEM、RST0-7、SOI
+_JPEG_STANDALONE_MARKERS = frozenset([0x01, 0xD8]) | frozenset(range(0xD0, 0xD8))
+
+# PNG 颜色类型 -> 通道数
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}
+
+def read_image_header(data):
+    """只解析文件头得到图像格式和尺寸，不解码像素
+
+    支持 JPEG（SOF 段）、PNG（IHDR 块）和 WebP（VP8 / VP8L / VP8X 块），
+    只读取开头的几十到几百字节，耗时在微秒级。
+
+    Args:
+        data: 压缩后的图像数据（bytes 或 memoryview）
+
+    Returns:
+        (格式, 宽, 高, 通道数)，格式为 'jpeg'、'png' 或 'webp'；
+        无法识别或文件头不完整时返回 None
+    """
+    try:
+        head = bytes(data[:32])
+        if head.startswith(_JPEG_SIGNATURE):
+            return _read_jpeg(data)
+        if head.startswith(_PNG_SIGNATURE):
+            return _read_png(head)
+        if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+            return _read_webp(head)
+    except (struct.error, IndexError):
+        pass
+    return None
+
+def _read_jpeg(data):
+    # 逐段跳过，直到遇到 SOF；SOS 之后是熵编码数据，不再有 SOF
+    offset = 2
+    size = len(data)
+    while offset + 4 <= size:
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            # 标记前可以有填充的 0xFF
+            offset += 1
+            continue
+        if marker in _JPEG_STANDALONE_MARKERS:
+            offset += 2
+            continue
+        if marker in (0xD9, 0xDA):
+            return None
+        length = (data[offset + 2] << 8) | data[offset + 3]
+        if marker in _JPEG_SOF_MARKERS:
+            if offset + 10 > size:
+                return None
+            height, width = struct.unpack_from('>HH', data, offset + 5)
+            return 'jpeg', width, height, data[offset + 9]
+        offset += 2 + length
+    return None
+
+def _read_png(head):
+    # 签名之后的第一个块必须是 IHDR
+    if head[12:16] != b'IHDR' or len(head) < 26:
+        return None
+    width, height = struct.unpack_from('>II', head, 16)
+    channels = _PNG_CHANNELS.get(head[25])
+    if channels is None:
+        return None
+    return 'png', width, height, channels
+
+def _read_webp(head):
+    chunk = head[12:16]
+    if chunk == b'VP8 ':
+        # 有损：帧标记(3) + 起始码(3) + 宽(14 位) + 高(14 位)，小端
+        if head[23:26] != _VP8_START_CODE:
+            return None
+        width, height = struct.unpack_from('<HH', head, 26)
+        return 'webp', width & 0x3FFF, height & 0x3FFF, 3
+    if chunk == b'VP8L':
+        # 无损：签名 0x2F + 宽-1(14 位) + 高-1(14 位) + alpha(1 位)，小端位序
+        if head[20] != 0x2F:
+            return None
+        bits, = struct.unpack_from('<I', head, 21)
+        width = (bits & 0x3FFF) + 1
+        height = ((bits >> 14) & 0x3FFF) + 1
+        return 'webp', width, height, 4 if bits >> 28 & 1 else 3
+    if chunk == b'VP8X':
+        # 扩展格式：标志(1) + 保留(3) + 画布宽-1(3) + 画布高-1(3)，小端
+        flags = head[20]
+        width = int.from_bytes(head[24:27], 'little') + 1
+        height = int.from_bytes(head[27:30], 'little') + 1
+        return 'webp', width, height, 4 if flags & 0x10 else 3
+    return None
@@ -2,47 +2,80 @@ import cv2
 import numpy as np
 from PIL import Image
 import io
+import threading
+import zlib
+from .image_header import read_image_header
+from .pixel_format import CHANNELS, PIXEL_BGR, PIXEL_BGRA, PIXEL_RGB, PIXEL_RGBA, convert_pixels
+from .yuv import (
+    SUBSAMPLING_420, SUBSAMPLING_FACTORS, SUBSAMPLING_IDS, SUBSAMPLING_NAMES, from_planes,
+    split_planes, to_planes
+)
+
+# 无损格式：'zlib' 为 zlib 压缩的原始 RGB 像素，'palette' 为调色板 + zlib 压缩的索引，
+# 两者都不带尺寸，解压时需要传入 (高, 宽)
+LOSSLESS_FORMATS = ('png', 'zlib', 'palette')
+# 'yuv' 为色度抽样后的 Y、U、V 平面 + zlib（只有色度抽样有损），同样需要传入 (高, 宽)，
+# 观看端可以把三个平面直接上传为纹理
+# 调色板最多的颜色数，索引 255 保留为查找表中的“不在调色板中”
+MAX_PALETTE_COLORS = 255
+# PIL 按原始格式读入 BGR/BGRA/RGBA 缓冲区时使用的 rawmode
+_PIL_RAWMODES = {PIXEL_BGR: 'BGR', PIXEL_BGRA: 'BGRX', PIXEL_RGBA: 'RGBX'}
 
 class ImageProcessing:
-    def __init__(self, quality=80, compression='jpeg'):
+    def __init__(self, quality=80, compression='jpeg', chroma_subsampling=SUBSAMPLING_420):
         self.quality = quality
         self.compression = compression.lower()
+        self.zlib_level = 1
+        self.chroma_subsampling = chroma_subsampling
+        # 调色板编码使用的 24 位颜色查找表（16MB），每个线程一份，按需分配
+        self._local = threading.local()
         
-    def compress_image(self, img):
+    def compress_image(self, img, compression=None, pixel_format=PIXEL_RGB):
         """压缩图像
         
         Args:
-            img: numpy数组，RGB格式
+            img: numpy数组，默认RGB格式，可以是按行跨步的视图
+            compression: 压缩格式，None 表示使用当前设置的格式
+            pixel_format: img 的像素格式，BGR/BGRA 可以直接编码为 JPEG，不做转换
             
         Returns:
             压缩后的图像数据（bytes）
         """
         if img is None:
             return None
+        compression = compression or self.compression
             
         try:
-            if self.compression == 'jpeg':
-                # 使用OpenCV压缩为JPEG
-                result, encimg = cv2.imencode('.jpg', cv2.cvtColor(img, cv2.COLOR_RGB2BGR), 
-                                           [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
-                if result:
-                    return encimg.tobytes()
-            elif self.compression == 'png':
-                # 使用OpenCV压缩为PNG
-                result, encimg = cv2.imencode('.png', cv2.cvtColor(img, cv2.COLOR_RGB2BGR),
+            if compression == 'zlib':
+                # 传输格式为 RGB
+                return zlib.compress(np.ascontiguousarray(convert_pixels(img, pixel_format, PIXEL_RGB)),
+                                     self.zlib_level)
+            elif compression == 'palette':
+                return self.compress_palette(img, pixel_format)
+            elif compression == 'yuv':
+                return self.compress_yuv(img, pixel_format)
+            elif compression == 'png':
+                # 使用OpenCV压缩为PNG（PNG 会保留 alpha 通道，先去掉）
+                result, encimg = cv2.imencode('.png', convert_pixels(img, pixel_format, PIXEL_BGR),
                                            [int(cv2.IMWRITE_PNG_COMPRESSION), 3])
                 if result:
                     return encimg.tobytes()
-            elif self.compression == 'webp':
-                # 使用PIL压缩为WebP
-                pil_img = Image.fromarray(img)
+            elif compression == 'webp':
+                # 使用PIL压缩为WebP，BGR/BGRA 按原始格式读入，不单独转换
+                if pixel_format == PIXEL_RGB:
+                    pil_img = Image.fromarray(img)
+                else:
+                    data = np.ascontiguousarray(img)
+                    pil_img = Image.frombuffer('RGB', (img.shape[1], img.shape[0]), data, 'raw',
+                                               _PIL_RAWMODES[pixel_format], 0, 1)
                 buffer = io.BytesIO()
                 pil_img.save(buffer, format='WebP', quality=self.quality)
                 return buffer.getvalue()
             
-            # 默认使用JPEG
-            result, encimg = cv2.imencode('.jpg', cv2.cvtColor(img, cv2.COLOR_RGB2BGR),
-                                       [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
+            # JPEG（默认）：OpenCV 直接接受 BGR 和 BGRA，编码时逐行转换
+            if pixel_format not in (PIXEL_BGR, PIXEL_BGRA):
+                img = convert_pixels(img, pixel_format, PIXEL_BGR)
+            result, encimg = cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
             if result:
                 return encimg.tobytes()
             
@@ -50,33 +83,188 @@ class ImageProcessing:
         except Exception as e:
             print(f"Image compression error: {e}")
             return None
-            
-    def decompress_image(self, img_data):
+
+    def compress_palette(self, img, pixel_format=PIXEL_RGB):
+        """按调色板压缩图像：颜色表 + zlib 压缩的 8 位索引
+
+        适合文字、界面等颜色很少的内容，无损且比直接压缩 RGB 小得多。
+        先在隔行隔列的采样上统计颜色，颜色过多或采样遗漏了颜色时返回 None。
+        BGRA/RGBA 输入直接按 32 位整数读取，不做转换。
+
+        Returns:
+            压缩后的数据（bytes），颜色数超过 MAX_PALETTE_COLORS 时返回 None
+        """
+        try:
+            if CHANNELS[pixel_format] == 4:
+                pixels, order = img, pixel_format
+            else:
+                order = PIXEL_BGRA if pixel_format == PIXEL_BGR else PIXEL_RGBA
+                pixels = convert_pixels(img, pixel_format, order)
+            # 4 通道视图按行跨步时先复制成连续数组
+            pixels = np.ascontiguousarray(pixels)
+            packed = pixels.view(np.uint32)[..., 0] & np.uint32(0xFFFFFF)
+            palette = np.unique(packed[::2, ::2])
+            if len(palette) > MAX_PALETTE_COLORS:
+                return None
+
+            lut = getattr(self._local, 'lut', None)
+            if lut is None:
+                lut = self._local.lut = np.full(1 << 24, MAX_PALETTE_COLORS, dtype=np.uint8)
+            lut[palette] = np.arange(len(palette), dtype=np.uint8)
+            indices = lut[packed]
+            lut[palette] = MAX_PALETTE_COLORS
+            if (indices == MAX_PALETTE_COLORS).any():
+                return None
+
+            # 颜色表按 RGB 传输
+            colors = palette.astype('<u4').view(np.uint8).reshape(-1, 4)[:, :3]
+            if order == PIXEL_BGRA:
+                colors = colors[:, ::-1]
+            return bytes([len(palette) - 1]) + colors.tobytes() + zlib.compress(indices, self.zlib_level)
+        except Exception as e:
+            print(f"Palette compression error: {e}")
+            return None
+
+    def compress_yuv(self, img, pixel_format=PIXEL_RGB, subsampling=None):
+        """转换为色度抽样的 Y、U、V 平面后用 zlib 压缩
+
+        Args:
+            img: numpy数组
+            pixel_format: img 的像素格式
+            subsampling: 色度抽样，'444'、'422' 或 '420'，None 表示使用当前设置
+
+        Returns:
+            压缩后的数据（bytes）：抽样方式(1) + zlib(Y + U + V)
+        """
+        subsampling = subsampling or self.chroma_subsampling
+        try:
+            compressor = zlib.compressobj(self.zlib_level)
+            parts = [bytes([SUBSAMPLING_IDS[subsampling]])]
+            # 三个平面依次送入同一个压缩流，不拼接成一块
+            for plane in to_planes(img, pixel_format, subsampling):
+                parts.append(compressor.compress(plane))
+            parts.append(compressor.flush())
+            return b''.join(parts)
+        except Exception as e:
+            print(f"YUV compression error: {e}")
+            return None
+
+    def decompress_planes(self, img_data, shape):
+        """解压 'yuv' 格式的数据，不转换为 RGB
+
+        Args:
+            img_data: compress_yuv 的输出
+            shape: 图像的 (高, 宽)
+
+        Returns:
+            (抽样方式, Y, U, V)，三个平面是解压结果的视图；失败时返回 None
+        """
+        try:
+            subsampling = SUBSAMPLING_NAMES[img_data[0]]
+            raw = zlib.decompress(img_data[1:])
+            return (subsampling,) + split_planes(raw, shape[1], shape[0], subsampling)
+        except Exception as e:
+            print(f"YUV decompression error: {e}")
+            return None
+
+    def decompress_image(self, img_data, compression=None, shape=None, pixel_format=PIXEL_RGB):
         """解压缩图像
         
         Args:
             img_data: 压缩后的图像数据（bytes）
+            compression: 压缩格式，'zlib'、'palette' 和 'yuv' 需要指定，其他格式自动识别
+            shape: 图像的 (高, 宽)，'zlib'、'palette' 和 'yuv' 格式需要
+            pixel_format: 输出的像素格式，'rgb' 或 'bgr'；显示端原生支持 BGR 时
+                可以省去 JPEG/PNG 解码后的转换
             
         Returns:
-            numpy数组，RGB格式
+            numpy数组，默认RGB格式
         """
         if not img_data:
             return None
             
         try:
+            if compression == 'zlib':
+                pixels = np.frombuffer(zlib.decompress(img_data), np.uint8)
+                return convert_pixels(pixels.reshape(shape[0], shape[1], 3), PIXEL_RGB, pixel_format)
+            if compression == 'palette':
+                count = img_data[0] + 1
+                colors = np.frombuffer(img_data, np.uint8, count * 3, 1).reshape(count, 3)
+                if pixel_format == PIXEL_BGR:
+                    colors = colors[:, ::-1]
+                indices = np.frombuffer(zlib.decompress(img_data[1 + count * 3:]), np.uint8)
+                return colors[indices.reshape(shape[0], shape[1])]
+            if compression == 'yuv':
+                planes = self.decompress_planes(img_data, shape)
+                return from_planes(*planes[1:], pixel_format) if planes else None
+
             # 使用OpenCV解码图像
             img = cv2.imdecode(np.frombuffer(img_data, np.uint8), cv2.IMREAD_COLOR)
             if img is not None:
-                # 转换为RGB格式
-                return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+                # OpenCV 解码为 BGR，按需要转换
+                return convert_pixels(img, PIXEL_BGR, pixel_format)
             
             # 尝试使用PIL解码
             pil_img = Image.open(io.BytesIO(img_data))
-            return np.array(pil_img)
+            return convert_pixels(np.array(pil_img.convert('RGB')), PIXEL_RGB, pixel_format)
         except Exception as e:
             print(f"Image decompression error: {e}")
             return None
             
+    def decompress_into(self, img_data, dst, compression=None, pixel_format=PIXEL_RGB):
+        """解压缩图像并直接写入 dst，不分配输出数组
+
+        观看端把区域直接解码到常驻帧缓冲区中的对应位置：调色板用 np.take
+        写入，zlib/yuv 和 JPEG/PNG 解码结果的颜色转换直接输出到 dst，格式
+        相同时只做一次复制。zlib.decompress 和 cv2.imdecode 都不接受输出
+        缓冲区，解压/解码结果本身仍需一次分配。
+
+        Args:
+            img_data: 压缩后的图像数据（bytes）
+            dst: 输出缓冲区，形状为 (高, 宽, 3)，可以是帧缓冲区中按行跨步的视图
+            compression: 压缩格式，'zlib'、'palette' 和 'yuv' 需要指定，其他格式自动识别
+            pixel_format: dst 的像素格式，'rgb' 或 'bgr'
+
+        Returns:
+            成功时返回 True；数据无法解码或尺寸与 dst 不符时返回 False
+        """
+        if not img_data:
+            return False
+        shape = dst.shape[:2]
+
+        try:
+            if compression == 'zlib':
+                pixels = np.frombuffer(zlib.decompress(img_data), np.uint8)
+                convert_pixels(pixels.reshape(shape[0], shape[1], 3), PIXEL_RGB, pixel_format, dst)
+                return True
+            if compression == 'palette':
+                count = img_data[0] + 1
+                colors = np.frombuffer(img_data, np.uint8, count * 3, 1).reshape(count, 3)
+                if pixel_format == PIXEL_BGR:
+                    colors = colors[:, ::-1]
+                indices = np.frombuffer(zlib.decompress(img_data[1 + count * 3:]), np.uint8)
+                np.take(colors, indices.reshape(shape), axis=0, out=dst)
+                return True
+            if compression == 'yuv':
+                planes = self.decompress_planes(img_data, shape)
+                if planes is None:
+                    return False
+                from_planes(*planes[1:], pixel_format, dst)
+                return True
+
+            img = cv2.imdecode(np.frombuffer(img_data, np.uint8), cv2.IMREAD_COLOR)
+            src_format = PIXEL_BGR
+            if img is None:
+                img = np.asarray(Image.open(io.BytesIO(img_data)).convert('RGB'))
+                src_format = PIXEL_RGB
+            if img.shape[:2] != shape:
+                return False
+            convert_pixels(img, src_format, pixel_format, dst)
+            return True
+        except Exception as e:
+            print(f"Image decompression error: {e}")
+            return False
+
     def resize_image(self, img, width=None, height=None, keep_ratio=True):
         """调整图像大小
         
@@ -147,6 +335,9 @@ class ImageProcessing:
     def get_image_info(self, img_data):
         """获取图像信息
         
+        JPEG、PNG、WebP 只解析文件头（微秒级），其他格式或文件头无法解析时
+        才完整解码。
+
         Args:
             img_data: 压缩后的图像数据（bytes）
             
@@ -154,6 +345,17 @@ class ImageProcessing:
             图像信息字典，包含宽度、高度、通道数等
         """
         try:
+            header = read_image_header(img_data)
+            if header is not None:
+                image_format, w, h, channels = header
+                return {
+                    'width': w,
+                    'height': h,
+                    'channels': channels,
+                    'size': len(img_data),
+                    'format': image_format
+                }
+
             img = self.decompress_image(img_data)
             if img is not None:
                 h, w = img.shape[:2]
@@ -182,10 +384,20 @@ class ImageProcessing:
         """设置压缩格式
         
         Args:
-            compression: 压缩格式，'jpeg'、'png'或'webp'
+            compression: 压缩格式，'jpeg'、'png'、'webp'、'zlib'、'palette'或'yuv'
         """
         self.compression = compression.lower()
 
+    def set_chroma_subsampling(self, subsampling):
+        """设置 'yuv' 格式的色度抽样
+
+        Args:
+            subsampling: '444'、'422' 或 '420'
+        """
+        if subsampling not in SUBSAMPLING_FACTORS:
+            raise ValueError(f"Unknown chroma subsampling: {subsampling}")
+        self.chroma_subsampling = subsampling
+
 if __name__ == "__main__":
     # 测试图像处理功能
     from screen_capture import ScreenCapture
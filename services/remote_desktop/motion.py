@@ -0,0 +1,169 @@
+import cv2
+import numpy as np
+
+# 参与检测的最小区域（像素）和最少的匹配行/列数
+DEFAULT_MIN_AREA = 128 * 128
+DEFAULT_MIN_RUN = 32
+# 计算行指纹的竖条宽度（像素）
+DEFAULT_STRIP_WIDTH = 64
+
+class MotionDetector:
+    """滚动和移动检测
+
+    浏览器、终端滚动时几乎每个块都变化，脏矩形检测仍然要重新压缩整个
+    区域。MotionDetector 在较大的脏矩形中寻找整体的纵向或横向平移：
+
+        1. 把矩形分成 64 像素宽的竖条，对上一帧和当前帧逐行计算每个竖条
+           的 64 位指纹（随机权重乘加）
+        2. 当前帧每一行在上一帧中查找指纹唯一的同内容行，按行号差投票
+        3. 得票最多的偏移量下，取行指纹相同的竖条中最宽的连续一段，以及
+           这些竖条同时相同的最长一段行，逐像素确认后作为复制区域
+
+    横向平移对转置后的矩形做同样的检测。观看端执行“从 (x, y) 复制到
+    (x', y')”后，只剩新露出的窄条需要编码。
+    """
+
+    def __init__(self, min_area=DEFAULT_MIN_AREA, min_run=DEFAULT_MIN_RUN,
+                 strip_width=DEFAULT_STRIP_WIDTH, seed=0x5EED):
+        """
+        Args:
+            min_area: 参与检测的脏矩形的最小面积（像素）
+            min_run: 复制区域的最小行数（纵向）或列数（横向）
+            strip_width: 计算行指纹的竖条宽度（像素），8 的倍数
+            seed: 行指纹权重的随机数种子
+        """
+        self.min_area = min_area
+        self.min_run = min_run
+        self.strip_width = strip_width
+        rng = np.random.default_rng(seed)
+        # 每个竖条一行最多 strip_width * 4 字节（BGRA）
+        self._weights = rng.integers(1, 1 << 63, strip_width // 2, dtype=np.uint64) | np.uint64(1)
+        # 统计信息
+        self.checks = 0
+        self.moves = 0
+        self.moved_pixels = 0
+
+    def detect(self, previous, current, rects):
+        """在脏矩形中检测平移
+
+        Args:
+            previous: 上一帧（观看端当前的画面）
+            current: 当前帧
+            rects: 脏矩形列表 [(x, y, 宽, 高)]
+
+        Returns:
+            复制操作列表 [(源 x, 源 y, 目标 x, 目标 y, 宽, 高)]
+        """
+        moves = []
+        for x, y, w, h in rects:
+            if w * h < self.min_area:
+                continue
+            self.checks += 1
+            old = previous[y:y + h, x:x + w]
+            new = current[y:y + h, x:x + w]
+            move = self._detect_vertical(old, new)
+            if move is not None:
+                src, dst, run, left, right = move
+                moves.append((x + left, y + src, x + left, y + dst, right - left, run))
+                continue
+            # 横向平移：转置后按行检测
+            move = self._detect_vertical(cv2.transpose(old), cv2.transpose(new))
+            if move is not None:
+                src, dst, run, top, bottom = move
+                moves.append((x + src, y + top, x + dst, y + top, run, bottom - top))
+        for _, _, _, _, w, h in moves:
+            self.moves += 1
+            self.moved_pixels += w * h
+        return moves
+
+    def strip_hashes(self, img):
+        """按竖条逐行计算 64 位指纹
+
+        矩形按 strip_width 宽的竖条划分（滚动区域两侧常有不动的边框、
+        滚动条），每个竖条的每一行按 uint64 字乘以随机权重后求和（按
+        2^64 取模）。指纹只用于找候选偏移，复制前会逐像素确认。
+
+        Returns:
+            uint64 数组，形状为 (行数, 竖条数)，不足一个竖条的部分不计算
+        """
+        height, width = img.shape[:2]
+        strips = width // self.strip_width
+        words = self.strip_width * img.shape[2] // 8 if img.ndim == 3 else self.strip_width // 8
+        rows = np.ascontiguousarray(img[:, :strips * self.strip_width]).reshape(height, strips, -1)
+        return rows.view(np.uint64) @ self._weights[:words]
+
+    def _detect_vertical(self, old, new):
+        """检测纵向平移
+
+        Returns:
+            (源起始行, 目标起始行, 行数, 起始列, 结束列)，没有可用的平移时返回 None
+        """
+        height, width = old.shape[:2]
+        if height < self.min_run * 2 or width < self.strip_width:
+            return None
+        old_hashes = self.strip_hashes(old)
+        new_hashes = self.strip_hashes(new)
+
+        # 各竖条分别投票，只用上一帧中唯一的行：空行、重复的分隔线没有位置信息
+        offsets = []
+        for strip in range(old_hashes.shape[1]):
+            values, first, counts = np.unique(old_hashes[:, strip], return_index=True, return_counts=True)
+            values, first = values[counts == 1], first[counts == 1]
+            if not values.size:
+                continue
+            pos = np.minimum(np.searchsorted(values, new_hashes[:, strip]), values.size - 1)
+            found = values[pos] == new_hashes[:, strip]
+            shift = np.flatnonzero(found) - first[pos[found]]
+            offsets.append(shift[shift != 0])
+        offsets = np.concatenate(offsets) if offsets else np.empty(0, dtype=np.int64)
+        if offsets.size < self.min_run:
+            return None
+        candidates, votes = np.unique(offsets, return_counts=True)
+        if votes.max() < self.min_run:
+            return None
+        dy = int(candidates[votes.argmax()])
+        if abs(dy) > height - self.min_run:
+            return None
+
+        # 该偏移下各竖条的行是否相同；取行数足够的竖条中最宽的连续一段，
+        # 再取这些竖条同时相同的最长一段行
+        if dy > 0:
+            same = new_hashes[dy:] == old_hashes[:height - dy]
+        else:
+            same = new_hashes[:height + dy] == old_hashes[-dy:]
+        moving = np.array([self._run_length(same[:, strip]) >= self.min_run
+                           for strip in range(same.shape[1])])
+        left, right = self._longest_run(moving)
+        if right <= left:
+            return None
+        start, end = self._longest_run(same[:, left:right].all(axis=1))
+        if end - start < self.min_run:
+            return None
+
+        src, dst = (start, start + dy) if dy > 0 else (start - dy, start)
+        run = end - start
+        left, right = left * self.strip_width, right * self.strip_width
+        if not np.array_equal(new[dst:dst + run, left:right], old[src:src + run, left:right]):
+            return None
+        return src, dst, run, left, right
+
+    def _run_length(self, same):
+        start, end = self._longest_run(same)
+        return end - start
+
+    def _longest_run(self, same):
+        padded = np.concatenate(([False], same, [False])).astype(np.int8)
+        edges = np.flatnonzero(np.diff(padded))
+        if not edges.size:
+            return 0, 0
+        starts, ends = edges[::2], edges[1::2]
+        best = int(np.argmax(ends - starts))
+        return int(starts[best]), int(ends[best])
+
+    def get_stats(self):
+        """获取统计信息：检测次数、复制操作数和复制的像素数"""
+        return {
+            'motion_checks': self.checks,
+            'moves': self.moves,
+            'moved_pixels': self.moved_pixels
+        }
@@ -0,0 +1,449 @@
+import threading
+import time
+import numpy as np
+from .adaptive import DEFAULT_TARGET_LATENCY, AdaptiveController
+from .image_processing import ImageProcessing
+from .pixel_format import PixelFrame
+from .tile_cache import DEFAULT_TILE_CACHE_SIZE, EVICTION_LRU
+from .video_codec import create_frame_encoder
+from .viewport import Viewport, apply_viewport
+from .yuv import SUBSAMPLING_420
+
+# 默认帧率
+DEFAULT_FPS = 30
+# 等待控制器允许发送时的轮询间隔（秒）
+POLL_INTERVAL = 0.005
+
+class LatestSlot:
+    """单槽的“最新帧优先”队列
+
+    put 总是成功：槽中已有未取走的条目时直接替换，被替换的条目返回给
+    调用方（例如归还帧缓冲区）。get 取走槽中的条目，槽为空时等待。
+    """
+
+    def __init__(self):
+        self.item = None
+        self.condition = threading.Condition()
+        self.closed = False
+        # 统计信息
+        self.puts = 0
+        self.replaced = 0
+
+    def put(self, item):
+        """放入条目
+
+        Returns:
+            被替换的旧条目，没有时返回 None
+        """
+        with self.condition:
+            old, self.item = self.item, item
+            self.puts += 1
+            if old is not None:
+                self.replaced += 1
+            self.condition.notify_all()
+            return old
+
+    def get(self, timeout=None):
+        """取走条目
+
+        Returns:
+            条目，超时或已关闭时返回 None
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.closed or self.item is not None, timeout):
+                return None
+            item, self.item = self.item, None
+            self.condition.notify_all()
+            return item
+
+    def wait_empty(self, timeout=None):
+        """等待槽中的条目被取走
+
+        Returns:
+            槽为空时返回 True，超时或已关闭时返回 False
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.closed or self.item is None, timeout)
+            return not self.closed and self.item is None
+
+    def close(self):
+        """关闭队列，唤醒所有等待的线程"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def reopen(self):
+        with self.condition:
+            self.closed = False
+            self.item = None
+
+class StageTimer:
+    """单个阶段的耗时统计"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.lock = threading.Lock()
+
+    def average(self):
+        with self.lock:
+            return self.total / self.count if self.count else 0.0
+
+    def add(self, elapsed):
+        with self.lock:
+            self.count += 1
+            self.total += elapsed
+            self.max = max(self.max, elapsed)
+            self.last = elapsed
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'count': self.count,
+                'avg_ms': self.total / self.count * 1000 if self.count else 0.0,
+                'max_ms': self.max * 1000,
+                'last_ms': self.last * 1000
+            }
+
+class FramePipeline:
+    """屏幕共享的流水线：抓取 -> 编码 -> 发送
+
+    三个阶段各占一个线程，阶段之间是单槽的 LatestSlot：
+
+        编码线程等发送槽空出、屏幕通道没有积压、控制器允许发送后，才向
+        抓取线程请求一帧；发送线程正忙时按平均耗时推迟到它快要发完时再
+        请求，使抓取、编码和发送重叠，但帧不在槽中久等。
+        抓取线程收到请求后（距上一次抓取不少于帧间隔）抓屏，把帧复制到
+        缓冲池中的空闲缓冲区后放入编码槽，编码线程立即编码，结果放入
+        发送槽。
+        发送线程取出编码结果，调用 send 发送。
+
+    send 必须阻塞到数据写出为止，发送阶段的耗时才反映网络速度。send 只是
+    把消息放入发送队列（例如 TCPClient.send_message）时，需要同时传入
+    queue_depth，编码线程在屏幕通道积压超过 max_queued 条时等待。
+
+    编码结果是相对上一帧的增量，中途丢弃会让观看端的画面出错，因此帧在
+    编码之前就被跳过：网络变慢时发送阶段变慢，编码线程随之推迟请求，
+    抓取线程不抓取这期间的画面，编码的总是刚抓取的一帧，而不是在槽或
+    发送队列里等过的旧帧。观看端发现帧不连续时
+    发送 screen_keyframe_request（on_keyframe_request），下一帧编码为关键帧。
+
+    抓取线程按观看端的显示区域（set_viewport / on_viewport）裁剪，并直接
+    缩小到流水线的缓冲区中，之后的编码只处理显示区域分辨率
+    的像素；画面对应的屏幕区域通过 set_source_rect 随帧告知观看端。
+
+    source 只需要提供 capture_frame() 方法，返回 PixelFrame 或 None，
+    例如 ScreenCapture 或 SyntheticDesktop（无图形环境下的基准测试）。
+    """
+
+    def __init__(self, source, encoder, send, fps=DEFAULT_FPS, controller=None,
+                 queue_depth=None, max_queued=1, clock=time.perf_counter):
+        """
+        Args:
+            source: 帧来源，提供 capture_frame()
+            encoder: FrameEncoder
+            send: 发送函数 send(payload)，阻塞到数据写出为止
+            fps: 抓取帧率，设置了 controller 时使用控制器的帧率
+            controller: 可选的 AdaptiveController，调整画质、缩放比例和帧率
+            queue_depth: 可选，返回发送队列中屏幕通道积压的消息数，
+                例如 lambda: queue.depth(CHANNEL_SCREEN)；send 不阻塞时必须传入
+            max_queued: 屏幕通道允许积压的消息数，超过时暂停编码
+            clock: 计时使用的时钟
+        """
+        self.source = source
+        self.encoder = encoder
+        self.send = send
+        self.fps = fps
+        self.controller = controller
+        self.queue_depth = queue_depth
+        self.max_queued = max_queued
+        self.clock = clock
+        self.encode_slot = LatestSlot()
+        self.send_slot = LatestSlot()
+        self.frame_wanted = threading.Event()  # 编码线程请求抓取下一帧
+        self.timers = {'capture': StageTimer(), 'encode': StageTimer(), 'send': StageTimer(),
+                       'latency': StageTimer()}
+        self.threads = []
+        self.running = False
+        self.sending = None  # 发送线程正在发送的一帧 (开始时间, 字节数)，空闲时为 None
+        self.viewport = None  # 观看端的显示区域，None 表示按原始分辨率发送整个屏幕
+        self.keyframe_requested = False  # 观看端请求关键帧，由编码线程重置编码器
+        # 空闲的帧缓冲区，稳定状态下最多三块：抓取中、槽中、编码中
+        self.free_buffers = []
+        self.buffer_lock = threading.Lock()
+        # 统计信息
+        self.captured = 0
+        self.dropped = 0
+        self.unchanged = 0
+        self.sent = 0
+        self.bytes_sent = 0
+        self.errors = 0
+
+    def start(self):
+        """启动三个阶段的线程"""
+        if self.running:
+            return
+        self.running = True
+        self.encode_slot.reopen()
+        self.send_slot.reopen()
+        self.frame_wanted.clear()
+        self.threads = [
+            threading.Thread(target=self._capture_loop, name='pipeline-capture', daemon=True),
+            threading.Thread(target=self._encode_loop, name='pipeline-encode', daemon=True),
+            threading.Thread(target=self._send_loop, name='pipeline-send', daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self, timeout=2.0):
+        """停止流水线，等待线程退出"""
+        self.running = False
+        self.frame_wanted.set()
+        self.encode_slot.close()
+        self.send_slot.close()
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+        self.threads = []
+
+    def on_frame_ack(self, frame_id):
+        """处理观看端的 screen_ack"""
+        if self.controller is not None:
+            self.controller.on_frame_ack(frame_id)
+
+    def request_keyframe(self):
+        """下一帧编码为关键帧（新的观看端加入或观看端请求刷新）
+
+        编码器只在编码线程中使用，这里只做标记，由编码线程调用 encoder.reset()。
+        """
+        self.keyframe_requested = True
+
+    def on_keyframe_request(self, data=b''):
+        """处理观看端的 screen_keyframe_request 消息"""
+        self.request_keyframe()
+
+    def set_viewport(self, viewport):
+        """设置观看端的显示区域，从下一次抓取开始生效
+
+        Args:
+            viewport: Viewport，None 表示按原始分辨率发送整个屏幕
+        """
+        self.viewport = viewport
+
+    def on_viewport(self, data):
+        """处理观看端的 screen_viewport 消息"""
+        try:
+            self.set_viewport(Viewport.from_message(data))
+        except Exception as e:
+            print(f"Viewport error: {e}")
+
+    def _frame_interval(self):
+        fps = self.controller.fps if self.controller is not None else self.fps
+        return 1.0 / fps if fps else 0.0
+
+    def _acquire_buffer(self, shape, dtype):
+        with self.buffer_lock:
+            while self.free_buffers:
+                buffer = self.free_buffers.pop()
+                if buffer.shape == shape and buffer.dtype == dtype:
+                    return buffer
+        return np.empty(shape, dtype=dtype)
+
+    def _release(self, frame):
+        if frame is not None:
+            with self.buffer_lock:
+                self.free_buffers.append(frame[0].data)
+
+    def _send_remaining(self):
+        # 帧的大小相差很大，按正在发送的一帧的字节数和平均每字节的发送耗时
+        # 估计发送线程还要多久空闲
+        sending = self.sending
+        if sending is None:
+            return 0.0
+        if not self.bytes_sent:
+            # 还没有测量值（例如第一帧是很大的关键帧），等它发完
+            return float('inf')
+        since, size = sending
+        timer = self.timers['send']
+        with timer.lock:
+            per_byte = timer.total / self.bytes_sent
+        return since + size * per_byte - self.clock()
+
+    def _queue_full(self):
+        # 发送队列中的屏幕帧是增量，不能丢弃，积压时暂停编码
+        if self.queue_depth is None:
+            return False
+        depth = self.queue_depth()
+        if self.controller is not None:
+            self.controller.on_queue_depth(depth)
+        return depth > self.max_queued
+
+    def _capture_loop(self):
+        next_time = self.clock()
+        while self.running:
+            # 只在编码线程请求时抓取，网络慢时不抓取注定被替换的帧
+            self.frame_wanted.wait()
+            if not self.running:
+                break
+            now = self.clock()
+            if now < next_time:
+                time.sleep(next_time - now)
+                continue
+            self.frame_wanted.clear()
+            next_time = max(next_time + self._frame_interval(), now)
+            try:
+                start = self.clock()
+                frame = self.source.capture_frame()
+                if frame is None:
+                    continue
+                data = frame.data
+                viewport = self.viewport or Viewport()
+                scale = self.controller.scale if self.controller is not None else 1.0
+                _, (width, height) = viewport.plan(frame.width, frame.height, scale)
+                # 抓屏库和合成源会复用缓冲区，裁剪/缩小的结果直接写入流水线自己的缓冲区
+                buffer = self._acquire_buffer((height, width) + data.shape[2:], data.dtype)
+                _, rect = apply_viewport(data, viewport, scale, dst=buffer)
+                self.timers['capture'].add(self.clock() - start)
+                self.captured += 1
+                old = self.encode_slot.put((PixelFrame(buffer, frame.pixel_format), start, rect))
+                if old is not None:
+                    self.dropped += 1
+                    self._release(old)
+            except Exception as e:
+                self.errors += 1
+                print(f"Pipeline capture error: {e}")
+
+    def _encode_loop(self):
+        while self.running:
+            # 上一帧的编码结果发出之前不编码，保证编码的总是最新的一帧
+            if not self.send_slot.wait_empty():
+                break
+            if self._queue_full():
+                time.sleep(POLL_INTERVAL)
+                continue
+            if self.controller is not None and not self.controller.can_send():
+                time.sleep(POLL_INTERVAL)
+                continue
+            delay = self._send_remaining() - self.timers['encode'].average() \
+                - self.timers['capture'].average()
+            if delay > 0:
+                time.sleep(min(delay, POLL_INTERVAL))
+                continue
+            self.frame_wanted.set()
+            item = self.encode_slot.get()
+            if item is None:
+                break
+            frame, captured_at, rect = item
+            try:
+                start = self.clock()
+                if self.keyframe_requested:
+                    self.keyframe_requested = False
+                    self.encoder.reset()
+                self.encoder.set_source_rect(rect)
+                if self.controller is not None:
+                    self.controller.apply(self.encoder.image_processing)
+                frame_id = self.encoder.frame_id
+                payload = self.encoder.encode(frame)
+                self.timers['encode'].add(self.clock() - start)
+            except Exception as e:
+                self.errors += 1
+                print(f"Pipeline encode error: {e}")
+                # 编码器状态可能已与观看端不一致，下一帧重新作为关键帧发送
+                self.encoder.reset()
+                payload = None
+            finally:
+                self._release(item)
+            if payload is None:
+                self.unchanged += 1
+                if self.controller is not None:
+                    self.controller.on_frame_skipped()
+                continue
+            self.send_slot.put((frame_id, payload, captured_at))
+
+    def _send_loop(self):
+        while self.running:
+            item = self.send_slot.get()
+            if item is None:
+                break
+            frame_id, payload, captured_at = item
+            try:
+                start = self.clock()
+                self.sending = (start, len(payload))
+                if self.controller is not None:
+                    self.controller.on_frame_sent(frame_id, len(payload))
+                self.send(payload)
+                end = self.clock()
+                self.timers['send'].add(end - start)
+                self.timers['latency'].add(end - captured_at)
+                self.sent += 1
+                self.bytes_sent += len(payload)
+            except Exception as e:
+                self.errors += 1
+                print(f"Pipeline send error: {e}")
+            finally:
+                self.sending = None
+
+    def get_stats(self):
+        """获取统计信息：各阶段耗时（毫秒）、抓取/丢弃/发送的帧数
+
+        latency 为一帧从开始抓取到发送完成的时间。
+        """
+        stats = {name: timer.get_stats() for name, timer in self.timers.items()}
+        stats.update({
+            'captured': self.captured,
+            'dropped': self.dropped,
+            'unchanged': self.unchanged,
+            'sent': self.sent,
+            'bytes_sent': self.bytes_sent,
+            'errors': self.errors
+        })
+        if self.controller is not None:
+            stats['settings'] = self.controller.get_settings()
+        return stats
+
+def create_pipeline(source, send, settings=None, queue_depth=None, max_queued=1):
+    """按 remote_desktop 配置创建屏幕共享流水线（编码器、自适应控制器和 FramePipeline）
+
+    compression 为 'yuv' 时按 chroma_subsampling 抽样色度。
+
+    Args:
+        source: 帧来源，提供 capture_frame()，例如 ScreenCapture
+        send: 发送函数，见 FramePipeline
+        settings: remote_desktop 配置（dict），None 表示读取 config_manager
+        queue_depth: 可选，返回发送队列中屏幕通道积压的消息数
+        max_queued: 屏幕通道允许积压的消息数
+
+    Returns:
+        FramePipeline，未启动
+    """
+    if settings is None:
+        from core.utils.config import config_manager
+        settings = config_manager.get('remote_desktop', {})
+    fps = settings.get('fps', DEFAULT_FPS)
+    quality = settings.get('quality', 80)
+    image_processing = ImageProcessing(quality=quality,
+                                       compression=settings.get('compression', 'jpeg'),
+                                       chroma_subsampling=settings.get('chroma_subsampling',
+                                                                       SUBSAMPLING_420))
+    encoder = create_frame_encoder(
+        image_processing,
+        video_codec=settings.get('video_codec'),
+        fps=fps,
+        cache_size=settings.get('tile_cache_size', DEFAULT_TILE_CACHE_SIZE),
+        cache_policy=settings.get('tile_cache_policy', EVICTION_LRU),
+        workers=settings.get('encode_workers', 1),
+        content_aware=settings.get('content_aware', True),
+        detect_motion=settings.get('detect_motion', True)
+    )
+    controller = None
+    if settings.get('adaptive', True):
+        controller = AdaptiveController(
+            target_latency=settings.get('target_latency', DEFAULT_TARGET_LATENCY),
+            quality=quality,
+            fps=fps,
+            max_fps=fps
+        )
+    return FramePipeline(source, encoder, send, fps=fps, controller=controller,
+                         queue_depth=queue_depth, max_queued=max_queued)
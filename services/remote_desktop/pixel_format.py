@@ -0,0 +1,105 @@
+import cv2
+import numpy as np
+
+# 像素格式：通道在内存中的顺序
+PIXEL_RGB = 'rgb'
+PIXEL_BGR = 'bgr'
+PIXEL_BGRA = 'bgra'  # mss / Windows GDI / X11 的原生格式
+PIXEL_RGBA = 'rgba'  # macOS screencapture 输出的 PNG
+PIXEL_FORMATS = (PIXEL_RGB, PIXEL_BGR, PIXEL_BGRA, PIXEL_RGBA)
+CHANNELS = {PIXEL_RGB: 3, PIXEL_BGR: 3, PIXEL_BGRA: 4, PIXEL_RGBA: 4}
+
+# (源格式, 目标格式) -> cv2 转换代码
+_CONVERSIONS = {
+    (PIXEL_RGB, PIXEL_BGR): cv2.COLOR_RGB2BGR,
+    (PIXEL_BGR, PIXEL_RGB): cv2.COLOR_BGR2RGB,
+    (PIXEL_BGRA, PIXEL_RGB): cv2.COLOR_BGRA2RGB,
+    (PIXEL_BGRA, PIXEL_BGR): cv2.COLOR_BGRA2BGR,
+    (PIXEL_RGBA, PIXEL_RGB): cv2.COLOR_RGBA2RGB,
+    (PIXEL_RGBA, PIXEL_BGR): cv2.COLOR_RGBA2BGR,
+    (PIXEL_RGB, PIXEL_BGRA): cv2.COLOR_RGB2BGRA,
+    (PIXEL_BGR, PIXEL_BGRA): cv2.COLOR_BGR2BGRA,
+    (PIXEL_RGB, PIXEL_RGBA): cv2.COLOR_RGB2RGBA,
+    (PIXEL_BGR, PIXEL_RGBA): cv2.COLOR_BGR2RGBA,
+    (PIXEL_BGRA, PIXEL_RGBA): cv2.COLOR_BGRA2RGBA,
+    (PIXEL_RGBA, PIXEL_BGRA): cv2.COLOR_RGBA2BGRA,
+}
+
+# 转换到灰度的 cv2 代码
+_GRAY_CONVERSIONS = {
+    PIXEL_RGB: cv2.COLOR_RGB2GRAY,
+    PIXEL_BGR: cv2.COLOR_BGR2GRAY,
+    PIXEL_BGRA: cv2.COLOR_BGRA2GRAY,
+    PIXEL_RGBA: cv2.COLOR_RGBA2GRAY,
+}
+
+def convert_pixels(img, src_format, dst_format, dst=None):
+    """转换像素格式，格式相同且没有 dst 时直接返回原数组（不复制）
+
+    Args:
+        img: numpy数组，形状为 (高, 宽, 通道)，可以是按行跨步的视图
+        src_format: 源像素格式
+        dst_format: 目标像素格式
+        dst: 可选的输出缓冲区（可以是按行跨步的视图，例如帧缓冲区中的一块），
+            给出时结果总是写入 dst
+
+    Returns:
+        numpy数组
+    """
+    if src_format == dst_format:
+        if dst is None:
+            return img
+        np.copyto(dst, img)
+        return dst
+    code = _CONVERSIONS.get((src_format, dst_format))
+    if code is None:
+        raise ValueError(f"Unsupported pixel conversion: {src_format} -> {dst_format}")
+    if dst is None:
+        return cv2.cvtColor(img, code)
+    return cv2.cvtColor(img, code, dst=dst)
+
+def to_gray(img, pixel_format):
+    """转换为灰度图"""
+    if img.ndim == 2:
+        return img
+    return cv2.cvtColor(img, _GRAY_CONVERSIONS[pixel_format])
+
+class PixelFrame:
+    """带像素格式的帧
+
+    data 可以直接引用抓屏库的缓冲区（例如 mss 的 BGRA 内存），stride 为
+    每行的字节数，可能大于 宽 * 通道数。编码器按 pixel_format 直接处理，
+    只有确实需要时才转换。
+    """
+
+    def __init__(self, data, pixel_format):
+        """
+        Args:
+            data: numpy数组，形状为 (高, 宽, 通道)
+            pixel_format: 像素格式，见 PIXEL_FORMATS
+        """
+        if pixel_format not in PIXEL_FORMATS:
+            raise ValueError(f"Unknown pixel format: {pixel_format}")
+        self.data = data
+        self.pixel_format = pixel_format
+
+    @property
+    def width(self):
+        return self.data.shape[1]
+
+    @property
+    def height(self):
+        return self.data.shape[0]
+
+    @property
+    def channels(self):
+        return CHANNELS[self.pixel_format]
+
+    @property
+    def stride(self):
+        """每行的字节数"""
+        return self.data.strides[0]
+
+    def to(self, pixel_format, dst=None):
+        """转换为指定格式的 numpy 数组，格式相同时不复制"""
+        return convert_pixels(self.data, self.pixel_format, pixel_format, dst)
@@ -1,14 +1,99 @@
 import platform
+import threading
 import time
+import cv2
 import numpy as np
+from .pixel_format import PIXEL_BGRA, PIXEL_RGB, PixelFrame
+
+class MSSGrabber:
+    """常驻的屏幕抓取器
+
+    在抓取线程中保持一个 mss 实例，不再每帧创建 mss 或启动 scrot/xwd 子进程。
+    mss 10.2 及以上在 Linux 上通过 MIT-SHM 共享内存段（XShmGetImage）抓取，
+    不支持时自动退回 XGetImage。BGRA 像素直接转换到复用的 RGB 缓冲区，
+    grab 返回的 numpy 数组在下一次 grab 前有效。
+
+    grab(native=True) 不做转换，直接返回引用 mss 缓冲区的 BGRA 帧；
+    编码器按 BGRA 处理（JPEG 编码器直接接受 BGRA），省去每帧一次整帧的
+    颜色转换和复制。
+    """
+
+    def __init__(self, monitor_index=1):
+        """
+        Args:
+            monitor_index: 显示器序号，1 为主显示器，0 为所有显示器组成的虚拟屏幕
+        """
+        from mss import mss
+        self._mss = mss
+        self.monitor_index = monitor_index
+        self.sct = None
+        self.thread = None
+        self.frame = None  # 复用的 RGB 帧缓冲区
+        self.shot = None  # 最近一次抓取的结果，原生帧引用其内存
+
+    def _get_sct(self):
+        # X11 连接不能跨线程使用，抓取线程变化时重新创建
+        if self.sct is None or self.thread is not threading.current_thread():
+            self.close()
+            self.sct = self._mss()
+            self.thread = threading.current_thread()
+        return self.sct
+
+    def grab(self, native=False):
+        """抓取一帧
+
+        Args:
+            native: 为 True 时返回抓屏库原生的 BGRA 帧，不转换也不复制
+
+        Returns:
+            numpy数组，RGB格式，形状为 (高, 宽, 3)；该缓冲区会被下一帧复用。
+            native 为 True 时返回 PixelFrame（BGRA），在下一次 grab 前有效
+        """
+        sct = self._get_sct()
+        shot = sct.grab(sct.monitors[self.monitor_index])
+        height, width = shot.height, shot.width
+        bgra = np.frombuffer(shot.raw, dtype=np.uint8).reshape(height, width, 4)
+        if native:
+            self.shot = shot
+            return PixelFrame(bgra, PIXEL_BGRA)
+        if self.frame is None or self.frame.shape[:2] != (height, width):
+            self.frame = np.empty((height, width, 3), dtype=np.uint8)
+        cv2.cvtColor(bgra, cv2.COLOR_BGRA2RGB, dst=self.frame)
+        return self.frame
+
+    def close(self):
+        if self.sct is not None:
+            try:
+                self.sct.close()
+            except Exception:
+                pass
+            self.sct = None
+        self.shot = None
 
 class ScreenCapture:
-    def __init__(self):
+    def __init__(self, monitor_index=1, use_grabber=True):
+        """
+        Args:
+            monitor_index: 显示器序号，1 为主显示器
+            use_grabber: 是否优先使用常驻的 MSSGrabber，不可用时退回各平台的截图命令
+        """
         self.platform = platform.system()
+        self.grabber = None
+        if use_grabber:
+            try:
+                self.grabber = MSSGrabber(monitor_index)
+            except ImportError as e:
+                print(f"Persistent screen grabber unavailable: {e}")
         self.capture_method = self._get_capture_method()
         
     def _get_capture_method(self):
         """根据平台选择合适的屏幕捕获方法"""
+        if self.grabber is not None:
+            return self._grabber_capture
+        return self._get_fallback_method()
+
+    def _get_fallback_method(self):
+        """各平台的截图命令（每帧创建 mss 或启动子进程，较慢）"""
         if self.platform == 'Windows':
             return self._windows_capture
         elif self.platform == 'Darwin':
@@ -17,6 +102,17 @@ class ScreenCapture:
             return self._linux_capture
         else:
             raise NotImplementedError(f"Screen capture not supported on {self.platform}")
+
+    def _grabber_capture(self):
+        """使用常驻的抓取器捕获屏幕，失败时（例如 Wayland 会话）改用截图命令"""
+        try:
+            return self.grabber.grab()
+        except Exception as e:
+            print(f"Persistent screen grabber error, falling back: {e}")
+            self.grabber.close()
+            self.grabber = None
+            self.capture_method = self._get_fallback_method()
+            return self.capture_method()
             
     def _windows_capture(self):
         """Windows屏幕捕获"""
@@ -29,9 +125,9 @@ class ScreenCapture:
                 screenshot = sct.grab(monitor)
                 # 转换为numpy数组
                 img = np.array(screenshot)
-                # 转换为RGB格式（去掉alpha通道）
+                # mss 输出 BGRA，转换为RGB格式（去掉alpha通道）
                 if img.shape[2] == 4:
-                    img = img[:, :, :3]
+                    img = np.ascontiguousarray(img[:, :, 2::-1])
                 return img
         except Exception as e:
             print(f"Windows screen capture error: {e}")
@@ -121,8 +217,40 @@ class ScreenCapture:
             return None
             
     def capture(self):
-        """捕获屏幕"""
+        """捕获屏幕
+
+        Returns:
+            numpy数组，RGB格式；使用常驻抓取器时缓冲区会被下一帧复用，
+            需要保留的帧应自行复制
+        """
         return self.capture_method()
+
+    def capture_frame(self):
+        """按抓屏库的原生像素格式捕获屏幕
+
+        常驻抓取器直接返回 BGRA 帧，交给 FrameEncoder.encode 时不需要
+        任何颜色转换；截图命令的结果按 RGB 返回。
+
+        Returns:
+            PixelFrame，失败时返回 None；缓冲区在下一次捕获前有效
+        """
+        if self.grabber is not None:
+            try:
+                return self.grabber.grab(native=True)
+            except Exception as e:
+                print(f"Persistent screen grabber error, falling back: {e}")
+                self.grabber.close()
+                self.grabber = None
+                self.capture_method = self._get_fallback_method()
+        img = self.capture_method()
+        if img is None:
+            return None
+        return PixelFrame(img, PIXEL_RGB)
+
+    def close(self):
+        """释放抓取器占用的显示连接和共享内存"""
+        if self.grabber is not None:
+            self.grabber.close()
         
     def test_capture(self):
         """测试屏幕捕获功能"""
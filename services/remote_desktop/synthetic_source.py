@@ -0,0 +1,176 @@
+import cv2
+import numpy as np
+from .pixel_format import PIXEL_RGB, PixelFrame
+
+# 合成画面的场景
+SCENARIOS = ('idle', 'typing', 'scroll', 'video', 'window_switch', 'window_move')
+
+class SyntheticDesktop:
+    """合成的桌面画面
+
+    不依赖显示器生成类似桌面的帧：渐变背景、任务栏、文本窗口和图片窗口，
+    按场景模拟常见的画面变化，用于基准测试和无图形环境下的调试。
+
+    场景：
+        idle: 只有文本光标闪烁
+        typing: 文本窗口中逐字输入
+        scroll: 文本窗口内容向上滚动
+        video: 图片窗口每帧变化
+        window_switch: 两个窗口交替显示在前台
+        window_move: 图片窗口水平移动
+    """
+
+    def __init__(self, width=1920, height=1080, scenario='idle', seed=0):
+        """
+        Args:
+            width: 帧宽度
+            height: 帧高度
+            scenario: 场景名称，见 SCENARIOS
+            seed: 随机数种子
+        """
+        if scenario not in SCENARIOS:
+            raise ValueError(f"Unknown scenario: {scenario}")
+        self.width = width
+        self.height = height
+        self.scenario = scenario
+        self.rng = np.random.default_rng(seed)
+        self.index = 0
+
+        self.background = self._render_background()
+        # 文本窗口：左侧，内容是比窗口高的文档，滚动时取不同的偏移
+        self.text_rect = self._scaled_rect(0.04, 0.06, 0.5, 0.78)
+        x, y, w, h = self.text_rect
+        self.document = self._render_document(w, h * 3)
+        self.line_height = max(12, h // 30)
+        # 图片窗口：右侧
+        self.photo_rect = self._scaled_rect(0.58, 0.12, 0.36, 0.5)
+        self.photo = self._render_photo(self.photo_rect[2], self.photo_rect[3])
+        self.other_window = self._render_document(w, h, light=False)
+        self.frame = np.empty((height, width, 3), dtype=np.uint8)
+
+    def next_frame(self):
+        """生成下一帧
+
+        Returns:
+            numpy数组，RGB格式；每次返回同一块缓冲区，调用方需要保留时自行复制
+        """
+        frame = self.frame
+        frame[:] = self.background
+        scenario = self.scenario
+        i = self.index
+
+        x, y, w, h = self.text_rect
+        if scenario == 'scroll':
+            offset = (i * self.line_height // 2) % (self.document.shape[0] - h)
+            frame[y:y + h, x:x + w] = self.document[offset:offset + h]
+        elif scenario == 'window_switch' and i % 2:
+            frame[y:y + h, x:x + w] = self.other_window
+        else:
+            frame[y:y + h, x:x + w] = self.document[:h]
+        self._draw_title_bar(frame, self.text_rect)
+
+        px, py, pw, ph = self.photo_rect
+        if scenario == 'window_move':
+            px = (px + i * 8) % max(1, self.width - pw)
+        if scenario == 'video':
+            shift = (i * 7) % pw
+            frame[py:py + ph, px:px + pw] = np.roll(self.photo, shift, axis=1)
+        else:
+            frame[py:py + ph, px:px + pw] = self.photo
+        self._draw_title_bar(frame, (px, py, pw, ph))
+
+        if scenario == 'typing':
+            self._draw_typed_text(frame, i)
+        elif scenario == 'idle' and (i // 15) % 2 == 0:
+            # 光标每 15 帧闪烁一次
+            cx, cy = x + 40, y + 60
+            frame[cy:cy + self.line_height, cx:cx + 2] = 0
+
+        self.index += 1
+        return frame
+
+    def capture_frame(self):
+        """与 ScreenCapture.capture_frame 相同的接口，可以代替抓屏驱动 FramePipeline
+
+        Returns:
+            PixelFrame（RGB），缓冲区在下一次调用前有效
+        """
+        return PixelFrame(self.next_frame(), PIXEL_RGB)
+
+    def corpus(self):
+        """合成截图语料：不同类型内容的区域，用于评估编码器的选择
+
+        Returns:
+            [(名称, numpy数组 RGB)]
+        """
+        x, y, w, h = self.text_rect
+        px, py, pw, ph = self.photo_rect
+        return [
+            ('text', self.document[:h].copy()),
+            ('dark_text', self.other_window.copy()),
+            ('photo', self.photo.copy()),
+            ('background', self.background[:h, :w].copy()),
+            ('taskbar', self.background[-self._taskbar_height():].copy()),
+            ('mixed', self._mixed_region(w, h)),
+        ]
+
+    def _scaled_rect(self, fx, fy, fw, fh):
+        return (int(self.width * fx), int(self.height * fy),
+                max(16, int(self.width * fw)), max(16, int(self.height * fh)))
+
+    def _taskbar_height(self):
+        return max(16, self.height // 27)
+
+    def _render_background(self):
+        # 纵向渐变壁纸 + 底部任务栏
+        ramp = np.linspace(0, 1, self.height, dtype=np.float32)[:, None]
+        top = np.array([32, 78, 140], dtype=np.float32)
+        bottom = np.array([12, 30, 60], dtype=np.float32)
+        column = (top * (1 - ramp) + bottom * ramp).astype(np.uint8)
+        background = np.repeat(column[:, None, :], self.width, axis=1)
+        background[-self._taskbar_height():] = (40, 40, 44)
+        return background
+
+    def _render_document(self, width, height, light=True):
+        paper, ink = ((250, 250, 250), (30, 30, 30)) if light else ((36, 38, 44), (200, 210, 220))
+        doc = np.empty((height, width, 3), dtype=np.uint8)
+        doc[:] = paper
+        line_height = max(12, self.height // 40)
+        scale = line_height / 30
+        words = ('remote', 'desktop', 'frame', 'screen', 'encode', 'tile', 'region',
+                 'network', 'cursor', 'window', 'def', 'return', 'self', '=', '()')
+        for row, line_y in enumerate(range(line_height, height, line_height)):
+            count = int(self.rng.integers(3, 10))
+            text = ' '.join(self.rng.choice(words, count))
+            indent = 8 + 24 * (row % 3)
+            cv2.putText(doc, text, (indent, line_y), cv2.FONT_HERSHEY_SIMPLEX,
+                        scale, ink, 1, cv2.LINE_AA)
+        return doc
+
+    def _render_photo(self, width, height):
+        # 低频噪声放大后叠加渐变，近似照片的平滑纹理
+        small = self.rng.integers(0, 256, (max(2, height // 24), max(2, width // 24), 3), dtype=np.uint8)
+        photo = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+        grain = self.rng.integers(-12, 13, photo.shape, dtype=np.int16)
+        return np.clip(photo.astype(np.int16) + grain, 0, 255).astype(np.uint8)
+
+    def _mixed_region(self, width, height):
+        region = self._render_document(width, height)
+        pw, ph = width // 2, height // 2
+        region[ph // 2:ph // 2 + ph, pw // 2:pw // 2 + pw] = self._render_photo(pw, ph)
+        return region
+
+    def _draw_title_bar(self, frame, rect):
+        x, y, w, h = rect
+        bar = max(8, self.line_height)
+        top = max(0, y - bar)
+        frame[top:y, x:x + w] = (60, 64, 72)
+        frame[top + 2:y - 2, x + w - bar:x + w - 4] = (200, 60, 50)
+
+    def _draw_typed_text(self, frame, count):
+        x, y, w, h = self.text_rect
+        line_y = y + h - 2 * self.line_height
+        frame[line_y - self.line_height:line_y + 4, x + 8:x + w - 8] = 250
+        text = ('typing remote desktop ' * 20)[:count % 80]
+        cv2.putText(frame, text, (x + 8, line_y), cv2.FONT_HERSHEY_SIMPLEX,
+                    self.line_height / 30, (30, 30, 30), 1, cv2.LINE_AA)
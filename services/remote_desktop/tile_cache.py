@@ -0,0 +1,133 @@
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+# 缓存容量（块数），64x64 的 RGB 块约 12KB，2048 块约 24MB
+DEFAULT_TILE_CACHE_SIZE = 2048
+
+# 淘汰策略
+EVICTION_LRU = 'lru'    # 命中时移到队尾，淘汰最久未使用的块
+EVICTION_FIFO = 'fifo'  # 命中不改变顺序，淘汰最早缓存的块
+EVICTION_POLICIES = (EVICTION_LRU, EVICTION_FIFO)
+EVICTION_IDS = {EVICTION_LRU: 0, EVICTION_FIFO: 1}
+
+def tile_hash(tile):
+    """计算块内容的 64 位哈希，块的形状一并参与计算
+
+    使用截断的 SHA-256：支持 SHA 指令的 CPU 上比 blake2b 快一倍以上，
+    64 位足以让缓存容量内的碰撞概率可以忽略。
+    """
+    hasher = hashlib.sha256(np.array(tile.shape, dtype=np.uint16).tobytes())
+    hasher.update(np.ascontiguousarray(tile))
+    return hasher.digest()[:8]
+
+class TileCache:
+    """有界的块缓存
+
+    主控端和观看端各持有一份，按完全相同的操作序列更新：每个块在两端
+    获得相同的条目编号，淘汰顺序也相同，因此主控端只需发送“复用条目 N”，
+    不必发送像素。
+
+    插入规则（两端一致）：帧中每个 OP_PIXELS 区域按出现顺序，把区域内
+    完整覆盖的网格块按行优先顺序插入缓存；OP_CACHED_TILE 命中时按淘汰
+    策略更新顺序。
+
+    主控端用 key（内容哈希）查找条目，值为空；观看端按条目编号保存解码
+    后的块像素。
+    """
+
+    def __init__(self, capacity=DEFAULT_TILE_CACHE_SIZE, policy=EVICTION_LRU, on_evict=None):
+        """
+        Args:
+            capacity: 最多缓存的块数，0 表示禁用
+            policy: 淘汰策略，'lru' 或 'fifo'
+            on_evict: 条目被淘汰时调用 on_evict(值)，例如回收块像素的缓冲区
+        """
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        self.capacity = max(0, int(capacity))
+        self.policy = policy
+        self.on_evict = on_evict
+        self.entries = OrderedDict()  # 条目编号 -> (key, 值)
+        self.keys = {}  # key -> 最新的条目编号
+        self.next_id = 0
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.insertions = 0
+        self.evictions = 0
+
+    def clear(self):
+        """清空缓存，条目编号从头开始（统计信息保留）"""
+        self.entries.clear()
+        self.keys.clear()
+        self.next_id = 0
+
+    def lookup(self, key):
+        """按 key 查找条目（主控端）
+
+        Returns:
+            条目编号，未命中时返回 None
+        """
+        entry_id = self.keys.get(key)
+        if entry_id is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.touch(entry_id)
+        return entry_id
+
+    def get(self, entry_id):
+        """按条目编号取值（观看端）
+
+        Returns:
+            缓存的值，条目不存在时返回 None
+        """
+        entry = self.entries.get(entry_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.touch(entry_id)
+        return entry[1]
+
+    def touch(self, entry_id):
+        if self.policy == EVICTION_LRU:
+            self.entries.move_to_end(entry_id)
+
+    def insert(self, key=None, value=None):
+        """插入一个条目，容量已满时按策略淘汰
+
+        Returns:
+            新条目的编号，缓存禁用时返回 None
+        """
+        if not self.capacity:
+            return None
+        entry_id = self.next_id
+        self.next_id = (self.next_id + 1) & 0xFFFFFFFF
+        self.entries[entry_id] = (key, value)
+        if key is not None:
+            self.keys[key] = entry_id
+        self.insertions += 1
+        while len(self.entries) > self.capacity:
+            _, (old_key, old_value) = self.entries.popitem(last=False)
+            if old_key is not None and self.keys.get(old_key) not in self.entries:
+                del self.keys[old_key]
+            self.evictions += 1
+            if self.on_evict is not None and old_value is not None:
+                self.on_evict(old_value)
+        return entry_id
+
+    def get_stats(self):
+        """获取统计信息：命中率、插入和淘汰次数"""
+        lookups = self.hits + self.misses
+        return {
+            'capacity': self.capacity,
+            'policy': self.policy,
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'insertions': self.insertions,
+            'evictions': self.evictions
+        }
@@ -0,0 +1,337 @@
+import time
+from fractions import Fraction
+import cv2
+import numpy as np
+from .frame_encoder import FrameEncoder
+from .frame_protocol import (
+    CODEC_IDS, FLAG_KEYFRAME, OP_PIXELS, OP_SOURCE_RECT, SOURCE_RECT, Region, build_frame
+)
+from .image_processing import ImageProcessing
+from .pixel_format import PIXEL_BGR, PIXEL_BGRA, PIXEL_RGB, PIXEL_RGBA, PixelFrame
+
+try:
+    import av
+    HAS_AV = True
+except ImportError:
+    HAS_AV = False
+
+# 视频编码：名称 -> (PyAV 编码器, 低延迟参数)
+VIDEO_ENCODERS = {
+    'h264': ('libx264', {'preset': 'ultrafast', 'tune': 'zerolatency'}),
+    'vp8': ('libvpx', {'deadline': 'realtime', 'cpu-used': '8', 'lag-in-frames': '0'}),
+}
+# 视频编码：名称 -> PyAV 解码器
+VIDEO_DECODERS = {
+    'h264': 'h264',
+    'vp8': 'vp8',
+}
+VIDEO_CODECS = tuple(VIDEO_ENCODERS)
+
+# 像素格式 -> PyAV 帧格式
+_AV_FORMATS = {
+    PIXEL_RGB: 'rgb24',
+    PIXEL_BGR: 'bgr24',
+    PIXEL_BGRA: 'bgra',
+    PIXEL_RGBA: 'rgba',
+}
+
+# 最长的关键帧间隔（帧）
+DEFAULT_GOP_SIZE = 300
+# VP8 的码率上限（bit/s）：libvpx 只有设置了码率才按 CRF 控制质量
+DEFAULT_MAX_BITRATE = 20000000
+# 压缩质量换算为 CRF 时的步长，质量小幅变化不重新打开编码器
+CRF_STEP = 4
+
+def quality_to_crf(quality, codec='h264'):
+    """把 1-100 的压缩质量换算为 CRF（H.264 为 0-51，VP8 为 4-63），按 CRF_STEP 取整"""
+    quality = max(1, min(100, quality))
+    if codec == 'vp8':
+        crf = 63 - quality * 0.55
+    else:
+        crf = 51 - quality * 0.4
+    return int(round(crf / CRF_STEP) * CRF_STEP)
+
+class VideoEncoder:
+    """软件视频编码器（PyAV，libx264 / libvpx）
+
+    按低延迟参数打开：不使用 B 帧、不预读，每输入一帧立即输出一个包。
+    宽高为奇数时裁掉最后一行/列（YUV 4:2:0 要求偶数）。CRF 或尺寸变化时
+    重新打开编码器，下一帧为关键帧。
+    """
+
+    def __init__(self, codec='h264', fps=30, quality=80, gop_size=DEFAULT_GOP_SIZE, threads=0,
+                 max_bitrate=DEFAULT_MAX_BITRATE):
+        """
+        Args:
+            codec: 视频编码，见 VIDEO_CODECS
+            fps: 帧率，用于码率控制
+            quality: 压缩质量（1-100），换算为 CRF
+            gop_size: 最长的关键帧间隔（帧）
+            threads: 编码线程数，0 表示由编码器决定
+            max_bitrate: VP8 的码率上限（bit/s）
+        """
+        if not HAS_AV:
+            raise ImportError("PyAV is not installed")
+        if codec not in VIDEO_ENCODERS:
+            raise ValueError(f"Unsupported video codec: {codec}")
+        self.codec = codec
+        self.fps = fps
+        self.quality = quality
+        self.gop_size = gop_size
+        self.threads = threads
+        self.max_bitrate = max_bitrate
+        self.context = None
+        self.size = None
+        self.crf = None
+        self.pts = 0
+        self.force_keyframe = True
+
+    def _open(self, width, height, crf):
+        name, options = VIDEO_ENCODERS[self.codec]
+        context = av.CodecContext.create(name, 'w')
+        context.width = width
+        context.height = height
+        context.pix_fmt = 'yuv420p'
+        context.time_base = Fraction(1, max(1, int(self.fps)))
+        context.gop_size = self.gop_size
+        context.thread_count = self.threads
+        if self.codec == 'vp8':
+            context.bit_rate = self.max_bitrate
+        context.options = dict(options, crf=str(crf))
+        context.open()
+        self.context = context
+        self.size = (width, height)
+        self.crf = crf
+        self.pts = 0
+
+    def request_keyframe(self):
+        """下一帧编码为关键帧"""
+        self.force_keyframe = True
+
+    def encode(self, img, pixel_format=PIXEL_RGB):
+        """编码一帧
+
+        Args:
+            img: numpy数组，形状为 (高, 宽, 通道)
+            pixel_format: img 的像素格式
+
+        Returns:
+            (数据 bytes, 是否关键帧)，编码器没有输出时返回 (None, False)
+        """
+        height, width = img.shape[0] & ~1, img.shape[1] & ~1
+        if height != img.shape[0] or width != img.shape[1]:
+            img = img[:height, :width]
+        crf = quality_to_crf(self.quality, self.codec)
+        if self.context is None or self.size != (width, height) or self.crf != crf:
+            self._open(width, height, crf)
+            self.force_keyframe = True
+
+        frame = av.VideoFrame.from_ndarray(np.ascontiguousarray(img), format=_AV_FORMATS[pixel_format])
+        frame.pts = self.pts
+        self.pts += 1
+        if self.force_keyframe:
+            frame.pict_type = av.video.frame.PictureType.I
+            self.force_keyframe = False
+        packets = self.context.encode(frame)
+        if not packets:
+            return None, False
+        keyframe = any(packet.is_keyframe for packet in packets)
+        return b''.join(bytes(packet) for packet in packets), keyframe
+
+    def close(self):
+        self.context = None
+
+# 直接转换到输出缓冲区的 I420 -> RGB/BGR 转换（与 libswscale 相同的 BT.601 有限范围）
+_I420_CONVERSIONS = {
+    PIXEL_RGB: cv2.COLOR_YUV2RGB_I420,
+    PIXEL_BGR: cv2.COLOR_YUV2BGR_I420,
+}
+
+class VideoDecoder:
+    """软件视频解码器（PyAV）
+
+    decode_into 把 yuv420p 的解码结果先复制到常驻的 I420 缓冲区（每像素
+    1.5 字节），再由 cv2.cvtColor 直接转换到输出缓冲区，不经过 PyAV 的
+    reformat，稳定分辨率下不分配整帧大小的数组。
+    """
+
+    def __init__(self, codec='h264'):
+        """
+        Args:
+            codec: 视频编码，见 VIDEO_CODECS
+        """
+        if not HAS_AV:
+            raise ImportError("PyAV is not installed")
+        if codec not in VIDEO_DECODERS:
+            raise ValueError(f"Unsupported video codec: {codec}")
+        self.codec = codec
+        self.context = av.CodecContext.create(VIDEO_DECODERS[codec], 'r')
+        self.i420 = None  # 复用的 I420 缓冲区，形状为 (高 * 3 / 2, 宽)
+
+    def decode(self, data, pixel_format=PIXEL_RGB):
+        """解码一帧
+
+        Args:
+            data: 编码器输出的一帧数据
+            pixel_format: 输出的像素格式，'rgb' 或 'bgr'
+
+        Returns:
+            numpy数组，解码器没有输出时返回 None
+        """
+        frames = self.context.decode(av.Packet(bytes(data)))
+        if not frames:
+            return None
+        return frames[-1].to_ndarray(format=_AV_FORMATS[pixel_format])
+
+    def decode_into(self, data, dst, pixel_format=PIXEL_RGB):
+        """解码一帧并直接写入 dst
+
+        Args:
+            data: 编码器输出的一帧数据
+            dst: 输出缓冲区，形状为 (高, 宽, 3)，可以是帧缓冲区中按行跨步的视图
+            pixel_format: dst 的像素格式，'rgb' 或 'bgr'
+
+        Returns:
+            成功时返回 True；解码器没有输出或尺寸与 dst 不符时返回 False
+        """
+        frames = self.context.decode(av.Packet(bytes(data)))
+        if not frames:
+            return False
+        frame = frames[-1]
+        height, width = dst.shape[:2]
+        if (frame.height, frame.width) != (height, width):
+            return False
+        conversion = _I420_CONVERSIONS.get(pixel_format)
+        if frame.format.name != 'yuv420p' or conversion is None or height % 2 or width % 2:
+            dst[...] = frame.to_ndarray(format=_AV_FORMATS[pixel_format])[..., :3]
+            return True
+
+        if self.i420 is None or self.i420.shape != (height * 3 // 2, width):
+            self.i420 = np.empty((height * 3 // 2, width), dtype=np.uint8)
+        # 各平面按 line_size 对齐，逐平面去掉行尾的填充，依次放入连续的 I420 缓冲区
+        flat = self.i420.reshape(-1)
+        offset = 0
+        for plane, (plane_width, plane_height) in zip(
+                frame.planes, ((width, height), (width // 2, height // 2), (width // 2, height // 2))):
+            rows = np.frombuffer(plane, np.uint8).reshape(-1, plane.line_size)
+            size = plane_width * plane_height
+            flat[offset:offset + size].reshape(plane_height, plane_width)[...] = \
+                rows[:plane_height, :plane_width]
+            offset += size
+        cv2.cvtColor(self.i420, conversion, dst=dst)
+        return True
+
+class VideoFrameEncoder:
+    """视频流模式的帧编码器，接口与 FrameEncoder 相同
+
+    每帧整帧交给视频编码器，利用帧间冗余，视频播放、动画等大面积变化的
+    画面码率远低于逐帧 JPEG。输出仍是 screen_frame 消息：一个覆盖整帧的
+    OP_PIXELS 区域，编码为 h264/vp8，关键帧置 FLAG_KEYFRAME。画面没有
+    变化时不编码。
+
+    压缩质量取自 image_processing.quality（自适应控制会修改它），换算为
+    CRF 后按 CRF_STEP 取整，避免频繁重新打开编码器。
+    """
+
+    def __init__(self, image_processing=None, codec='h264', fps=30):
+        """
+        Args:
+            image_processing: 提供压缩质量的 ImageProcessing，None 表示默认配置
+            codec: 视频编码，见 VIDEO_CODECS
+            fps: 帧率
+        """
+        self.image_processing = image_processing or ImageProcessing()
+        self.video = VideoEncoder(codec, fps, self.image_processing.quality)
+        self.codec = codec
+        self.previous = None
+        self.frame_id = 0
+        self.source_rect = None
+        self._source_rect_sent = None
+        # 统计信息
+        self.frames = 0
+        self.keyframes = 0
+        self.bytes = 0
+        self.encode_time = 0.0
+
+    def reset(self):
+        """下一帧编码为关键帧（新的观看端加入或观看端请求刷新）"""
+        self.previous = None
+        self._source_rect_sent = None
+        self.video.request_keyframe()
+
+    def set_source_rect(self, rect):
+        """设置之后的帧对应的主控端屏幕区域，见 FrameEncoder.set_source_rect"""
+        self.source_rect = tuple(rect) if rect is not None else None
+
+    def encode(self, frame, pixel_format=PIXEL_RGB):
+        """编码一帧
+
+        Args:
+            frame: numpy数组或 PixelFrame
+            pixel_format: frame 为 numpy 数组时的像素格式
+
+        Returns:
+            screen_frame 消息负载（bytes），画面没有变化时返回 None
+        """
+        start = time.perf_counter()
+        if isinstance(frame, PixelFrame):
+            frame, pixel_format = frame.data, frame.pixel_format
+        announce = self.source_rect is not None and self.source_rect != self._source_rect_sent
+        if not announce and self.previous is not None and self.previous.shape == frame.shape \
+                and np.array_equal(self.previous, frame):
+            return None
+        if self.previous is None or self.previous.shape != frame.shape:
+            self.previous = np.empty_like(frame)
+        np.copyto(self.previous, frame)
+
+        self.video.quality = self.image_processing.quality
+        data, keyframe = self.video.encode(frame, pixel_format)
+        if data is None:
+            return None
+        width, height = self.video.size
+        regions = []
+        if announce:
+            regions.append(Region(OP_SOURCE_RECT, 0, 0, 0, 0, 0, SOURCE_RECT.pack(*self.source_rect)))
+            self._source_rect_sent = self.source_rect
+        regions.append(Region(OP_PIXELS, CODEC_IDS[self.codec], 0, 0, width, height, data))
+        payload = build_frame(width, height, self.frame_id, regions, FLAG_KEYFRAME if keyframe else 0)
+        self.frame_id = (self.frame_id + 1) & 0xFFFFFFFF
+        self.frames += 1
+        self.keyframes += keyframe
+        self.bytes += len(payload)
+        self.encode_time += time.perf_counter() - start
+        return payload
+
+    def close(self):
+        self.video.close()
+
+    def get_stats(self):
+        """获取编码统计信息"""
+        return {
+            'codec': self.codec,
+            'crf': self.video.crf,
+            'encoded_frames': self.frames,
+            'keyframes': self.keyframes,
+            'bytes': self.bytes,
+            'avg_bytes': self.bytes / self.frames if self.frames else 0,
+            'avg_encode_ms': self.encode_time / self.frames * 1000 if self.frames else 0.0
+        }
+
+def create_frame_encoder(image_processing=None, video_codec=None, fps=30, **kwargs):
+    """按配置创建帧编码器
+
+    Args:
+        image_processing: ImageProcessing
+        video_codec: 视频编码（'h264' 或 'vp8'），None 表示逐块编码（FrameEncoder）
+        fps: 帧率
+        **kwargs: 传给 FrameEncoder 的参数
+
+    Returns:
+        VideoFrameEncoder；未安装 PyAV 或编码器不可用时退回 FrameEncoder
+    """
+    if video_codec:
+        try:
+            return VideoFrameEncoder(image_processing, video_codec, fps)
+        except Exception as e:
+            print(f"Video encoder unavailable, using JPEG tiles: {e}")
+    return FrameEncoder(image_processing, **kwargs)
@@ -0,0 +1,102 @@
+import cv2
+import numpy as np
+from .pixel_format import PIXEL_BGR, PIXEL_BGRA, PIXEL_RGB, PIXEL_RGBA, convert_pixels
+
+# 色度抽样：(横向, 纵向) 的抽样倍数
+SUBSAMPLING_444 = '444'
+SUBSAMPLING_422 = '422'
+SUBSAMPLING_420 = '420'
+SUBSAMPLING_FACTORS = {
+    SUBSAMPLING_444: (1, 1),
+    SUBSAMPLING_422: (2, 1),
+    SUBSAMPLING_420: (2, 2),
+}
+SUBSAMPLING_IDS = {SUBSAMPLING_444: 0, SUBSAMPLING_422: 1, SUBSAMPLING_420: 2}
+SUBSAMPLING_NAMES = {value: name for name, value in SUBSAMPLING_IDS.items()}
+
+# 像素格式 -> 转换到 YCrCb 的 cv2 代码（BT.601 全范围，与 JPEG 相同）
+_TO_YCRCB = {
+    PIXEL_RGB: cv2.COLOR_RGB2YCrCb,
+    PIXEL_BGR: cv2.COLOR_BGR2YCrCb,
+}
+# YCrCb -> 输出像素格式
+_FROM_YCRCB = {
+    PIXEL_RGB: cv2.COLOR_YCrCb2RGB,
+    PIXEL_BGR: cv2.COLOR_YCrCb2BGR,
+}
+
+def chroma_size(width, height, subsampling):
+    """色度平面的 (宽, 高)，奇数尺寸向上取整"""
+    fx, fy = SUBSAMPLING_FACTORS[subsampling]
+    return (width + fx - 1) // fx, (height + fy - 1) // fy
+
+def to_planes(img, pixel_format=PIXEL_RGB, subsampling=SUBSAMPLING_420):
+    """转换为 Y、U(Cb)、V(Cr) 三个平面
+
+    一次 cvtColor 转换到 YCrCb，色度平面用 INTER_AREA 缩小（按块取平均）。
+
+    Args:
+        img: numpy数组，形状为 (高, 宽, 通道)
+        pixel_format: img 的像素格式
+        subsampling: 色度抽样，'444'、'422' 或 '420'
+
+    Returns:
+        (Y, U, V) 三个 uint8 二维数组
+    """
+    if pixel_format in (PIXEL_BGRA, PIXEL_RGBA):
+        img = convert_pixels(img, pixel_format, PIXEL_BGR)
+        pixel_format = PIXEL_BGR
+    height, width = img.shape[:2]
+    ycrcb = cv2.cvtColor(img, _TO_YCRCB[pixel_format])
+    y, cr, cb = cv2.split(ycrcb)
+    size = chroma_size(width, height, subsampling)
+    if size != (width, height):
+        cb = cv2.resize(cb, size, interpolation=cv2.INTER_AREA)
+        cr = cv2.resize(cr, size, interpolation=cv2.INTER_AREA)
+    return y, cb, cr
+
+def from_planes(y, u, v, pixel_format=PIXEL_RGB, dst=None):
+    """由 Y、U、V 平面还原图像，色度平面按需放大
+
+    Args:
+        y: 亮度平面
+        u: Cb 平面
+        v: Cr 平面
+        pixel_format: 输出的像素格式，'rgb' 或 'bgr'
+        dst: 可选的输出缓冲区
+
+    Returns:
+        numpy数组，形状为 (高, 宽, 3)
+    """
+    height, width = y.shape
+    if u.shape != y.shape:
+        u = cv2.resize(u, (width, height), interpolation=cv2.INTER_LINEAR)
+        v = cv2.resize(v, (width, height), interpolation=cv2.INTER_LINEAR)
+    if dst is None:
+        return cv2.cvtColor(cv2.merge((y, v, u)), _FROM_YCRCB[pixel_format])
+    return cv2.cvtColor(cv2.merge((y, v, u)), _FROM_YCRCB[pixel_format], dst=dst)
+
+def split_planes(data, width, height, subsampling):
+    """从连续存放的 Y、U、V 平面中取出三个平面，返回的是 data 的视图，不复制
+
+    Args:
+        data: 按 Y、U、V 顺序连续存放的平面数据
+        width: 图像宽度
+        height: 图像高度
+        subsampling: 色度抽样
+
+    Returns:
+        (Y, U, V)
+
+    Raises:
+        ValueError: 数据长度与尺寸不符
+    """
+    cw, ch = chroma_size(width, height, subsampling)
+    luma, chroma = width * height, cw * ch
+    if len(data) != luma + 2 * chroma:
+        raise ValueError("YUV data size does not match the image size")
+    planes = np.frombuffer(data, np.uint8)
+    y = planes[:luma].reshape(height, width)
+    u = planes[luma:luma + chroma].reshape(ch, cw)
+    v = planes[luma + chroma:].reshape(ch, cw)
+    return y, u, v
@@ -15,6 +15,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 from core.device.device_manager import DeviceManager
 from core.network.udp_discovery import UDPClient
 from core.network.tcp_client import TCPClient
+from core.utils.config import config_manager
 from services.remote_desktop.screen_capture import ScreenCapture
 from services.file_transfer.file_manager import FileManager
 from services.clipboard.clipboard_sync import ClipboardSync
@@ -28,7 +29,7 @@ class MainWindow(QMainWindow):
         # 初始化核心组件
         self.device_manager = DeviceManager()
         self.udp_client = UDPClient(self.device_manager.get_local_device())
-        self.tcp_client = TCPClient()
+        self.tcp_client = TCPClient(encryption=config_manager.get('security.encryption', True))
         self.screen_capture = ScreenCapture()
         self.file_manager = FileManager()
         self.clipboard_sync = ClipboardSync()
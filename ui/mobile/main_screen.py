@@ -15,6 +15,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 from core.device.device_manager import DeviceManager
 from core.network.udp_discovery import UDPClient
 from core.network.tcp_client import TCPClient
+from core.utils.config import config_manager
 
 class DeviceListButton(ListItemButton):
     """设备列表按钮"""
@@ -32,7 +33,7 @@ class MainScreen(BoxLayout):
         # 初始化核心组件
         self.device_manager = DeviceManager()
         self.udp_client = UDPClient(self.device_manager.get_local_device())
-        self.tcp_client = TCPClient()
+        self.tcp_client = TCPClient(encryption=config_manager.get('security.encryption', True))
         
         # 创建UI组件
         self.create_ui()